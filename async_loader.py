@@ -0,0 +1,113 @@
+"""在后台线程执行数据库调用，通过 root.after 轮询把结果交回 Tk 主线程"""
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LoadTask:
+    """一次后台加载任务，取消后不再回调"""
+    def __init__(self, owner, on_success=None, on_error=None):
+        self.owner = owner
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future:
+            self.future.cancel()
+
+
+class AsyncLoader:
+    """后台加载器：数据库调用在线程池中执行，回调始终在 Tk 主线程中执行"""
+
+    # 轮询结果队列的间隔（毫秒）
+    POLL_INTERVAL = 50
+
+    def __init__(self, root, max_workers=4):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-loader')
+        self._results = queue.Queue()
+        self._tasks = set()
+        self._polling = False
+        # 挂在根窗口上，供 utils.run_async 查找
+        root.async_loader = self
+
+    def submit(self, owner, func, *args, on_success=None, on_error=None):
+        """在后台执行 func(*args)；owner 为发起加载的控件，用于显示加载状态和按界面取消"""
+        task = LoadTask(owner, on_success, on_error)
+        self._tasks.add(task)
+        self._update_indicator(owner)
+        task.future = self._executor.submit(self._run, task, func, args)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        return task
+
+    def _run(self, task, func, args):
+        if task.cancelled:
+            return
+        try:
+            self._results.put((task, func(*args), None))
+        except Exception as e:
+            self._results.put((task, None, e))
+
+    def _poll(self):
+        while True:
+            try:
+                task, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(task)
+            if task.cancelled or not self._exists(task.owner):
+                continue
+            if error is not None:
+                if task.on_error:
+                    task.on_error(error)
+                else:
+                    print(f"后台加载数据时出错: {error}")
+            elif task.on_success:
+                task.on_success(result)
+
+        # 已取消但尚未开始的任务不会产生结果，这里一并清理
+        for task in [t for t in self._tasks if t.future and t.future.cancelled()]:
+            self._finish(task)
+
+        if self._tasks:
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        else:
+            self._polling = False
+
+    def _finish(self, task):
+        if task in self._tasks:
+            self._tasks.discard(task)
+            self._update_indicator(task.owner)
+
+    def _update_indicator(self, owner):
+        """owner 提供 set_loading 时，按其未完成任务数显示或隐藏加载提示"""
+        if not hasattr(owner, 'set_loading') or not self._exists(owner):
+            return
+        pending = any(t.owner is owner and not t.cancelled for t in self._tasks)
+        owner.set_loading(pending)
+
+    @staticmethod
+    def _exists(widget):
+        try:
+            return bool(widget.winfo_exists())
+        except Exception:
+            return False
+
+    def cancel_within(self, container):
+        """取消 container 及其子控件发起的所有任务（切换界面时调用）"""
+        prefix = str(container)
+        for task in list(self._tasks):
+            path = str(task.owner)
+            if path == prefix or path.startswith(prefix + '.'):
+                task.cancel()
+                self._finish(task)
+
+    def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
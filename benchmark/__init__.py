@@ -0,0 +1,15 @@
+"""性能基准：可复现的测试数据生成器与 DatabaseOperations 计时工具
+
+用法（需先用 create.sql 建库）::
+
+    python -m benchmark generate --conn "host=localhost;user=root;password=...;database=school_library" --borrows 1000000
+    python -m benchmark run --conn "..." --output before.json
+    python -m benchmark run --conn "...;statement_cache_size=0" --output unprepared.json
+    python -m benchmark explain --conn "..."
+    python -m benchmark concurrency --conn "...;pool_size=16" --threads 16
+    python -m benchmark returns --conn "..." --output returns_after.json
+    python -m benchmark fines --conn "..."
+    python -m benchmark memory --conn "..." --rows 500000
+    python -m benchmark overhead
+    python -m benchmark compare before.json after.json
+"""
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+
+# 以 python -m benchmark 运行时，让顶层模块（db_connection 等）可以被导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import concurrency, explain, fines, generate, memory, overhead, returns, runner  # noqa: E402
+
+DEFAULT_CONN = "host=localhost;user=root;password=123456;database=school_library"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description="学校图书借阅管理系统性能基准")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    gen = sub.add_parser('generate', help="生成测试数据（会清空现有数据）")
+    gen.add_argument('--conn', default=DEFAULT_CONN, help="数据库连接串")
+    gen.add_argument('--seed', type=int, default=42)
+    for table, count in generate.DEFAULT_SCALE.items():
+        gen.add_argument(f'--{table}', type=int, default=None, help=f"行数，默认 {count}")
+    gen.set_defaults(func=generate.main)
+
+    run = sub.add_parser('run', help="对各个方法计时并写出 JSON 报告")
+    run.add_argument('--conn', default=DEFAULT_CONN, help="数据库连接串")
+    run.add_argument('--iterations', type=int, default=200)
+    run.add_argument('--warmup', type=int, default=5)
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--include-writes', action='store_true', help="同时测试借书、还书、续借（会修改数据）")
+    run.add_argument('--output', default='bench_report.json')
+    run.add_argument('--query-stats', default=None, help="按语句汇总的查询统计写入该 JSON 文件（会略微增加耗时）")
+    run.set_defaults(func=runner.main)
+
+    exp = sub.add_parser('explain', help="检查查询计划，出现大表全表扫描时返回非零")
+    exp.add_argument('--conn', default=DEFAULT_CONN, help="数据库连接串")
+    exp.set_defaults(func=explain.main)
+
+    conc = sub.add_parser('concurrency', help="多线程同时借同一本书，检查库存是否一致")
+    conc.add_argument('--conn', default=DEFAULT_CONN + ";pool_size=16", help="数据库连接串")
+    conc.add_argument('--copies', type=int, default=10, help="测试图书的库存")
+    conc.add_argument('--threads', type=int, default=16)
+    conc.add_argument('--attempts', type=int, default=5, help="每个线程借书次数")
+    conc.add_argument('--rounds', type=int, default=3)
+    conc.set_defaults(func=concurrency.main)
+
+    ret = sub.add_parser('returns', help="还书吞吐量：逐条 return_book 与批量 return_books")
+    ret.add_argument('--conn', default=DEFAULT_CONN, help="数据库连接串")
+    ret.add_argument('--loans', type=int, default=2000, help="每种方式归还的借阅记录数")
+    ret.add_argument('--batch-size', type=int, default=200)
+    ret.add_argument('--output', default='bench_returns.json')
+    ret.set_defaults(func=returns.main)
+
+    fin = sub.add_parser('fines', help="核对本地罚款计算与数据库函数，出现不一致时返回非零")
+    fin.add_argument('--conn', default=DEFAULT_CONN, help="数据库连接串")
+    fin.add_argument('--cases', type=int, default=2000, help="随机生成的借阅条数")
+    fin.add_argument('--batch', type=int, default=100000, help="批量计算耗时测试的条数")
+    fin.add_argument('--seed', type=int, default=42)
+    fin.set_defaults(func=fines.main)
+
+    mem = sub.add_parser('memory', help="对比字典行与 ResultSet 读取借阅记录的内存占用")
+    mem.add_argument('--conn', default=DEFAULT_CONN, help="数据库连接串")
+    mem.add_argument('--rows', type=int, default=500000, help="读取的借阅记录行数")
+    mem.set_defaults(func=memory.main)
+
+    ovh = sub.add_parser('overhead', help="测量运行指标计数与耗时记录的开销（不连接数据库）")
+    ovh.add_argument('--calls', type=int, default=200000)
+    ovh.set_defaults(func=overhead.main)
+
+    cmp_ = sub.add_parser('compare', help="对比两份报告")
+    cmp_.add_argument('base')
+    cmp_.add_argument('new')
+    cmp_.set_defaults(func=lambda args: runner.compare(args.base, args.new) or 0)
+
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
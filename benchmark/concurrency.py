@@ -0,0 +1,103 @@
+"""并发借书压力测试：多个线程同时借同一本书，检查库存和借阅记录是否一致"""
+import random
+import threading
+
+from db_operations import DatabaseOperations
+
+from benchmark.runner import refresh_reader_stats
+
+# 压力测试专用图书，测试前后都会清理
+TEST_BOOK_ID = 'BENCH-CONC-0001'
+
+
+def setup(ops, copies):
+    """插入一本库存为 copies 的测试图书"""
+    teardown(ops)
+    publisher = ops.db.execute_query("SELECT MIN(出版社号) AS id FROM publishers")[0]['id']
+    category = ops.db.execute_query("SELECT MIN(类别id) AS id FROM categories")[0]['id']
+    ops.db.execute_query(
+        "INSERT INTO books (索书号, 书名, 作者, 出版社, 类别id, 总数, 在库数量) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        (TEST_BOOK_ID, '并发测试', '测试', publisher, category, copies, copies))
+
+
+def teardown(ops):
+    """删除测试图书及其借阅、罚款记录，并重新统计借过这本书的读者
+
+    直接删除借阅和罚款记录不会触发统计更新，参与测试的读者在 reader_stats 中会留下偏差；
+    book_popularity、book_daily_borrows 随图书、borrow_status 随借阅记录级联删除。
+    """
+    with ops.db.transaction():
+        readers = [row['读者卡号'] for row in ops.db.execute_query(
+            "SELECT DISTINCT 读者卡号 FROM borrow_records WHERE 索书号 = %s", (TEST_BOOK_ID,)) or []]
+        ops.db.execute_query(
+            "DELETE f FROM fines f JOIN borrow_records br ON f.借阅记录编号 = br.借阅记录编号 WHERE br.索书号 = %s",
+            (TEST_BOOK_ID,))
+        ops.db.execute_query("DELETE FROM borrow_records WHERE 索书号 = %s", (TEST_BOOK_ID,))
+        ops.db.execute_query("DELETE FROM books WHERE 索书号 = %s", (TEST_BOOK_ID,))
+        refresh_reader_stats(ops, readers)
+
+
+def hammer(ops, readers, threads, attempts):
+    """threads 个线程各借 attempts 次，返回 (成功次数, 拒绝次数, 出错次数)"""
+    counts = {'success': 0, 'refused': 0, 'error': 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        start.wait()
+        for _ in range(attempts):
+            result = ops.borrow_book(rng.choice(readers), TEST_BOOK_ID)
+            key = 'error' if result is None else 'success' if result.success else 'refused'
+            with lock:
+                counts[key] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return counts['success'], counts['refused'], counts['error']
+
+
+def run(ops, copies=10, threads=16, attempts=5):
+    """运行一轮压力测试，返回发现的问题列表"""
+    readers = [row['读者卡号'] for row in ops.db.execute_query("SELECT 读者卡号 FROM readers LIMIT 100")]
+    if not readers:
+        raise RuntimeError("测试库中没有读者，请先运行 python -m benchmark generate")
+
+    setup(ops, copies)
+    try:
+        success, refused, error = hammer(ops, readers, threads, attempts)
+        book = ops.get_book_by_id(TEST_BOOK_ID)
+        loans = ops.db.execute_query(
+            "SELECT COUNT(*) AS n FROM borrow_records WHERE 索书号 = %s AND 归还日期 IS NULL", (TEST_BOOK_ID,))[0]['n']
+    finally:
+        teardown(ops)
+
+    print(f"{threads} 个线程 × {attempts} 次：成功 {success}，无库存 {refused}，出错 {error}；"
+          f"剩余库存 {book['在库数量']}，未归还记录 {loans}")
+
+    problems = []
+    expected = min(copies, threads * attempts)
+    if success != expected:
+        problems.append(f"成功借出 {success} 次，应为 {expected} 次")
+    if loans != success:
+        problems.append(f"未归还记录 {loans} 条，与成功次数 {success} 不一致")
+    if book['在库数量'] != copies - success:
+        problems.append(f"剩余库存 {book['在库数量']}，应为 {copies - success}")
+    if error:
+        problems.append(f"{error} 次借书出错")
+    return problems
+
+
+def main(args):
+    ops = DatabaseOperations(args.conn)
+    problems = []
+    for round_no in range(1, args.rounds + 1):
+        print(f"第 {round_no} 轮")
+        problems += run(ops, copies=args.copies, threads=args.threads, attempts=args.attempts)
+    print(f"重试统计: {ops.db.retry_stats()}")
+    for problem in problems:
+        print(f"不一致: {problem}")
+    return 1 if problems else 0
@@ -0,0 +1,175 @@
+"""用 EXPLAIN 检查 DatabaseOperations 的查询和存储过程中的语句是否出现全表扫描
+
+查询语句通过记录基准场景实际执行的 SQL 获得；存储过程、触发器内部的语句无法从客户端捕获，
+在 PROCEDURE_STATEMENTS 中单独列出，修改 create.sql 时需要同步更新。
+"""
+from db_operations import DatabaseOperations
+
+from benchmark.runner import Benchmark
+
+# 本来就要读取整张表的场景
+FULL_SCAN_SCENARIOS = {
+    'get_all_books', 'get_all_readers', 'get_all_borrow_records', 'iter_borrow_records', 'get_all_fines',
+    'get_book_info_view', 'get_borrow_info_view',
+    # 包含匹配无法使用 B 树索引，需要高效检索时使用 search_books_ranked
+    'search_books(书名)',
+}
+
+# 估计行数不超过该值的表（出版社、类别等参照表）允许全表扫描
+SMALL_TABLE_ROWS = 1000
+
+# 存储过程、触发器中的语句，%s 处依次代入对应种类的样本参数；
+# 触发器中的 NEW.列 换成 %s，只用于 EXPLAIN，不会真正执行
+PROCEDURE_STATEMENTS = [
+    ('get_reader_borrow_history (procedure)', """
+        SELECT br.借阅记录编号, b.书名, p.名称, br.借阅日期, br.应还日期, br.归还日期,
+               COALESCE(f.罚款金额, fa.罚款金额)
+        FROM (
+            SELECT 借阅记录编号, 索书号, 借阅日期, 应还日期, 归还日期
+            FROM borrow_records WHERE 读者卡号 = %s
+            UNION ALL
+            SELECT 借阅记录编号, 索书号, 借阅日期, 应还日期, 归还日期
+            FROM borrow_records_archive WHERE 读者卡号 = %s
+        ) br
+        JOIN books b ON br.索书号 = b.索书号
+        JOIN publishers p ON b.出版社 = p.出版社号
+        LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
+        LEFT JOIN fines_archive fa ON br.借阅记录编号 = fa.借阅记录编号
+        ORDER BY br.借阅日期 DESC
+    """, ('reader', 'reader')),
+    ('borrow_book (procedure)', "SELECT 在库数量 FROM books WHERE 索书号 = %s FOR UPDATE", ('book',)),
+    ('return_book (procedure)',
+     "SELECT 归还日期 IS NOT NULL, 应还日期 FROM borrow_records WHERE 借阅记录编号 = %s FOR UPDATE", ('borrow',)),
+    ('return_book (procedure)', "SELECT 罚款金额 FROM fines WHERE 借阅记录编号 = %s", ('borrow',)),
+    ('return_book (procedure)', "UPDATE borrow_records SET 归还日期 = CURDATE() WHERE 借阅记录编号 = %s", ('borrow',)),
+    ('renew_book (procedure)', "UPDATE borrow_records SET 应还日期 = 应还日期 WHERE 借阅记录编号 = %s", ('borrow',)),
+    ('after_borrow_insert / after_return_update (trigger)',
+     "UPDATE books SET 在库数量 = 在库数量 WHERE 索书号 = %s", ('book',)),
+    # 读者借阅统计
+    ('after_borrow_insert (trigger)', """
+        INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数) VALUES(%s, 1, 1, 0)
+        ON DUPLICATE KEY UPDATE 总借阅次数 = 总借阅次数 + 1, 未归还数量 = 未归还数量 + 1
+    """, ('reader',)),
+    ('after_return_update (trigger)', """
+        UPDATE reader_stats SET 未归还数量 = 未归还数量 - 1, 超期归还次数 = 超期归还次数 WHERE 读者卡号 = %s
+    """, ('reader',)),
+    ('after_fine_insert (trigger)', "SELECT 读者卡号 FROM borrow_records WHERE 借阅记录编号 = %s", ('borrow',)),
+    ('after_fine_insert (trigger)', "UPDATE reader_stats SET 罚款总额 = 罚款总额 WHERE 读者卡号 = %s", ('reader',)),
+    # 图书借阅热度
+    ('after_borrow_insert (trigger)', """
+        INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数) VALUES(%s, 1, 1)
+        ON DUPLICATE KEY UPDATE 总借阅次数 = 总借阅次数 + 1, 近30天借阅次数 = 近30天借阅次数 + 1
+    """, ('book',)),
+    ('after_borrow_insert (trigger)', """
+        INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数) VALUES(%s, CURDATE(), 1)
+        ON DUPLICATE KEY UPDATE 借阅次数 = 借阅次数 + 1
+    """, ('book',)),
+    ('roll_book_popularity (procedure)', """
+        UPDATE book_popularity p
+        JOIN (
+            SELECT 索书号, SUM(借阅次数) AS 过期次数
+            FROM book_daily_borrows
+            WHERE 借阅日期 < CURDATE() - INTERVAL 29 DAY
+            GROUP BY 索书号
+        ) d ON p.索书号 = d.索书号
+        SET p.近30天借阅次数 = p.近30天借阅次数 - d.过期次数
+    """, ()),
+    ('roll_book_popularity (procedure)',
+     "DELETE FROM book_daily_borrows WHERE 借阅日期 < CURDATE() - INTERVAL 29 DAY", ()),
+    # 借阅状态
+    ('after_borrow_insert (trigger)',
+     "INSERT INTO borrow_status(借阅记录编号, 借阅状态, 预计罚款) VALUES(%s, '未归还', 0)", ('borrow',)),
+    ('after_return_update (trigger)', """
+        UPDATE borrow_status SET 借阅状态 = 借阅状态, 预计罚款 = 预计罚款 WHERE 借阅记录编号 = %s
+    """, ('borrow',)),
+    ('roll_borrow_status (procedure)', """
+        UPDATE borrow_status s
+        JOIN borrow_records br ON s.借阅记录编号 = br.借阅记录编号
+        SET s.预计罚款 = calculate_fine(DATEDIFF(CURDATE(), br.应还日期))
+        WHERE br.归还日期 IS NULL AND br.应还日期 < CURDATE()
+    """, ()),
+    # 归档
+    ('archive_borrow_records (procedure)', """
+        SELECT 借阅记录编号 FROM borrow_records
+        WHERE 归还日期 IS NOT NULL AND 借阅日期 < CURDATE() - INTERVAL 365 DAY
+        ORDER BY 借阅记录编号
+        LIMIT 1000
+        FOR UPDATE
+    """, ()),
+]
+
+
+class QueryRecorder:
+    """替换 db.execute_query，记录执行过的 SELECT 语句"""
+
+    def __init__(self, db):
+        self.db = db
+        self.execute_query = db.execute_query
+        self.statements = []
+
+    def __call__(self, query, params=None):
+        if query.strip().upper().startswith('SELECT'):
+            self.statements.append((query, params))
+        return self.execute_query(query, params)
+
+
+def explain(db, query, params):
+    return db.execute_query("EXPLAIN " + query, params) or []
+
+
+def full_scans(plan):
+    """返回计划中对大表做全表扫描的行"""
+    return [row for row in plan if row.get('type') == 'ALL' and (row.get('rows') or 0) > SMALL_TABLE_ROWS]
+
+
+def collect(ops, bench):
+    """逐个运行基准场景，返回 [(场景名, 语句, 参数)]"""
+    recorder = QueryRecorder(ops.db)
+    ops.db.execute_query = recorder
+    collected = []
+    try:
+        for name, func, _ in bench.scenarios():
+            if name in FULL_SCAN_SCENARIOS:
+                continue
+            recorder.statements = []
+            func()
+            collected.extend((name, query, params) for query, params in recorder.statements)
+    finally:
+        ops.db.execute_query = recorder.execute_query
+    return collected
+
+
+def check(ops, bench):
+    """检查全部语句，返回发现的问题列表"""
+    samples = {
+        'reader': bench.reader_ids[0],
+        'book': bench.book_ids[0],
+        'borrow': bench.borrow_range[1],
+    }
+    statements = collect(ops, bench)
+    statements += [(name, query, tuple(samples[kind] for kind in kinds)) for name, query, kinds in PROCEDURE_STATEMENTS]
+
+    problems = []
+    seen = set()
+    for name, query, params in statements:
+        if (name, query) in seen:
+            continue
+        seen.add((name, query))
+        for row in full_scans(explain(ops.db, query, params)):
+            problems.append((name, row['table'], row['rows'], ' '.join(query.split())))
+    return problems
+
+
+def main(args):
+    ops = DatabaseOperations(args.conn)
+    bench = Benchmark(ops, iterations=1, warmup=0)
+    bench.prepare()
+    problems = check(ops, bench)
+    for name, table, rows, query in problems:
+        print(f"全表扫描: {name} 表 {table} 约 {rows} 行\n    {query}")
+    if problems:
+        print(f"共 {len(problems)} 条语句出现全表扫描")
+        return 1
+    print("未发现全表扫描")
+    return 0
+
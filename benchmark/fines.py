@@ -0,0 +1,86 @@
+"""核对 fine_policy 与数据库函数的计算结果，并对比批量计算与逐条 SQL 调用的耗时
+
+随机生成（借阅日期, 应还日期, 归还日期），覆盖未归还、按时归还、超期归还以及正好到期等边界，
+逐条与 calculate_overdue_days、calculate_fine、get_borrow_status 函数的结果比较；
+再用 fine_policy.assess 重新计算 borrow_status 表中的借阅状态与预计罚款。
+"""
+import datetime
+import random
+import time
+
+import fine_policy
+from db_operations import DatabaseOperations
+
+SQL_CHECK = """
+SELECT calculate_overdue_days(%s, %s, %s) AS overdue_days,
+       calculate_fine(calculate_overdue_days(%s, %s, %s)) AS fine_amount,
+       get_borrow_status(%s, %s) AS status
+"""
+
+
+def random_loans(rng, today, count):
+    """生成 count 条随机借阅，日期集中在 today 前后，便于覆盖边界"""
+    loans = []
+    for _ in range(count):
+        borrowed = today - datetime.timedelta(days=rng.randint(0, 400))
+        due = borrowed + datetime.timedelta(days=rng.choice((0, 1, 30, 30, 60)))
+        kind = rng.random()
+        if kind < 0.3:
+            returned = None
+        elif kind < 0.4:
+            returned = due
+        else:
+            returned = min(borrowed + datetime.timedelta(days=rng.randint(0, 120)), today)
+        loans.append((borrowed, due, returned))
+    return loans
+
+
+def check_functions(ops, loans, today):
+    """逐条与数据库函数比较，返回 (问题列表, 逐条 SQL 总耗时毫秒)"""
+    problems = []
+    expected = fine_policy.assess(loans, today)
+    start = time.perf_counter()
+    for loan, (days, fine) in zip(loans, expected):
+        borrowed, due, returned = loan
+        row = ops.db.execute_query(SQL_CHECK, (borrowed, due, returned, borrowed, due, returned, due, returned))[0]
+        status = fine_policy.borrow_status(due, returned)
+        if (row['overdue_days'], row['fine_amount'], row['status']) != (days, fine, status):
+            problems.append(f"{loan}: 数据库 {row['overdue_days']} 天 {row['fine_amount']} 元 {row['status']}，"
+                            f"本地 {days} 天 {fine} 元 {status}")
+    return problems, (time.perf_counter() - start) * 1000
+
+
+def check_borrow_status(ops, today):
+    """用本地规则重新计算 borrow_status 表，返回问题列表"""
+    rows = ops.db.execute_query(
+        "SELECT br.借阅记录编号, br.借阅日期, br.应还日期, br.归还日期, s.借阅状态, s.预计罚款 "
+        "FROM borrow_records br JOIN borrow_status s ON br.借阅记录编号 = s.借阅记录编号") or []
+    problems = []
+    for row, (_, fine) in zip(rows, fine_policy.assess(rows, today)):
+        status = fine_policy.borrow_status(row['应还日期'], row['归还日期'])
+        if (row['借阅状态'], row['预计罚款']) != (status, fine):
+            problems.append(f"借阅记录 {row['借阅记录编号']}: borrow_status 为 {row['借阅状态']} {row['预计罚款']} 元，"
+                            f"本地 {status} {fine} 元")
+    return problems
+
+
+def main(args):
+    ops = DatabaseOperations(args.conn)
+    today = ops.db.execute_query("SELECT CURDATE() AS today")[0]['today']
+    loans = random_loans(random.Random(args.seed), today, args.cases)
+
+    problems, sql_ms = check_functions(ops, loans, today)
+    batch = (loans * (args.batch // len(loans) + 1))[:args.batch]
+    start = time.perf_counter()
+    fine_policy.assess(batch, today)
+    batch_ms = (time.perf_counter() - start) * 1000
+    print(f"逐条 SQL 函数: {args.cases} 条 {sql_ms:.1f} ms；fine_policy.assess: {args.batch} 条 {batch_ms:.1f} ms")
+
+    problems += check_borrow_status(ops, today)
+    for problem in problems[:50]:
+        print(f"不一致: {problem}")
+    if problems:
+        print(f"共 {len(problems)} 处不一致")
+        return 1
+    print("本地计算与数据库一致")
+    return 0
@@ -0,0 +1,199 @@
+"""按给定规模和随机种子生成测试数据
+
+借阅量按 Zipf 分布集中在少数热门图书和活跃读者上；同一种子、同一规模总是生成相同的数据。
+"""
+import bisect
+import datetime
+import itertools
+import random
+
+from db_connection import DatabaseConnection
+
+# 各表的默认规模
+DEFAULT_SCALE = {
+    'publishers': 200,
+    'categories': 50,
+    'books': 50000,
+    'readers': 20000,
+    'borrows': 1000000,
+}
+
+# 每个事务写入的行数
+BATCH_SIZE = 5000
+
+# 借阅日期分布在最近多少天内
+HISTORY_DAYS = 3 * 365
+
+# 借阅期限（天），与 borrow_book 存储过程一致
+LOAN_DAYS = 30
+
+# 已到期借阅中超期归还的比例
+LATE_RATE = 0.15
+
+# 图书初始库存：导入借阅记录时 after_borrow_insert 触发器会逐条扣减，先给足库存，最后再修正
+STOCK_SENTINEL = 1000000000
+
+TITLE_WORDS = ['数据库', '系统', '概论', '算法', '设计', '历史', '文学', '科学', '原理', '导论',
+               '中国', '世界', '现代', '艺术', '教程', '实践', '网络', '计算机', '经济', '哲学',
+               '心理学', '物理', '化学', '数学', '工程', '管理', '社会', '文化', '语言', '音乐']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰涛明超秀霞平刚桂英华建国志'
+
+
+def zipf_cum_weights(n, s=1.1):
+    """前 n 个名次的 Zipf 累积权重，供 random.choices / bisect 使用"""
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _pick(rng, cum_weights):
+    return bisect.bisect_left(cum_weights, rng.random() * cum_weights[-1])
+
+
+def book_id(i):
+    return f"BK{i:08d}"
+
+
+def reader_id(i):
+    return f"R{i:08d}"
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(db, query, rows):
+    count = 0
+    for batch in _batches(rows):
+        with db.transaction():
+            db.execute_many(query, batch)
+        count += len(batch)
+    return count
+
+
+def reset(db, tables):
+    """清空测试表（外键检查在同一连接上临时关闭）"""
+    with db.transaction():
+        db.execute_query("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for table in tables:
+                db.execute_query(f"TRUNCATE TABLE {table}")
+        finally:
+            db.execute_query("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def generate(db, scale=None, seed=42, today=None, log=print):
+    """生成全部测试数据，返回各表写入的行数"""
+    scale = dict(DEFAULT_SCALE, **(scale or {}))
+    today = today or datetime.date.today()
+    rng = random.Random(seed)
+    counts = {}
+
+    reset(db, ['fines_archive', 'borrow_records_archive', 'borrow_status', 'book_daily_borrows', 'book_popularity', 'reader_stats', 'fines', 'borrow_records', 'books', 'readers', 'categories', 'publishers'])
+
+    counts['publishers'] = _insert(
+        db, "INSERT INTO publishers (名称, 地址, 联系电话) VALUES (%s, %s, %s)",
+        ((f"测试出版社{i:04d}", f"测试地址{i}号", f"010-{i:08d}") for i in range(1, scale['publishers'] + 1)))
+    counts['categories'] = _insert(
+        db, "INSERT INTO categories (类别名称) VALUES (%s)",
+        ((f"测试类别{i:03d}",) for i in range(1, scale['categories'] + 1)))
+    log(f"出版社 {counts['publishers']} 行，类别 {counts['categories']} 行")
+
+    def books():
+        for i in range(scale['books']):
+            title = ''.join(rng.sample(TITLE_WORDS, rng.randint(2, 4)))
+            author = rng.choice(SURNAMES) + ''.join(rng.choices(GIVEN_NAMES, k=rng.randint(1, 2)))
+            yield (book_id(i), title, author,
+                   rng.randint(1, scale['publishers']), rng.randint(1, scale['categories']),
+                   STOCK_SENTINEL, STOCK_SENTINEL)
+    counts['books'] = _insert(
+        db, "INSERT INTO books (索书号, 书名, 作者, 出版社, 类别id, 总数, 在库数量) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        books())
+    log(f"图书 {counts['books']} 行")
+
+    counts['readers'] = _insert(
+        db, "INSERT INTO readers (读者卡号, 姓名, 证件号) VALUES (%s, %s, %s)",
+        ((reader_id(i), rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES), f"110101{i:012d}")
+         for i in range(scale['readers'])))
+    log(f"读者 {counts['readers']} 行")
+
+    # 热门图书、活跃读者的名次随机打乱，避免编号小的总是最热门
+    book_rank = list(range(scale['books']))
+    rng.shuffle(book_rank)
+    reader_rank = list(range(scale['readers']))
+    rng.shuffle(reader_rank)
+    book_weights = zipf_cum_weights(scale['books'])
+    reader_weights = zipf_cum_weights(scale['readers'], s=0.8)
+    open_loans = [0] * scale['books']
+
+    def borrows():
+        for _ in range(scale['borrows']):
+            book = book_rank[_pick(rng, book_weights)]
+            reader = reader_rank[_pick(rng, reader_weights)]
+            borrow_date = today - datetime.timedelta(days=rng.randint(0, HISTORY_DAYS))
+            due_date = borrow_date + datetime.timedelta(days=LOAN_DAYS)
+
+            if due_date >= today and rng.random() < 0.7:
+                return_date = None
+            elif due_date < today and rng.random() < 0.01:
+                return_date = None  # 少量逾期未还
+            elif rng.random() < LATE_RATE:
+                return_date = due_date + datetime.timedelta(days=rng.randint(1, 30))
+            else:
+                return_date = borrow_date + datetime.timedelta(days=rng.randint(0, LOAN_DAYS))
+            if return_date is not None and return_date > today:
+                return_date = today
+
+            if return_date is None:
+                open_loans[book] += 1
+            yield (reader_id(reader), book_id(book), borrow_date, due_date, return_date)
+    counts['borrow_records'] = _insert(
+        db, "INSERT INTO borrow_records (读者卡号, 索书号, 借阅日期, 应还日期, 归还日期) VALUES (%s, %s, %s, %s, %s)",
+        borrows())
+    log(f"借阅记录 {counts['borrow_records']} 行")
+
+    # 超期归还的罚款与 after_return_update 触发器的规则一致：每天 1 元
+    counts['fines'] = db.execute_query("""
+        INSERT INTO fines (借阅记录编号, 罚款金额)
+        SELECT 借阅记录编号, DATEDIFF(归还日期, 应还日期) * 1.00
+        FROM borrow_records
+        WHERE 归还日期 > 应还日期
+    """)
+    log(f"罚款记录 {counts['fines']} 行")
+
+    # 修正库存：总数至少覆盖未归还数量
+    with db.transaction():
+        db.execute_query("CREATE TEMPORARY TABLE bench_stock (索书号 VARCHAR(20) PRIMARY KEY, 总数 INT, 在库数量 INT)")
+        stock = []
+        for i in range(scale['books']):
+            total = open_loans[i] + rng.randint(1, 10)
+            stock.append((book_id(i), total, total - open_loans[i]))
+        for batch in _batches(stock):
+            db.execute_many("INSERT INTO bench_stock VALUES (%s, %s, %s)", batch)
+        db.execute_query("""
+            UPDATE books b JOIN bench_stock s ON b.索书号 = s.索书号
+            SET b.总数 = s.总数, b.在库数量 = s.在库数量
+        """)
+        db.execute_query("DROP TEMPORARY TABLE bench_stock")
+    log("库存已修正")
+
+    return counts
+
+
+def main(args):
+    db = DatabaseConnection(args.conn)
+    if not db.connect():
+        return 1
+    scale = {key: getattr(args, key) for key in DEFAULT_SCALE if getattr(args, key) is not None}
+    try:
+        counts = generate(db, scale, seed=args.seed)
+    finally:
+        db.disconnect()
+    print("生成完成: " + "，".join(f"{table} {count} 行" for table, count in counts.items()))
+    return 0
@@ -0,0 +1,60 @@
+"""对比字典游标与 ResultSet（共享列索引的元组行）读取同一批借阅记录时的内存占用和耗时
+
+用 tracemalloc 统计取回结果后仍被结果对象占用的内存，两种方式读取的是同一条查询。
+"""
+import gc
+import time
+import tracemalloc
+
+from db_connection import ResultSet
+from db_operations import DatabaseOperations
+
+QUERY = "SELECT * FROM borrow_records ORDER BY 借阅记录编号 LIMIT %s"
+
+
+def fetch_dicts(connection, rows):
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(QUERY, (rows,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def fetch_result_set(connection, rows):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(QUERY, (rows,))
+        return ResultSet.from_cursor(cursor, cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def measure(fetch, connection, rows):
+    """返回 (行数, 结果占用的内存 MB, 峰值内存 MB, 耗时毫秒)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fetch(connection, rows)
+    elapsed = (time.perf_counter() - start) * 1000
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    connection.commit()
+    count = len(result)
+    del result
+    return count, current / 2 ** 20, peak / 2 ** 20, elapsed
+
+
+def main(args):
+    ops = DatabaseOperations(args.conn)
+    db = ops.db
+    db.connect()
+    pooled = db.pool.acquire()
+    try:
+        for name, fetch in (('dict 游标', fetch_dicts), ('ResultSet', fetch_result_set)):
+            count, current, peak, elapsed = measure(fetch, pooled.connection, args.rows)
+            print(f"{name:<10} {count} 行  占用 {current:.1f} MB  峰值 {peak:.1f} MB  "
+                  f"每行 {current * 2 ** 20 / max(count, 1):.0f} 字节  {elapsed:.0f} ms")
+    finally:
+        db.pool.release(pooled)
+    return 0
@@ -0,0 +1,35 @@
+"""测量运行指标本身的开销：不连接数据库，对计数、耗时记录和输出分别计时"""
+import time
+
+import instrumentation
+import metrics
+from db_connection import ProcedureResult
+
+
+def per_call_ns(func, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def main(args):
+    success = ProcedureResult(out_params={'p_success': True, 'p_message': '借阅成功'})
+    failure = ProcedureResult(out_params={'p_success': False, 'p_message': '借阅失败：该书已无库存'})
+    event = instrumentation.QueryEvent('query', "SELECT * FROM books WHERE 索书号 = %s", ('TP-0001',),
+                                       1.7, 1, 2, 'db_operations.get_book_by_id:120')
+    hook = metrics.QueryMetrics()
+
+    results = [
+        ('record_circulation(成功)', per_call_ns(lambda: metrics.record_circulation('borrow', success), args.calls)),
+        ('record_circulation(失败)', per_call_ns(lambda: metrics.record_circulation('borrow', failure), args.calls)),
+        ('QueryMetrics.on_query', per_call_ns(lambda: hook.on_query(event), args.calls)),
+        ('instrumentation.caller', per_call_ns(lambda: instrumentation.caller(1), args.calls)),
+    ]
+    for name, ns in results:
+        print(f"{name:<28} {ns:8.0f} ns/次")
+
+    start = time.perf_counter()
+    text = metrics.REGISTRY.render()
+    print(f"{'REGISTRY.render':<28} {(time.perf_counter() - start) * 1000:8.2f} ms（{text.count(chr(10))} 行）")
+    return 0
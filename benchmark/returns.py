@@ -0,0 +1,144 @@
+"""还书吞吐量测试：逐条调用 return_book 存储过程与批量 return_books 的对比
+
+每轮为专用测试图书插入一批借阅记录（一半已超期，会产生罚款），归还后连同罚款一起删除。
+在迁移前后各运行一次并用 compare 对比，即可看到还书触发器和存储过程改动的效果。
+"""
+import datetime
+import time
+
+import fine_policy
+from db_operations import DatabaseOperations
+
+from benchmark.runner import refresh_reader_stats, summarize, write_report
+
+TEST_BOOK_ID = 'BENCH-RET-0001'
+
+
+def overdue_days(index):
+    """setup 中第 index 条借阅在今天归还时的超期天数"""
+    return 1 + index % 30 if index % 2 == 0 else 0
+
+
+def setup(ops, loans):
+    """插入测试图书和 loans 条未归还记录，返回借阅记录编号列表"""
+    teardown(ops)
+    publisher = ops.db.execute_query("SELECT MIN(出版社号) AS id FROM publishers")[0]['id']
+    category = ops.db.execute_query("SELECT MIN(类别id) AS id FROM categories")[0]['id']
+    readers = [row['读者卡号'] for row in ops.db.execute_query("SELECT 读者卡号 FROM readers LIMIT 100")]
+    if not readers:
+        raise RuntimeError("测试库中没有读者，请先运行 python -m benchmark generate")
+
+    today = datetime.date.today()
+    rows = []
+    for i in range(loans):
+        # 偶数条已超期 1~30 天，奇数条尚未到期，与 overdue_days 一致
+        borrowed = today - datetime.timedelta(days=30 + overdue_days(i) if i % 2 == 0 else 1)
+        rows.append((readers[i % len(readers)], TEST_BOOK_ID, borrowed, borrowed + datetime.timedelta(days=30)))
+
+    with ops.db.transaction():
+        ops.db.execute_query(
+            "INSERT INTO books (索书号, 书名, 作者, 出版社, 类别id, 总数, 在库数量) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            (TEST_BOOK_ID, '还书测试', '测试', publisher, category, loans, loans))
+        ops.db.execute_many(
+            "INSERT INTO borrow_records (读者卡号, 索书号, 借阅日期, 应还日期) VALUES (%s, %s, %s, %s)", rows)
+    return [row['借阅记录编号'] for row in ops.db.execute_query(
+        "SELECT 借阅记录编号 FROM borrow_records WHERE 索书号 = %s ORDER BY 借阅记录编号", (TEST_BOOK_ID,))]
+
+
+def teardown(ops):
+    """删除测试图书及其借阅、罚款记录，并重新统计借过这本书的读者
+
+    直接删除借阅和罚款记录不会触发统计更新，参与测试的读者在 reader_stats 中会留下偏差；
+    book_popularity、book_daily_borrows 随图书、borrow_status 随借阅记录级联删除。
+    """
+    with ops.db.transaction():
+        readers = [row['读者卡号'] for row in ops.db.execute_query(
+            "SELECT DISTINCT 读者卡号 FROM borrow_records WHERE 索书号 = %s", (TEST_BOOK_ID,)) or []]
+        ops.db.execute_query(
+            "DELETE f FROM fines f JOIN borrow_records br ON f.借阅记录编号 = br.借阅记录编号 WHERE br.索书号 = %s",
+            (TEST_BOOK_ID,))
+        ops.db.execute_query("DELETE FROM borrow_records WHERE 索书号 = %s", (TEST_BOOK_ID,))
+        ops.db.execute_query("DELETE FROM books WHERE 索书号 = %s", (TEST_BOOK_ID,))
+        refresh_reader_stats(ops, readers)
+
+
+def check_outcome(index, borrow_id, result):
+    """检查一条还书结果的罚款金额和提示信息，超期的借阅必须按天数罚款；返回问题或 None"""
+    days = overdue_days(index)
+    fine = result.get('p_fine_amount', 0) or 0
+    if days:
+        expected = fine_policy.fine_for(days)
+        if fine != expected or f"超期{days}天" not in result.message:
+            return f"借阅记录 {borrow_id} 超期 {days} 天，罚款 {fine}（应为 {expected}），提示“{result.message}”"
+    elif fine or '未超期' not in result.message:
+        return f"借阅记录 {borrow_id} 未超期，罚款 {fine}，提示“{result.message}”"
+    return None
+
+
+def verify(ops, borrow_ids):
+    """归还后库存应恢复，超期记录各有一条罚款"""
+    book = ops.get_book_by_id(TEST_BOOK_ID)
+    fines = ops.db.execute_query(
+        "SELECT COUNT(*) AS n FROM fines f JOIN borrow_records br ON f.借阅记录编号 = br.借阅记录编号 "
+        "WHERE br.索书号 = %s", (TEST_BOOK_ID,))[0]['n']
+    problems = []
+    if book['在库数量'] != book['总数']:
+        problems.append(f"在库数量 {book['在库数量']}，应为 {book['总数']}")
+    if fines != (len(borrow_ids) + 1) // 2:
+        problems.append(f"罚款记录 {fines} 条，应为 {(len(borrow_ids) + 1) // 2} 条")
+    return problems
+
+
+def time_single(ops, loans):
+    """逐条调用 return_book，返回 (每条耗时列表, 问题列表)"""
+    borrow_ids = setup(ops, loans)
+    try:
+        timings, problems = [], []
+        for index, borrow_id in enumerate(borrow_ids):
+            start = time.perf_counter()
+            result = ops.return_book(borrow_id)
+            timings.append(round((time.perf_counter() - start) * 1000, 3))
+            if result is None or not result.success:
+                raise RuntimeError(f"还书失败: {borrow_id}")
+            problems.append(check_outcome(index, borrow_id, result))
+        return timings, [p for p in problems if p] + verify(ops, borrow_ids)
+    finally:
+        teardown(ops)
+
+
+def time_batch(ops, loans, batch_size):
+    """按 batch_size 条一批调用 return_books，返回 (每批耗时列表, 问题列表)"""
+    borrow_ids = setup(ops, loans)
+    try:
+        timings, problems = [], []
+        for i in range(0, len(borrow_ids), batch_size):
+            start = time.perf_counter()
+            outcomes = ops.return_books(borrow_ids[i:i + batch_size])
+            timings.append(round((time.perf_counter() - start) * 1000, 3))
+            if outcomes is None or not all(result.success for _, result in outcomes):
+                raise RuntimeError("批量还书失败")
+            problems += [check_outcome(i + offset, borrow_id, result)
+                         for offset, (borrow_id, result) in enumerate(outcomes)]
+        return timings, [p for p in problems if p] + verify(ops, borrow_ids)
+    finally:
+        teardown(ops)
+
+
+def main(args):
+    ops = DatabaseOperations(args.conn)
+    results, problems = {}, []
+
+    for name, (timings, found) in (
+        ('return_book', time_single(ops, args.loans)),
+        (f'return_books(batch {args.batch_size})', time_batch(ops, args.loans, args.batch_size)),
+    ):
+        results[name] = summarize(timings)
+        results[name]['returns_per_second'] = round(args.loans / (sum(timings) / 1000), 1)
+        problems += [f"{name}: {problem}" for problem in found]
+        print(f"{name:<28} {results[name]['returns_per_second']} 本/秒  p50={results[name]['p50_ms']} ms")
+
+    write_report(args.output, results, {'loans': args.loans, 'batch_size': args.batch_size})
+    print(f"报告已写入 {args.output}")
+    for problem in problems:
+        print(f"不一致: {problem}")
+    return 1 if problems else 0
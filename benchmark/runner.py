@@ -0,0 +1,241 @@
+"""对 DatabaseOperations 的各个方法和存储过程计时，输出 p50/p95/p99 报告"""
+import datetime
+import json
+import platform
+import random
+import time
+
+from db_operations import DatabaseOperations
+from instrumentation import QueryStats
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数，sorted_values 需已升序排列"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(timings_ms, errors=0):
+    values = sorted(timings_ms)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'mean_ms': round(sum(values) / len(values), 3) if values else None,
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'max_ms': values[-1] if values else None,
+    }
+
+
+class Benchmark:
+    """一次基准运行：准备样本参数，逐个场景计时"""
+
+    def __init__(self, ops, iterations=200, warmup=5, seed=42, include_writes=False):
+        self.ops = ops
+        self.iterations = iterations
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.include_writes = include_writes
+        self.results = {}
+
+    def _sample(self, query, key, n=200):
+        rows = self.ops.db.execute_query(query, (n,)) or []
+        return [row[key] for row in rows]
+
+    def prepare(self):
+        """从库中抽取查询用的样本参数"""
+        self.book_ids = self._sample("SELECT 索书号 FROM books ORDER BY RAND() LIMIT %s", '索书号')
+        self.reader_ids = self._sample("SELECT 读者卡号 FROM readers ORDER BY RAND() LIMIT %s", '读者卡号')
+        bounds = self.ops.db.execute_query(
+            "SELECT MIN(借阅记录编号) AS lo, MAX(借阅记录编号) AS hi FROM borrow_records")
+        self.borrow_range = (bounds[0]['lo'] or 0, bounds[0]['hi'] or 0) if bounds else (0, 0)
+        self.titles = [
+            row['书名'][:2] for row in
+            self.ops.db.execute_query("SELECT 书名 FROM books ORDER BY RAND() LIMIT %s", (50,)) or []
+        ]
+        if not (self.book_ids and self.reader_ids and self.titles):
+            raise RuntimeError("测试库中没有数据，请先运行 python -m benchmark generate")
+
+    def borrow_id(self):
+        return self.rng.randint(*self.borrow_range)
+
+    def measure(self, name, func, iterations=None):
+        """调用 func() 若干次并记录耗时；抛出异常或返回 None（数据库层出错时的返回值）计为错误"""
+        iterations = iterations or self.iterations
+        for _ in range(min(self.warmup, iterations)):
+            try:
+                func()
+            except Exception:
+                pass
+
+        timings, errors = [], 0
+        for _ in range(iterations):
+            start = time.perf_counter()
+            try:
+                result = func()
+            except Exception:
+                result = None
+            if result is None:
+                errors += 1
+                continue
+            timings.append(round((time.perf_counter() - start) * 1000, 3))
+        self.results[name] = summarize(timings, errors)
+        print(f"{name:<40} p50={self.results[name]['p50_ms']} ms  p99={self.results[name]['p99_ms']} ms")
+
+    def scenarios(self):
+        """(名称, 调用, 迭代次数) 列表；迭代次数为 None 时使用默认值"""
+        ops, rng = self.ops, self.rng
+        items = [
+            ('get_book_by_id', lambda: ops.get_book_by_id(rng.choice(self.book_ids)), None),
+            ('get_reader_by_id', lambda: ops.get_reader_by_id(rng.choice(self.reader_ids)), None),
+            ('get_borrow_record_by_id', lambda: ops.get_borrow_record_by_id(self.borrow_id()), None),
+            ('get_fine_by_borrow_id', lambda: ops.get_fine_by_borrow_id(self.borrow_id()), None),
+            ('get_books_page', lambda: ops.get_books_page(rng.choice(self.book_ids)), None),
+            ('get_readers_page', lambda: ops.get_readers_page(rng.choice(self.reader_ids)), None),
+            ('get_borrow_records_page', lambda: ops.get_borrow_records_page(self.borrow_id()), None),
+            ('get_borrow_records_page(unreturned)',
+             lambda: ops.get_borrow_records_page(self.borrow_id(), unreturned_only=True), None),
+            ('get_fines_page', lambda: ops.get_fines_page(), None),
+            ('get_borrow_info_page', lambda: ops.get_borrow_info_page(self.borrow_id()), None),
+            ('get_all_categories', ops.get_all_categories, None),
+            ('get_all_publishers', ops.get_all_publishers, None),
+            ('search_books(索书号)', lambda: ops.search_books('索书号', rng.choice(self.book_ids)[:6]), None),
+            ('search_books(书名)', lambda: ops.search_books('书名', rng.choice(self.titles)), None),
+            ('search_books_ranked', lambda: ops.search_books_ranked(rng.choice(self.titles)), None),
+            ('search_borrow_info(读者卡号)',
+             lambda: ops.search_borrow_info('读者卡号', rng.choice(self.reader_ids)), None),
+            ('search_borrow_info(借阅状态)', lambda: ops.search_borrow_info('借阅状态', '未归还'), None),
+            ('search_borrow_info(超期)', lambda: ops.search_borrow_info('借阅状态', '超期'), None),
+            ('get_top_books', lambda: ops.get_top_books(10), None),
+            ('get_top_books(30d)', lambda: ops.get_top_books(10, '30d'), None),
+            ('get_reader_stats', lambda: ops.get_reader_stats(rng.choice(self.reader_ids)), None),
+            ('get_reader_stats_page', lambda: ops.get_reader_stats_page(rng.choice(self.reader_ids)), None),
+            ('get_reader_borrow_history', lambda: ops.get_reader_borrow_history(rng.choice(self.reader_ids)), None),
+            ('get_reader_borrow_history(archive)',
+             lambda: ops.get_reader_borrow_history(rng.choice(self.reader_ids), include_archive=True), None),
+            ('calculate_overdue_days',
+             lambda: ops.calculate_overdue_days('2024-01-01', '2024-01-31', '2024-02-15'), None),
+            ('calculate_fine', lambda: ops.calculate_fine(15), None),
+            ('calculate_fines(1000)', lambda: ops.calculate_fines(
+                [('2024-01-01', '2024-01-31', None if i % 3 else '2024-02-15') for i in range(1000)]), None),
+            ('get_all_books', ops.get_all_books, 1),
+            ('get_all_readers', ops.get_all_readers, 1),
+            ('get_all_borrow_records', ops.get_all_borrow_records, 1),
+            ('iter_borrow_records', lambda: sum(1 for _ in ops.iter_borrow_records(as_tuples=True)), 1),
+            ('get_all_fines', ops.get_all_fines, 1),
+            ('get_borrow_info_view', ops.get_borrow_info_view, 1),
+            ('get_book_info_view', ops.get_book_info_view, 1),
+        ]
+        if self.include_writes:
+            items += self.write_scenarios()
+        return items
+
+    def write_scenarios(self):
+        """借书、还书、续借存储过程（会修改测试数据）"""
+        ops, rng = self.ops, self.rng
+        open_ids = [row['借阅记录编号'] for row in ops.db.execute_query(
+            "SELECT 借阅记录编号 FROM borrow_records WHERE 归还日期 IS NULL AND 应还日期 >= CURDATE() LIMIT %s",
+            (self.iterations * 2 + self.warmup * 2,)) or []]
+        renew_ids = iter(open_ids[::2])
+        return_ids = iter(open_ids[1::2])
+        return [
+            ('borrow_book (procedure)',
+             lambda: ops.borrow_book(rng.choice(self.reader_ids), rng.choice(self.book_ids)), None),
+            ('renew_book (procedure)', lambda: ops.renew_book(next(renew_ids)), None),
+            ('return_book (procedure)', lambda: ops.return_book(next(return_ids)), None),
+        ]
+
+    def run(self):
+        self.prepare()
+        for name, func, iterations in self.scenarios():
+            self.measure(name, func, iterations)
+        return self.results
+
+
+def write_report(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+def refresh_reader_stats(ops, reader_ids):
+    """按借阅和罚款记录重新统计 reader_ids 这些读者的 reader_stats，规则与 rebuild_reader_stats 相同
+
+    测试清理时直接删除借阅和罚款记录不会触发统计更新，只重算涉及的读者，不必全量重建。
+    """
+    if not reader_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(reader_ids))
+    ops.db.execute_query(f"""
+        UPDATE reader_stats s
+        LEFT JOIN (
+            SELECT 读者卡号,
+                   COUNT(*) AS 总借阅次数,
+                   SUM(归还日期 IS NULL) AS 未归还数量,
+                   SUM(归还日期 > 应还日期) AS 超期归还次数,
+                   COALESCE(SUM(罚款金额), 0) AS 罚款总额
+            FROM (
+                SELECT br.读者卡号, br.应还日期, br.归还日期, f.罚款金额
+                FROM borrow_records br
+                LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
+                WHERE br.读者卡号 IN ({placeholders})
+                UNION ALL
+                SELECT a.读者卡号, a.应还日期, a.归还日期, fa.罚款金额
+                FROM borrow_records_archive a
+                LEFT JOIN fines_archive fa ON a.借阅记录编号 = fa.借阅记录编号
+                WHERE a.读者卡号 IN ({placeholders})
+            ) br
+            GROUP BY 读者卡号
+        ) t ON s.读者卡号 = t.读者卡号
+        SET s.总借阅次数 = COALESCE(t.总借阅次数, 0),
+            s.未归还数量 = COALESCE(t.未归还数量, 0),
+            s.超期归还次数 = COALESCE(t.超期归还次数, 0),
+            s.罚款总额 = COALESCE(t.罚款总额, 0)
+        WHERE s.读者卡号 IN ({placeholders})
+    """, tuple(reader_ids) * 3)
+
+
+def compare(base_path, new_path):
+    """对比两份报告的 p50/p95/p99，打印变化比例"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)['results']
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)['results']
+
+    print(f"{'场景':<40} {'p50':>18} {'p95':>18} {'p99':>18}")
+    for name in sorted(set(base) & set(new)):
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            old_value, new_value = base[name][key], new[name][key]
+            if old_value and new_value:
+                cells.append(f"{old_value:>7}→{new_value:<7}{new_value / old_value:>4.2f}x")
+            else:
+                cells.append(f"{'-':>18}")
+        print(f"{name:<40} " + " ".join(cells))
+
+
+def main(args):
+    ops = DatabaseOperations(args.conn)
+    stats = ops.db.add_hook(QueryStats()) if args.query_stats else None
+    bench = Benchmark(ops, iterations=args.iterations, warmup=args.warmup,
+                      seed=args.seed, include_writes=args.include_writes)
+    results = bench.run()
+    if stats:
+        stats.dump(args.query_stats)
+        print(f"查询统计已写入 {args.query_stats}")
+    meta = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'iterations': args.iterations,
+        'seed': args.seed,
+        'include_writes': args.include_writes,
+        'database': ops.db.database,
+        'host': ops.db.host,
+        'statement_cache_size': ops.db.statement_cache_size,
+        'statement_cache': ops.db.statement_cache_stats(),
+    }
+    write_report(args.output, results, meta)
+    print(f"报告已写入 {args.output}")
+    return 0
@@ -1,6 +1,6 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning
+from tkinter import ttk, messagebox, filedialog
+from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, run_async
 
 class BookManagementFrame(ttk.Frame):
     """图书信息管理界面"""
@@ -20,12 +20,13 @@ class BookManagementFrame(ttk.Frame):
         ttk.Button(button_frame, text="添加图书", command=self.add_book).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="编辑图书", command=self.edit_book).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="删除图书", command=self.delete_book).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="批量导入", command=self.import_books).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('索书号', '书名', '作者', '出版社', '类别id', '总数', '在库数量')
         headings = ('索书号', '书名', '作者', '出版社', '类别', '总数', '在库数量')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
@@ -33,23 +34,21 @@ class BookManagementFrame(ttk.Frame):
     
     def refresh(self):
         """刷新表格数据"""
-        self.table.clear()
-        
-        # 获取所有图书
-        books = self.db.get_all_books()
-        if not books:
-            return
-        
-        # 获取所有出版社和类别
-        publishers = {p['出版社号']: p['名称'] for p in self.db.get_all_publishers()}
-        categories = {c['类别id']: c['类别名称'] for c in self.db.get_all_categories()}
-        
-        # 添加数据到表格
-        for book in books:
-            publisher_name = publishers.get(book['出版社'], str(book['出版社']))
-            category_name = categories.get(book['类别id'], str(book['类别id']))
-            
-            self.table.add_row((
+        # 在后台获取出版社和类别后再分页加载图书
+        run_async(self.table, self.fetch_lookups, on_success=self.load_books)
+    
+    def fetch_lookups(self):
+        """获取出版社和类别的缓存对照表（在后台线程执行）"""
+        return self.db.get_publisher_lookup(), self.db.get_category_lookup()
+    
+    def load_books(self, lookups):
+        """按页加载图书"""
+        publishers, categories = lookups
+        
+        def to_row(book):
+            publisher_name = publishers.name_of(book['出版社'])
+            category_name = categories.name_of(book['类别id'])
+            return (
                 book['索书号'],
                 book['书名'],
                 book['作者'],
@@ -57,17 +56,15 @@ class BookManagementFrame(ttk.Frame):
                 category_name,
                 book['总数'],
                 book['在库数量']
-            ))
+            )
+        
+        self.table.load_pages(self.db.get_books_page, to_row)
     
     def add_book(self):
         """添加图书"""
-        # 获取出版社和类别列表
-        publishers = self.db.get_all_publishers()
-        categories = self.db.get_all_categories()
-        
-        # 创建出版社和类别的映射
-        publisher_map = {p['名称']: p['出版社号'] for p in publishers}
-        category_map = {c['类别名称']: c['类别id'] for c in categories}
+        # 获取出版社和类别的名称→编号映射
+        publisher_map = self.db.get_publisher_lookup().by_name
+        category_map = self.db.get_category_lookup().by_name
         
         # 创建输入对话框
         fields = {
@@ -134,17 +131,17 @@ class BookManagementFrame(ttk.Frame):
             show_error("获取图书信息失败")
             return
         
-        # 获取出版社和类别列表
-        publishers = self.db.get_all_publishers()
-        categories = self.db.get_all_categories()
+        # 获取出版社和类别的对照表
+        publishers = self.db.get_publisher_lookup()
+        categories = self.db.get_category_lookup()
         
         # 创建出版社和类别的映射
-        publisher_map = {p['名称']: p['出版社号'] for p in publishers}
-        category_map = {c['类别名称']: c['类别id'] for c in categories}
+        publisher_map = publishers.by_name
+        category_map = categories.by_name
         
         # 获取当前出版社和类别名称
-        current_publisher = next((p['名称'] for p in publishers if p['出版社号'] == book['出版社']), '')
-        current_category = next((c['类别名称'] for c in categories if c['类别id'] == book['类别id']), '')
+        current_publisher = publishers.by_id.get(book['出版社'], '')
+        current_category = categories.by_id.get(book['类别id'], '')
         
         # 创建输入对话框
         fields = {
@@ -209,6 +206,27 @@ class BookManagementFrame(ttk.Frame):
             except Exception as e:
                 show_error(f"更新图书时出错: {str(e)}")
     
+    def import_books(self):
+        """从 CSV / JSONL 文件批量导入图书"""
+        path = filedialog.askopenfilename(
+            title="选择导入文件",
+            filetypes=[("CSV / JSONL 文件", "*.csv *.jsonl"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        
+        run_async(self.table, self.db.import_books, path,
+                  on_success=self.show_import_report,
+                  on_error=lambda e: show_error(f"导入图书时出错: {str(e)}"))
+    
+    def show_import_report(self, report):
+        """显示导入结果并刷新表格"""
+        if report.rejected:
+            show_warning(report.describe())
+        else:
+            show_info(report.describe())
+        self.refresh()
+    
     def delete_book(self):
         """删除图书"""
         # 获取选中的图书
@@ -262,8 +280,11 @@ class CategoryManagementFrame(ttk.Frame):
         """刷新表格数据"""
         self.table.clear()
         
-        # 获取所有类别
-        categories = self.db.get_all_categories()
+        # 在后台获取所有类别
+        run_async(self.table, self.db.get_all_categories, on_success=self.show_categories)
+    
+    def show_categories(self, categories):
+        """显示类别列表"""
         if not categories:
             return
         
@@ -327,8 +348,11 @@ class PublisherManagementFrame(ttk.Frame):
         """刷新表格数据"""
         self.table.clear()
         
-        # 获取所有出版社
-        publishers = self.db.get_all_publishers()
+        # 在后台获取所有出版社
+        run_async(self.table, self.db.get_all_publishers, on_success=self.show_publishers)
+    
+    def show_publishers(self, publishers):
+        """显示出版社列表"""
         if not publishers:
             return
         
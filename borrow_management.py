@@ -7,7 +7,69 @@ Created on Sat Apr 12 20:14:47 2025
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_date
+from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_date, run_async
+
+# 批量操作结果中最多列出的失败记录数
+MAX_LISTED_FAILURES = 20
+
+# 批量操作确认框中最多列出的借阅记录编号
+MAX_LISTED_IDS = 10
+
+def confirm_batch(action, selected_items):
+    """按实际选中的记录数请求确认，返回要处理的借阅记录编号列表，取消时返回 None"""
+    # 按编号去重，条数与将要提交的批量操作一致
+    borrow_ids = list(dict.fromkeys(item['values'][0] for item in selected_items))
+    if len(borrow_ids) == 1:
+        prompt = f"确定要{action}图书 '{selected_items[0]['values'][2]}' 吗？"
+    else:
+        listed = ", ".join(str(borrow_id) for borrow_id in borrow_ids[:MAX_LISTED_IDS])
+        if len(borrow_ids) > MAX_LISTED_IDS:
+            listed += " ……"
+        prompt = f"确定要{action}选中的 {len(borrow_ids)} 本图书吗？\n借阅记录: {listed}"
+    return borrow_ids if messagebox.askyesno(f"确认{action}", prompt) else None
+
+def run_operation(owner, button, func, *args, on_success):
+    """在后台线程执行借书、还书、续借，执行期间禁用按钮以免重复提交"""
+    button.state(['disabled'])
+    
+    def finish(callback, value):
+        if button.winfo_exists():
+            button.state(['!disabled'])
+        callback(value)
+    
+    run_async(owner, func, *args,
+              on_success=lambda result: finish(on_success, result),
+              on_error=lambda error: finish(lambda e: show_error(f"操作失败: {e}"), error))
+
+def show_outcomes(action, outcomes, fine_key=None):
+    """显示批量还书、续借的结果；只有一条记录时与单条操作的提示相同"""
+    if len(outcomes) == 1:
+        result = outcomes[0][1]
+        fine = result.get(fine_key, 0) if fine_key else 0
+        if not result.success:
+            show_error(result.message)
+        elif fine > 0:
+            show_warning(f"{result.message}\n需缴纳罚款: ¥{fine:.2f}")
+        else:
+            show_info(result.message)
+        return
+    
+    failures = [(borrow_id, result) for borrow_id, result in outcomes if not result.success]
+    lines = [f"{action}成功 {len(outcomes) - len(failures)} 本，失败 {len(failures)} 本"]
+    if fine_key:
+        total_fine = sum(result.get(fine_key, 0) for _, result in outcomes if result.success)
+        if total_fine > 0:
+            lines.append(f"需缴纳罚款合计: ¥{total_fine:.2f}")
+    for borrow_id, result in failures[:MAX_LISTED_FAILURES]:
+        lines.append(f"借阅记录 {borrow_id}: {result.message}")
+    if len(failures) > MAX_LISTED_FAILURES:
+        lines.append(f"……其余 {len(failures) - MAX_LISTED_FAILURES} 条未列出")
+    
+    message = "\n".join(lines)
+    if failures or (fine_key and total_fine > 0):
+        show_warning(message)
+    else:
+        show_info(message)
 
 class BorrowManagementFrame(ttk.Frame):
     """借阅管理界面"""
@@ -24,13 +86,14 @@ class BorrowManagementFrame(ttk.Frame):
         button_frame = ttk.Frame(self)
         button_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        ttk.Button(button_frame, text="借阅图书", command=self.borrow_book).pack(side=tk.LEFT, padx=5)
+        self.borrow_button = ttk.Button(button_frame, text="借阅图书", command=self.borrow_book)
+        self.borrow_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('借阅记录编号', '读者卡号', '索书号', '借阅日期', '应还日期', '归还日期')
         headings = ('借阅记录编号', '读者卡号', '索书号', '借阅日期', '应还日期', '归还日期')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
@@ -38,35 +101,34 @@ class BorrowManagementFrame(ttk.Frame):
     
     def refresh(self):
         """刷新表格数据"""
-        self.table.clear()
-        
-        # 获取所有借阅记录
-        borrow_records = self.db.get_all_borrow_records()
-        if not borrow_records:
-            return
-        
-        # 添加数据到表格
-        for record in borrow_records:
-            self.table.add_row((
-                record['借阅记录编号'],
-                record['读者卡号'],
-                record['索书号'],
-                format_date(record['借阅日期']),
-                format_date(record['应还日期']),
-                format_date(record['归还日期']) if record['归还日期'] else '未归还'
-            ))
+        # 按页加载借阅记录
+        self.table.load_pages(self.db.get_borrow_records_page, lambda record: (
+            record['借阅记录编号'],
+            record['读者卡号'],
+            record['索书号'],
+            format_date(record['借阅日期']),
+            format_date(record['应还日期']),
+            format_date(record['归还日期']) if record['归还日期'] else '未归还'
+        ))
     
     def borrow_book(self):
         """借阅图书"""
-        # 获取所有读者
-        readers = self.db.get_all_readers()
+        # 在后台获取读者和图书列表，完成后再弹出选择对话框
+        run_async(self.table, self.fetch_borrow_choices, on_success=self.choose_and_borrow)
+    
+    def fetch_borrow_choices(self):
+        """获取所有读者和所有图书（在后台线程执行）"""
+        return self.db.get_all_readers(), self.db.get_all_books()
+    
+    def choose_and_borrow(self, choices):
+        """选择读者和图书并借阅"""
+        readers, books = choices
         if not readers:
             show_error("没有可用的读者")
             return
         
         # 获取所有可借阅的图书
-        books = self.db.get_all_books()
-        available_books = [book for book in books if book['在库数量'] > 0]
+        available_books = [book for book in books or [] if book['在库数量'] > 0]
         
         if not available_books:
             show_error("没有可借阅的图书")
@@ -94,27 +156,21 @@ class BorrowManagementFrame(ttk.Frame):
         # 获取图书ID
         book_id = book_dialog.result.split(' - ')[0]
         
-        # 调用借书存储过程
-        result = self.db.borrow_book(reader_id, book_id)
-        
-        try:
-            if result and len(result) >= 1:
-                for res_set in result:
-                    if len(res_set) > 0 and isinstance(res_set[0], dict):
-                        output_params = res_set[0]
-                        success = output_params.get('p_success', False)
-                        message = output_params.get('p_message', '')
-                        
-                        if success:
-                            show_info(message)
-                            self.refresh()
-                        else:
-                            show_error(message)
-                        return
-                        
+        # 在后台调用借书存储过程
+        run_operation(self.table, self.borrow_button, self.db.borrow_book, reader_id, book_id,
+                      on_success=self.show_borrow_result)
+    
+    def show_borrow_result(self, result):
+        """显示借书结果"""
+        if result is None:
             show_error("借阅图书失败: 未能获取操作结果")
-        except Exception as e:
-            show_error(f"借阅图书失败: {str(e)}")
+            return
+        
+        if result.success:
+            show_info(result.message)
+            self.refresh()
+        else:
+            show_error(result.message)
 
 class ReturnManagementFrame(ttk.Frame):
     """归还管理界面"""
@@ -131,13 +187,14 @@ class ReturnManagementFrame(ttk.Frame):
         button_frame = ttk.Frame(self)
         button_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        ttk.Button(button_frame, text="归还图书", command=self.return_book).pack(side=tk.LEFT, padx=5)
+        self.return_button = ttk.Button(button_frame, text="归还图书", command=self.return_book)
+        self.return_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('借阅记录编号', '读者卡号', '索书号', '借阅日期', '应还日期', '归还日期')
         headings = ('借阅记录编号', '读者卡号', '索书号', '借阅日期', '应还日期', '归还日期')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
@@ -145,66 +202,43 @@ class ReturnManagementFrame(ttk.Frame):
     
     def refresh(self):
         """刷新表格数据"""
-        self.table.clear()
-        
-        # 获取所有未归还的借阅记录
-        borrow_records = self.db.get_all_borrow_records()
-        if not borrow_records:
-            return
-        
-        # 过滤出未归还的记录
-        unreturned_records = [record for record in borrow_records if record['归还日期'] is None]
-        
-        # 添加数据到表格
-        for record in unreturned_records:
-            self.table.add_row((
+        # 按页加载未归还的借阅记录
+        self.table.load_pages(
+            lambda after: self.db.get_borrow_records_page(after, unreturned_only=True),
+            lambda record: (
                 record['借阅记录编号'],
                 record['读者卡号'],
                 record['索书号'],
                 format_date(record['借阅日期']),
                 format_date(record['应还日期']),
                 '未归还'
-            ))
+            )
+        )
     
     def return_book(self):
-        """归还图书"""
+        """归还图书，可按住 Ctrl / Shift 选择多条记录一次归还"""
         # 获取选中的借阅记录
-        selected_item = self.table.get_selected_item()
-        if not selected_item:
+        selected_items = self.table.get_selected_items()
+        if not selected_items:
             show_warning("请先选择要归还的图书")
             return
         
-        # 获取借阅记录ID
-        values = selected_item['values']
-        borrow_id = values[0]
-        
-        # 确认归还
-        if messagebox.askyesno("确认归还", f"确定要归还图书 '{values[2]}' 吗？"):
-            # 调用还书存储过程
-            result = self.db.return_book(borrow_id)
-            
-            try:
-                if result and len(result) >= 1:
-                    for res_set in result:
-                        if len(res_set) > 0 and isinstance(res_set[0], dict):
-                            output_params = res_set[0]
-                            success = output_params.get('p_success', False)
-                            message = output_params.get('p_message', '')
-                            fine = output_params.get('p_fine_amount', 0)
-                            
-                            if success:
-                                if fine > 0:
-                                    show_warning(f"{message}\n需缴纳罚款: ¥{fine:.2f}")
-                                else:
-                                    show_info(message)
-                                self.refresh()
-                            else:
-                                show_error(message)
-                            return
-                            
-                show_error("归还图书失败: 未能获取操作结果")
-            except Exception as e:
-                show_error(f"归还图书失败: {str(e)}")
+        # 确认归还（包括已滚出可见区域的选中记录）
+        borrow_ids = confirm_batch("归还", selected_items)
+        if borrow_ids:
+            # 在后台线程中用一个事务批量还书
+            run_operation(self.table, self.return_button, self.db.return_books, borrow_ids,
+                          on_success=self.show_return_result)
+    
+    def show_return_result(self, outcomes):
+        """显示还书结果"""
+        if outcomes is None:
+            show_error("归还图书失败: 未能获取操作结果")
+            return
+        
+        show_outcomes("归还", outcomes, fine_key='p_fine_amount')
+        if any(result.success for _, result in outcomes):
+            self.refresh()
 
 class RenewManagementFrame(ttk.Frame):
     """续借管理界面"""
@@ -221,13 +255,14 @@ class RenewManagementFrame(ttk.Frame):
         button_frame = ttk.Frame(self)
         button_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        ttk.Button(button_frame, text="续借图书", command=self.renew_book).pack(side=tk.LEFT, padx=5)
+        self.renew_button = ttk.Button(button_frame, text="续借图书", command=self.renew_book)
+        self.renew_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('借阅记录编号', '读者卡号', '索书号', '借阅日期', '应还日期', '归还日期')
         headings = ('借阅记录编号', '读者卡号', '索书号', '借阅日期', '应还日期', '归还日期')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
@@ -235,63 +270,43 @@ class RenewManagementFrame(ttk.Frame):
     
     def refresh(self):
         """刷新表格数据"""
-        self.table.clear()
-        
-        # 获取所有未归还的借阅记录
-        borrow_records = self.db.get_all_borrow_records()
-        if not borrow_records:
-            return
-        
-        # 过滤出未归还的记录
-        unreturned_records = [record for record in borrow_records if record['归还日期'] is None]
-        
-        # 添加数据到表格
-        for record in unreturned_records:
-            self.table.add_row((
+        # 按页加载未归还的借阅记录
+        self.table.load_pages(
+            lambda after: self.db.get_borrow_records_page(after, unreturned_only=True),
+            lambda record: (
                 record['借阅记录编号'],
                 record['读者卡号'],
                 record['索书号'],
                 format_date(record['借阅日期']),
                 format_date(record['应还日期']),
                 '未归还'
-            ))
+            )
+        )
     
     def renew_book(self):
-        """续借图书"""
+        """续借图书，可按住 Ctrl / Shift 选择多条记录一次续借"""
         # 获取选中的借阅记录
-        selected_item = self.table.get_selected_item()
-        if not selected_item:
+        selected_items = self.table.get_selected_items()
+        if not selected_items:
             show_warning("请先选择要续借的图书")
             return
         
-        # 获取借阅记录ID
-        values = selected_item['values']
-        borrow_id = values[0]
-        
-        # 确认续借
-        if messagebox.askyesno("确认续借", f"确定要续借图书 '{values[2]}' 吗？"):
-            # 调用续借存储过程
-            result = self.db.renew_book(borrow_id)
-            
-            try:
-                if result and len(result) >= 1:
-                    for res_set in result:
-                        if len(res_set) > 0 and isinstance(res_set[0], dict):
-                            output_params = res_set[0]
-                            success = output_params.get('p_success', False)
-                            message = output_params.get('p_message', '')
-                            new_due_date = output_params.get('p_new_due_date', '')
-                            
-                            if success:
-                                show_info(message)
-                                self.refresh()
-                            else:
-                                show_error(message)
-                            return
-                            
-                show_error("续借图书失败: 未能获取操作结果")
-            except Exception as e:
-                show_error(f"续借图书失败: {str(e)}")
+        # 确认续借（包括已滚出可见区域的选中记录）
+        borrow_ids = confirm_batch("续借", selected_items)
+        if borrow_ids:
+            # 在后台线程中用一个事务批量续借
+            run_operation(self.table, self.renew_button, self.db.renew_books, borrow_ids,
+                          on_success=self.show_renew_result)
+    
+    def show_renew_result(self, outcomes):
+        """显示续借结果"""
+        if outcomes is None:
+            show_error("续借图书失败: 未能获取操作结果")
+            return
+        
+        show_outcomes("续借", outcomes)
+        if any(result.success for _, result in outcomes):
+            self.refresh()
 
 class BorrowHistoryWindow(tk.Toplevel):
     """借阅历史窗口"""
@@ -321,12 +336,14 @@ class BorrowHistoryWindow(tk.Toplevel):
         """加载借阅历史数据"""
         self.table.clear()
         
-        # 调用查询读者借阅历史的存储过程
-        result = self.db.get_reader_borrow_history(self.reader_id)
-        
-        if result and len(result) > 0:
+        # 在后台调用查询读者借阅历史的存储过程
+        run_async(self.table, self.db.get_reader_borrow_history, self.reader_id, on_success=self.show_history)
+    
+    def show_history(self, result):
+        """显示借阅历史数据"""
+        if result and result.rows:
             # 添加数据到表格
-            for record in result[0]:
+            for record in result.rows:
                 self.table.add_row((
                     record['借阅记录编号'],
                     record['索书号'],
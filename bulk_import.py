@@ -0,0 +1,201 @@
+"""从 CSV / JSONL 文件批量导入图书和读者
+
+CSV 文件首行为表头；JSONL 文件每行一个 JSON 对象。字段名与数据库列名一致，
+图书的出版社、类别既可以写名称（“出版社”“类别”），也可以写编号（“出版社”“类别id”）。
+"""
+import csv
+import json
+import os
+
+from mysql.connector import Error
+
+BOOK_INSERT_SQL = """
+INSERT INTO books (索书号, 书名, 作者, 出版社, 类别id, 总数, 在库数量)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+READER_INSERT_SQL = """
+INSERT INTO readers (读者卡号, 姓名, 证件号)
+VALUES (%s, %s, %s)
+"""
+
+# 每个事务写入的默认行数
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ImportReport:
+    """导入结果：成功行数与被拒绝的行"""
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = []  # [(行号, 原因)]
+
+    def reject(self, line_no, reason):
+        self.rejected.append((line_no, reason))
+
+    def __str__(self):
+        return f"导入成功 {self.accepted} 行，拒绝 {len(self.rejected)} 行"
+
+    def describe(self, max_rejects=20):
+        """生成给用户看的导入结果，最多列出 max_rejects 条被拒绝的行"""
+        lines = [str(self)]
+        for line_no, reason in self.rejected[:max_rejects]:
+            lines.append(f"第 {line_no} 行: {reason}")
+        if len(self.rejected) > max_rejects:
+            lines.append(f"……其余 {len(self.rejected) - max_rejects} 行未列出")
+        return "\n".join(lines)
+
+
+def read_records(path):
+    """逐行读取文件，产生 (行号, 记录, 错误)；解析失败的行记录为 None"""
+    is_jsonl = os.path.splitext(path)[1].lower() in ('.jsonl', '.json')
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if is_jsonl:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, None, f"JSON 格式错误: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_no, None, "每行必须是一个 JSON 对象"
+                    continue
+                yield line_no, record, None
+        else:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record, None
+
+
+def _text(record, key, max_length):
+    """取出必填文本字段并检查长度"""
+    value = record.get(key)
+    value = '' if value is None else str(value).strip()
+    if not value:
+        raise ValueError(f"{key}不能为空")
+    if len(value) > max_length:
+        raise ValueError(f"{key}超过 {max_length} 个字符")
+    return value
+
+
+def _integer(record, key, default=None):
+    value = record.get(key)
+    if value is None or str(value).strip() == '':
+        if default is None:
+            raise ValueError(f"{key}不能为空")
+        return default
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{key}必须是整数")
+
+
+def _resolve(record, name_key, id_key, lookup, label):
+    """把名称或编号解析为编号"""
+    name = record.get(name_key)
+    if name is not None and str(name).strip() in lookup.by_name:
+        return lookup.by_name[str(name).strip()]
+    for key in (id_key, name_key):
+        value = record.get(key)
+        if value is not None and str(value).strip().isdigit() and int(value) in lookup.by_id:
+            return int(value)
+    raise ValueError(f"{label}不存在")
+
+
+def validate_book(record, publishers, categories):
+    """按 books 表的约束检查一行图书数据，返回插入参数；不合法时抛出 ValueError"""
+    book_id = _text(record, '索书号', 20)
+    title = _text(record, '书名', 200)
+    author = _text(record, '作者', 100)
+    publisher_id = _resolve(record, '出版社', '出版社号', publishers, '出版社')
+    category_id = _resolve(record, '类别', '类别id', categories, '类别')
+    total = _integer(record, '总数')
+    available = _integer(record, '在库数量', default=total)
+
+    if total <= 0:
+        raise ValueError("总数必须大于 0")
+    if available < 0:
+        raise ValueError("在库数量不能小于 0")
+    if available > total:
+        raise ValueError("在库数量不能大于总数")
+    return (book_id, title, author, publisher_id, category_id, total, available)
+
+
+def validate_reader(record):
+    """按 readers 表的约束检查一行读者数据，返回插入参数；不合法时抛出 ValueError"""
+    return (
+        _text(record, '读者卡号', 20),
+        _text(record, '姓名', 50),
+        _text(record, '证件号', 18)
+    )
+
+
+def _flush(db, query, batch, report):
+    """在一个事务中写入一批数据（死锁时整批重放）；整批失败时逐行重试，只拒绝出错的行"""
+    if not batch:
+        return
+    try:
+        db.run_in_transaction(db.execute_many, query, [params for _, params in batch])
+        report.accepted += len(batch)
+    except Error:
+        for line_no, params in batch:
+            try:
+                db.run_in_transaction(db.execute_many, query, [params])
+                report.accepted += 1
+            except Error as e:
+                report.reject(line_no, str(e))
+
+
+def _import(db, path, query, validate, unique_indexes, batch_size):
+    report = ImportReport()
+    seen = [set() for _ in unique_indexes]
+    batch = []
+
+    for line_no, record, error in read_records(path):
+        if error:
+            report.reject(line_no, error)
+            continue
+        try:
+            params = validate(record)
+        except ValueError as e:
+            report.reject(line_no, str(e))
+            continue
+
+        # 文件内重复的唯一键在客户端直接拒绝
+        duplicate = next((i for i, index in enumerate(unique_indexes) if params[index] in seen[i]), None)
+        if duplicate is not None:
+            report.reject(line_no, f"文件中存在重复的值: {params[unique_indexes[duplicate]]}")
+            continue
+        for i, index in enumerate(unique_indexes):
+            seen[i].add(params[index])
+
+        batch.append((line_no, params))
+        if len(batch) >= batch_size:
+            _flush(db, query, batch, report)
+            batch = []
+
+    _flush(db, query, batch, report)
+    return report
+
+
+def import_books(db_ops, path, batch_size=DEFAULT_BATCH_SIZE):
+    """从文件批量导入图书，出版社、类别名称在内存中解析为编号"""
+    publishers = db_ops.get_publisher_lookup()
+    categories = db_ops.get_category_lookup()
+    return _import(
+        db_ops.db, path, BOOK_INSERT_SQL,
+        lambda record: validate_book(record, publishers, categories),
+        unique_indexes=(0,),
+        batch_size=batch_size
+    )
+
+
+def import_readers(db_ops, path, batch_size=DEFAULT_BATCH_SIZE):
+    """从文件批量导入读者"""
+    return _import(
+        db_ops.db, path, READER_INSERT_SQL, validate_reader,
+        unique_indexes=(0, 2),
+        batch_size=batch_size
+    )
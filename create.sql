@@ -33,7 +33,9 @@ CREATE TABLE books (
     在库数量 INT NOT NULL CHECK (在库数量 >= 0),
     FOREIGN KEY (出版社) REFERENCES publishers(出版社号),
     FOREIGN KEY (类别id) REFERENCES categories(类别id),
-    CHECK (在库数量 <= 总数)
+    CHECK (在库数量 <= 总数),
+    -- 书名、作者全文索引，ngram 分词支持中文检索
+    FULLTEXT INDEX ft_books_title_author (书名, 作者) WITH PARSER ngram
 ) ENGINE=InnoDB;
 
 -- 创建读者表
@@ -54,7 +56,13 @@ CREATE TABLE borrow_records (
     FOREIGN KEY (读者卡号) REFERENCES readers(读者卡号),
     FOREIGN KEY (索书号) REFERENCES books(索书号),
     CHECK (应还日期 > 借阅日期),
-    CHECK (归还日期 IS NULL OR 归还日期 >= 借阅日期)
+    CHECK (归还日期 IS NULL OR 归还日期 >= 借阅日期),
+    -- 某读者未归还的借阅（删除读者前的检查、还书/续借列表），同时作为读者卡号外键的索引
+    INDEX idx_borrow_reader_returned (读者卡号, 归还日期),
+    -- 未归还且已超期的借阅
+    INDEX idx_borrow_returned_due (归还日期, 应还日期),
+    -- 按借阅日期倒序的读者借阅历史
+    INDEX idx_borrow_reader_date (读者卡号, 借阅日期)
 ) ENGINE=InnoDB;
 
 -- 创建罚款记录表
@@ -65,6 +73,70 @@ CREATE TABLE fines (
     FOREIGN KEY (借阅记录编号) REFERENCES borrow_records(借阅记录编号)
 ) ENGINE=InnoDB;
 
+-- 创建借阅记录归档表：已归还且超过保留期限的借阅记录由 archive_borrow_records 分批移入，
+-- 借阅记录表只保留近期和未归还的记录（分区表不支持外键，因此采用单独的归档表）
+CREATE TABLE borrow_records_archive (
+    借阅记录编号 INT PRIMARY KEY,
+    读者卡号 VARCHAR(20) NOT NULL,
+    索书号 VARCHAR(20) NOT NULL,
+    借阅日期 DATE NOT NULL,
+    应还日期 DATE NOT NULL,
+    归还日期 DATE NOT NULL,
+    FOREIGN KEY (读者卡号) REFERENCES readers(读者卡号),
+    FOREIGN KEY (索书号) REFERENCES books(索书号),
+    INDEX idx_archive_reader_date (读者卡号, 借阅日期)
+) ENGINE=InnoDB;
+
+-- 创建罚款记录归档表：随借阅记录一起归档
+CREATE TABLE fines_archive (
+    罚款记录号 INT PRIMARY KEY,
+    借阅记录编号 INT NOT NULL UNIQUE,
+    罚款金额 DECIMAL(10,2) NOT NULL,
+    FOREIGN KEY (借阅记录编号) REFERENCES borrow_records_archive(借阅记录编号)
+) ENGINE=InnoDB;
+
+-- 创建借阅状态表：每条借阅记录的借阅状态与预计罚款，由借书、还书、续借触发器维护，
+-- 未归还且已超期记录的预计罚款随日期增长，由 roll_borrow_status 每天更新
+CREATE TABLE borrow_status (
+    借阅记录编号 INT PRIMARY KEY,
+    借阅状态 VARCHAR(10) NOT NULL,
+    预计罚款 DECIMAL(10,2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (借阅记录编号) REFERENCES borrow_records(借阅记录编号) ON DELETE CASCADE,
+    INDEX idx_borrow_status (借阅状态)
+) ENGINE=InnoDB;
+
+-- 创建读者借阅统计表：由借书、还书、罚款触发器增量维护，rebuild_reader_stats 可全量重建
+CREATE TABLE reader_stats (
+    读者卡号 VARCHAR(20) PRIMARY KEY,
+    总借阅次数 INT NOT NULL DEFAULT 0,
+    未归还数量 INT NOT NULL DEFAULT 0,
+    超期归还次数 INT NOT NULL DEFAULT 0,
+    罚款总额 DECIMAL(12,2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (读者卡号) REFERENCES readers(读者卡号) ON DELETE CASCADE,
+    INDEX idx_reader_stats_fine (罚款总额)
+) ENGINE=InnoDB;
+
+-- 创建图书借阅热度表：借书触发器累加计数，“最受欢迎图书”按计数列索引倒序读取前 N 行
+-- 近30天借阅次数统计借阅日期在最近 30 天（含当天）内的借阅，由 roll_book_popularity 每天移出过期的部分
+CREATE TABLE book_popularity (
+    索书号 VARCHAR(20) PRIMARY KEY,
+    总借阅次数 INT NOT NULL DEFAULT 0,
+    近30天借阅次数 INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (索书号) REFERENCES books(索书号) ON DELETE CASCADE,
+    INDEX idx_popularity_total (总借阅次数),
+    INDEX idx_popularity_recent (近30天借阅次数)
+) ENGINE=InnoDB;
+
+-- 创建图书每日借阅次数表：只保存最近 30 天，过期时从近30天借阅次数中减去
+CREATE TABLE book_daily_borrows (
+    索书号 VARCHAR(20) NOT NULL,
+    借阅日期 DATE NOT NULL,
+    借阅次数 INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (索书号, 借阅日期),
+    FOREIGN KEY (索书号) REFERENCES books(索书号) ON DELETE CASCADE,
+    INDEX idx_daily_borrows_date (借阅日期)
+) ENGINE=InnoDB;
+
 
 
 
@@ -130,7 +202,7 @@ INSERT INTO fines (借阅记录编号, 罚款金额) VALUES
 ----------------------------创建触发器----------------------------------------------
 
 
--- 借书触发器：更新图书在库数量
+-- 借书触发器：更新图书在库数量、读者借阅统计、图书借阅热度和借阅状态
 DELIMITER //
 CREATE TRIGGER after_borrow_insert
 AFTER INSERT ON borrow_records
@@ -139,10 +211,37 @@ BEGIN
     UPDATE books 
     SET 在库数量 = 在库数量 - 1
     WHERE 索书号 = NEW.索书号;
+    
+    -- 直接插入已归还的历史记录时同样计入统计
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数)
+    VALUES(NEW.读者卡号, 1, NEW.归还日期 IS NULL, IFNULL(NEW.归还日期 > NEW.应还日期, 0))
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        未归还数量 = 未归还数量 + (NEW.归还日期 IS NULL),
+        超期归还次数 = 超期归还次数 + IFNULL(NEW.归还日期 > NEW.应还日期, 0);
+    
+    -- 借阅热度：借阅日期在最近 30 天内的同时计入当天的计数桶
+    INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数)
+    VALUES(NEW.索书号, 1, NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY)
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        近30天借阅次数 = 近30天借阅次数 + (NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY);
+    
+    IF NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY THEN
+        INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数)
+        VALUES(NEW.索书号, NEW.借阅日期, 1)
+        ON DUPLICATE KEY UPDATE 借阅次数 = 借阅次数 + 1;
+    END IF;
+    
+    -- 借阅状态
+    INSERT INTO borrow_status(借阅记录编号, 借阅状态, 预计罚款)
+    VALUES(NEW.借阅记录编号, get_borrow_status(NEW.应还日期, NEW.归还日期),
+           calculate_fine(calculate_overdue_days(NEW.借阅日期, NEW.应还日期, NEW.归还日期)));
 END //
 DELIMITER ;
 
--- 还书触发器：更新图书在库数量
+-- 还书触发器：归还时更新图书在库数量，超期的同时插入罚款记录（每天1元）
+-- 两项处理放在同一个触发器中，归还条件只判断一次，罚款也只在这里计算；归还、续借都会更新借阅状态
 DELIMITER //
 CREATE TRIGGER after_return_update
 AFTER UPDATE ON borrow_records
@@ -152,30 +251,52 @@ BEGIN
         UPDATE books 
         SET 在库数量 = 在库数量 + 1
         WHERE 索书号 = NEW.索书号;
+        
+        UPDATE reader_stats
+        SET 未归还数量 = 未归还数量 - 1,
+            超期归还次数 = 超期归还次数 + (NEW.归还日期 > NEW.应还日期)
+        WHERE 读者卡号 = NEW.读者卡号;
+        
+        IF NEW.归还日期 > NEW.应还日期 THEN
+            INSERT INTO fines(借阅记录编号, 罚款金额)
+            VALUES(NEW.借阅记录编号, DATEDIFF(NEW.归还日期, NEW.应还日期) * 1.00);
+        END IF;
+    END IF;
+    
+    -- 归还或续借后重新计算借阅状态与预计罚款
+    IF NOT (OLD.归还日期 <=> NEW.归还日期) OR OLD.应还日期 <> NEW.应还日期 THEN
+        UPDATE borrow_status
+        SET 借阅状态 = get_borrow_status(NEW.应还日期, NEW.归还日期),
+            预计罚款 = calculate_fine(calculate_overdue_days(NEW.借阅日期, NEW.应还日期, NEW.归还日期))
+        WHERE 借阅记录编号 = NEW.借阅记录编号;
     END IF;
 END //
 DELIMITER ;
 
--- 超期罚款触发器：自动插入罚款记录
+-- 新增读者触发器：建立读者借阅统计记录
 DELIMITER //
-CREATE TRIGGER after_return_fine
-AFTER UPDATE ON borrow_records
+CREATE TRIGGER after_reader_insert
+AFTER INSERT ON readers
+FOR EACH ROW
+BEGIN
+    INSERT IGNORE INTO reader_stats(读者卡号) VALUES(NEW.读者卡号);
+END //
+DELIMITER ;
+
+-- 罚款触发器：累加读者罚款总额（还书触发器自动生成的罚款和手工添加的罚款都经过这里）
+DELIMITER //
+CREATE TRIGGER after_fine_insert
+AFTER INSERT ON fines
 FOR EACH ROW
 BEGIN
-    DECLARE days_overdue INT;
-    DECLARE fine_amount DECIMAL(10,2);
+    DECLARE v_reader_id VARCHAR(20);
     
-    IF OLD.归还日期 IS NULL AND NEW.归还日期 IS NOT NULL 
-       AND NEW.归还日期 > NEW.应还日期 THEN
-        -- 计算超期天数
-        SET days_overdue = DATEDIFF(NEW.归还日期, NEW.应还日期);
-        -- 计算罚款金额（每天1元）
-        SET fine_amount = days_overdue * 1.00;
-        
-        -- 插入罚款记录
-        INSERT INTO fines(借阅记录编号, 罚款金额)
-        VALUES(NEW.借阅记录编号, fine_amount);
-    END IF;
+    SELECT 读者卡号 INTO v_reader_id
+    FROM borrow_records WHERE 借阅记录编号 = NEW.借阅记录编号;
+    
+    UPDATE reader_stats
+    SET 罚款总额 = 罚款总额 + NEW.罚款金额
+    WHERE 读者卡号 = v_reader_id;
 END //
 DELIMITER ;
 
@@ -188,31 +309,27 @@ FROM books b
 JOIN publishers p ON b.出版社 = p.出版社号
 JOIN categories c ON b.类别id = c.类别id;
 
--- 创建借阅信息视图
+-- 创建借阅信息视图：借阅状态、预计罚款读取 borrow_status，不再逐行计算
 CREATE VIEW borrow_info_view AS
 SELECT br.借阅记录编号, r.读者卡号, r.姓名 AS 读者姓名, 
        b.索书号, b.书名, br.借阅日期, br.应还日期, br.归还日期,
-       CASE 
-           WHEN br.归还日期 IS NULL THEN '未归还'
-           WHEN br.归还日期 > br.应还日期 THEN '已超期归还'
-           ELSE '已按时归还'
-       END AS 借阅状态,
-       CASE 
-           WHEN br.归还日期 IS NULL AND CURDATE() > br.应还日期 
-                THEN DATEDIFF(CURDATE(), br.应还日期) * 1.00
-           WHEN br.归还日期 > br.应还日期 
-                THEN DATEDIFF(br.归还日期, br.应还日期) * 1.00
-           ELSE 0
-       END AS 预计罚款
+       s.借阅状态, s.预计罚款
 FROM borrow_records br
+JOIN borrow_status s ON br.借阅记录编号 = s.借阅记录编号
 JOIN readers r ON br.读者卡号 = r.读者卡号
 JOIN books b ON br.索书号 = b.索书号;
 
+-- 创建读者借阅统计视图
+CREATE VIEW reader_stats_view AS
+SELECT s.读者卡号, r.姓名, s.总借阅次数, s.未归还数量, s.超期归还次数, s.罚款总额
+FROM reader_stats s
+JOIN readers r ON s.读者卡号 = r.读者卡号;
+
 ----------------------------存储过程----------------------------------------------
 
--- 查询指定读者借阅情况的存储过程
+-- 查询指定读者借阅情况的存储过程，p_include_archive 为 TRUE 时同时查询归档记录
 DELIMITER //
-CREATE PROCEDURE get_reader_borrow_history(IN reader_id VARCHAR(20))
+CREATE PROCEDURE get_reader_borrow_history(IN reader_id VARCHAR(20), IN p_include_archive BOOLEAN)
 BEGIN
     SELECT br.借阅记录编号, b.索书号, b.书名, b.作者, 
            p.名称 AS 出版社, br.借阅日期, br.应还日期, br.归还日期,
@@ -229,12 +346,18 @@ BEGIN
                     THEN DATEDIFF(br.归还日期, br.应还日期)
                ELSE 0
            END AS 超期天数,
-           f.罚款金额
-    FROM borrow_records br
+           COALESCE(f.罚款金额, fa.罚款金额) AS 罚款金额
+    FROM (
+        SELECT 借阅记录编号, 索书号, 借阅日期, 应还日期, 归还日期
+        FROM borrow_records WHERE 读者卡号 = reader_id
+        UNION ALL
+        SELECT 借阅记录编号, 索书号, 借阅日期, 应还日期, 归还日期
+        FROM borrow_records_archive WHERE 读者卡号 = reader_id AND p_include_archive
+    ) br
     JOIN books b ON br.索书号 = b.索书号
     JOIN publishers p ON b.出版社 = p.出版社号
     LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
-    WHERE br.读者卡号 = reader_id
+    LEFT JOIN fines_archive fa ON br.借阅记录编号 = fa.借阅记录编号
     ORDER BY br.借阅日期 DESC;
 END //
 DELIMITER ;
@@ -248,12 +371,13 @@ CREATE PROCEDURE borrow_book(
     OUT p_message VARCHAR(100)
 )
 BEGIN
-    DECLARE book_available INT DEFAULT 0;
+    DECLARE book_available INT DEFAULT NULL;
     DECLARE current_date_var DATE DEFAULT CURDATE();
     DECLARE due_date DATE;
     
-    -- 检查图书是否有库存
-    SELECT 在库数量 INTO book_available FROM books WHERE 索书号 = p_book_id;
+    -- 检查图书是否有库存，同时锁定该图书行直到事务提交：
+    -- 多个柜台同时借同一本书时依次执行，不会同时借出最后一本
+    SELECT 在库数量 INTO book_available FROM books WHERE 索书号 = p_book_id FOR UPDATE;
     
     -- 设置默认值
     SET p_success = FALSE;
@@ -262,8 +386,10 @@ BEGIN
     -- 设置应还日期（借阅日期后30天）
     SET due_date = DATE_ADD(current_date_var, INTERVAL 30 DAY);
     
-    -- 检查是否有足够库存
-    IF book_available <= 0 THEN
+    -- 检查图书是否存在、是否有足够库存
+    IF book_available IS NULL THEN
+        SET p_message = '借阅失败：图书不存在';
+    ELSEIF book_available <= 0 THEN
         SET p_message = '借阅失败：该书已无库存';
     ELSE
         -- 执行借阅操作
@@ -287,32 +413,33 @@ CREATE PROCEDURE return_book(
 BEGIN
     DECLARE is_returned BOOLEAN DEFAULT FALSE;
     DECLARE current_date_var DATE DEFAULT CURDATE();
-    DECLARE due_date DATE;
-    DECLARE days_overdue INT DEFAULT 0;
+    DECLARE due_date DATE DEFAULT NULL;
     
     -- 设置默认值
     SET p_success = FALSE;
     SET p_message = '';
     SET p_fine = 0;
     
-    -- 检查借阅记录是否存在且未归还
+    -- 检查借阅记录是否存在且未归还（锁定该记录直到事务提交）
     SELECT 归还日期 IS NOT NULL, 应还日期 INTO is_returned, due_date 
-    FROM borrow_records WHERE 借阅记录编号 = p_borrow_id;
+    FROM borrow_records WHERE 借阅记录编号 = p_borrow_id
+    FOR UPDATE;
     
-    -- 检查是否已经归还
-    IF is_returned THEN
+    -- 检查是否存在、是否已经归还
+    IF due_date IS NULL THEN
+        SET p_message = '还书失败：借阅记录不存在';
+    ELSEIF is_returned THEN
         SET p_message = '还书失败：该书已归还';
     ELSE
-        -- 执行还书操作
+        -- 执行还书操作，在库数量与罚款记录由 after_return_update 触发器处理
         UPDATE borrow_records 
         SET 归还日期 = current_date_var
         WHERE 借阅记录编号 = p_borrow_id;
         
-        -- 计算是否超期
+        -- 超期时读取触发器写入的罚款
         IF current_date_var > due_date THEN
-            SET days_overdue = DATEDIFF(current_date_var, due_date);
-            SET p_fine = days_overdue * 1.00;
-            SET p_message = CONCAT('还书成功，超期', days_overdue, '天，需缴纳罚款', p_fine, '元');
+            SELECT 罚款金额 INTO p_fine FROM fines WHERE 借阅记录编号 = p_borrow_id;
+            SET p_message = CONCAT('还书成功，超期', DATEDIFF(current_date_var, due_date), '天，需缴纳罚款', p_fine, '元');
         ELSE
             SET p_message = '还书成功，未超期';
         END IF;
@@ -368,6 +495,161 @@ BEGIN
 END //
 DELIMITER ;
 
+-- 全量重建读者借阅统计，用于修复直接修改、删除借阅或罚款记录造成的偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_reader_stats()
+BEGIN
+    DELETE FROM reader_stats;
+    
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数, 罚款总额)
+    SELECT r.读者卡号,
+           COUNT(br.借阅记录编号),
+           COALESCE(SUM(br.归还日期 IS NULL), 0),
+           COALESCE(SUM(br.归还日期 > br.应还日期), 0),
+           COALESCE(SUM(br.罚款金额), 0)
+    FROM readers r
+    LEFT JOIN (
+        -- 归档的记录同样计入统计
+        SELECT br.借阅记录编号, br.读者卡号, br.应还日期, br.归还日期, f.罚款金额
+        FROM borrow_records br
+        LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
+        UNION ALL
+        SELECT a.借阅记录编号, a.读者卡号, a.应还日期, a.归还日期, fa.罚款金额
+        FROM borrow_records_archive a
+        LEFT JOIN fines_archive fa ON a.借阅记录编号 = fa.借阅记录编号
+    ) br ON r.读者卡号 = br.读者卡号
+    GROUP BY r.读者卡号;
+END //
+DELIMITER ;
+
+-- 将超出 30 天窗口的每日计数从近30天借阅次数中减去并删除，每天运行一次
+DELIMITER //
+CREATE PROCEDURE roll_book_popularity()
+BEGIN
+    UPDATE book_popularity p
+    JOIN (
+        SELECT 索书号, SUM(借阅次数) AS 过期次数
+        FROM book_daily_borrows
+        WHERE 借阅日期 < CURDATE() - INTERVAL 29 DAY
+        GROUP BY 索书号
+    ) d ON p.索书号 = d.索书号
+    SET p.近30天借阅次数 = p.近30天借阅次数 - d.过期次数;
+    
+    DELETE FROM book_daily_borrows WHERE 借阅日期 < CURDATE() - INTERVAL 29 DAY;
+END //
+DELIMITER ;
+
+-- 全量重建图书借阅热度，用于初始化或修复偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_book_popularity()
+BEGIN
+    DELETE FROM book_daily_borrows;
+    DELETE FROM book_popularity;
+    
+    INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数)
+    SELECT 索书号, 借阅日期, COUNT(*)
+    FROM borrow_records
+    WHERE 借阅日期 >= CURDATE() - INTERVAL 29 DAY
+    GROUP BY 索书号, 借阅日期;
+    
+    INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数)
+    SELECT 索书号, COUNT(*), SUM(借阅日期 >= CURDATE() - INTERVAL 29 DAY)
+    FROM (
+        SELECT 索书号, 借阅日期 FROM borrow_records
+        UNION ALL
+        SELECT 索书号, 借阅日期 FROM borrow_records_archive
+    ) br
+    GROUP BY 索书号;
+END //
+DELIMITER ;
+
+-- 归档一批借阅日期早于 p_horizon_days 天前的已归还记录及其罚款，p_archived 返回本批归档的行数；
+-- 截止日期按服务器的 CURDATE() 计算，与还书、续借、触发器等其他日期规则一致；
+-- 归档不改变读者借阅统计和图书借阅热度（删除借阅记录不触发统计更新），借阅状态随外键级联删除
+DELIMITER //
+CREATE PROCEDURE archive_borrow_records(
+    IN p_horizon_days INT,
+    IN p_batch_size INT,
+    OUT p_archived INT
+)
+BEGIN
+    DROP TEMPORARY TABLE IF EXISTS archive_batch;
+    CREATE TEMPORARY TABLE archive_batch (借阅记录编号 INT PRIMARY KEY);
+    
+    -- 按主键顺序取一批，同时锁定这些记录
+    INSERT INTO archive_batch(借阅记录编号)
+    SELECT 借阅记录编号 FROM borrow_records
+    WHERE 归还日期 IS NOT NULL AND 借阅日期 < CURDATE() - INTERVAL p_horizon_days DAY
+    ORDER BY 借阅记录编号
+    LIMIT p_batch_size
+    FOR UPDATE;
+    
+    INSERT INTO borrow_records_archive(借阅记录编号, 读者卡号, 索书号, 借阅日期, 应还日期, 归还日期)
+    SELECT br.借阅记录编号, br.读者卡号, br.索书号, br.借阅日期, br.应还日期, br.归还日期
+    FROM borrow_records br JOIN archive_batch a ON br.借阅记录编号 = a.借阅记录编号;
+    
+    INSERT INTO fines_archive(罚款记录号, 借阅记录编号, 罚款金额)
+    SELECT f.罚款记录号, f.借阅记录编号, f.罚款金额
+    FROM fines f JOIN archive_batch a ON f.借阅记录编号 = a.借阅记录编号;
+    
+    DELETE f FROM fines f JOIN archive_batch a ON f.借阅记录编号 = a.借阅记录编号;
+    DELETE br FROM borrow_records br JOIN archive_batch a ON br.借阅记录编号 = a.借阅记录编号;
+    SET p_archived = ROW_COUNT();
+    
+    DROP TEMPORARY TABLE archive_batch;
+END //
+DELIMITER ;
+
+-- 更新未归还且已超期记录的预计罚款，每天运行一次
+DELIMITER //
+CREATE PROCEDURE roll_borrow_status()
+BEGIN
+    UPDATE borrow_status s
+    JOIN borrow_records br ON s.借阅记录编号 = br.借阅记录编号
+    SET s.预计罚款 = calculate_fine(DATEDIFF(CURDATE(), br.应还日期))
+    WHERE br.归还日期 IS NULL AND br.应还日期 < CURDATE();
+END //
+DELIMITER ;
+
+-- 全量重建借阅状态，用于初始化或修复偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_borrow_status()
+BEGIN
+    DELETE FROM borrow_status;
+    
+    INSERT INTO borrow_status(借阅记录编号, 借阅状态, 预计罚款)
+    SELECT 借阅记录编号, get_borrow_status(应还日期, 归还日期),
+           calculate_fine(calculate_overdue_days(借阅日期, 应还日期, 归还日期))
+    FROM borrow_records;
+END //
+DELIMITER ;
+
+-- 每天零点后更新借阅状态中的预计罚款（需要开启 event_scheduler：SET GLOBAL event_scheduler = ON，
+-- 并在 my.cnf 中设置 event_scheduler=ON）；未开启时由客户端 DatabaseOperations.roll_daily_statistics
+-- 在程序启动后及每小时检查一次，服务器日期变化后调用 roll_borrow_status 与 roll_book_popularity
+DELIMITER //
+CREATE EVENT roll_borrow_status_daily
+ON SCHEDULE EVERY 1 DAY STARTS CURDATE() + INTERVAL 1 DAY + INTERVAL 1 MINUTE
+DO
+BEGIN
+    START TRANSACTION;
+    CALL roll_borrow_status();
+    COMMIT;
+END //
+DELIMITER ;
+
+-- 每天凌晨滚动一次借阅热度窗口（需要开启 event_scheduler）
+DELIMITER //
+CREATE EVENT roll_book_popularity_daily
+ON SCHEDULE EVERY 1 DAY STARTS CURDATE() + INTERVAL 1 DAY + INTERVAL 1 HOUR
+DO
+BEGIN
+    START TRANSACTION;
+    CALL roll_book_popularity();
+    COMMIT;
+END //
+DELIMITER ;
+
 ----------------------------自定义函数----------------------------------------------
 
 -- 计算超期天数函数
@@ -409,6 +691,26 @@ BEGIN
 END //
 DELIMITER ;
 
+-- 借阅状态函数：未归还、已超期归还或已按时归还
+DELIMITER //
+CREATE FUNCTION get_borrow_status(due_date DATE, return_date DATE) 
+RETURNS VARCHAR(10)
+DETERMINISTIC
+BEGIN
+    IF return_date IS NULL THEN
+        RETURN '未归还';
+    ELSEIF return_date > due_date THEN
+        RETURN '已超期归还';
+    END IF;
+    RETURN '已按时归还';
+END //
+DELIMITER ;
+
+-- 测试数据在触发器创建之前插入，据此初始化各个统计表
+CALL rebuild_reader_stats();
+CALL rebuild_book_popularity();
+CALL rebuild_borrow_status();
+
 ----------------------------查询语句----------------------------------------------
 
 -- 1. 简单查询：查询所有可借阅的图书
@@ -422,6 +724,13 @@ SELECT 索书号, 书名, 作者, 在库数量
 FROM books
 WHERE 书名 LIKE '%数据库%' OR 作者 LIKE '%王%';
 
+-- 2.1 全文检索：按相关度查询书名或作者（使用 ft_books_title_author 索引）
+SELECT 索书号, 书名, 作者, 在库数量,
+       MATCH(书名, 作者) AGAINST ('数据库' IN NATURAL LANGUAGE MODE) AS 相关度
+FROM books
+WHERE MATCH(书名, 作者) AGAINST ('数据库' IN NATURAL LANGUAGE MODE)
+ORDER BY 相关度 DESC;
+
 -- 3. 连接查询：查询各类别的图书数量
 SELECT c.类别名称, COUNT(b.索书号) AS 图书数量, SUM(b.总数) AS 总册数
 FROM categories c
@@ -441,6 +750,13 @@ FROM books b
 JOIN top_books tb ON b.索书号 = tb.索书号
 ORDER BY tb.borrow_count DESC;
 
+-- 4.1 同样的结果直接读取借书触发器维护的 book_popularity（倒序读取 idx_popularity_total 索引的前 3 行）
+SELECT b.索书号, b.书名, p.总借阅次数 AS 借阅次数
+FROM book_popularity p
+JOIN books b ON p.索书号 = b.索书号
+ORDER BY p.总借阅次数 DESC
+LIMIT 3;
+
 -- 5. 复杂查询：统计每位读者的借阅情况和罚款总额
 SELECT r.读者卡号, r.姓名, 
        COUNT(br.借阅记录编号) AS 总借阅次数,
@@ -453,4 +769,9 @@ LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
 GROUP BY r.读者卡号, r.姓名
 ORDER BY 罚款总额 DESC;
 
+-- 5.1 同样的统计直接读取触发器维护的 reader_stats（按罚款总额排序使用 idx_reader_stats_fine 索引）
+SELECT 读者卡号, 姓名, 总借阅次数, 未归还数量, 超期归还次数, 罚款总额
+FROM reader_stats_view
+ORDER BY 罚款总额 DESC;
+
 
@@ -1,7 +1,351 @@
+import functools
+import random
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError, ProgrammingError
+
+import instrumentation
+import metrics
+
+
+class StatementCache:
+    """一个连接上的服务器端预处理语句，按 SQL 文本缓存，超出容量时关闭最久未使用的语句"""
+    def __init__(self, connection, max_size):
+        self.connection = connection
+        self.max_size = max_size
+        self._cursors = OrderedDict()  # SQL -> (SQL, 预处理游标)
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def get(self, query):
+        """返回 (首次缓存时的 SQL 对象, 游标)，未缓存时返回 None
+
+        连接器按对象身份判断语句是否已预处理，执行时必须传入缓存中的那个 SQL 对象。
+        """
+        entry = self._cursors.get(query)
+        if entry is not None:
+            self._cursors.move_to_end(query)
+        return entry
+
+    def add(self, query):
+        """为 query 新建预处理游标（第一次执行时才向服务器预处理），返回 (条目, 淘汰的语句数)"""
+        entry = (query, self.connection.cursor(prepared=True))
+        self._cursors[query] = entry
+        evicted = 0
+        while len(self._cursors) > self.max_size:
+            _, (_, cursor) = self._cursors.popitem(last=False)
+            self._close(cursor)
+            evicted += 1
+        return entry, evicted
+
+    def discard(self, query):
+        entry = self._cursors.pop(query, None)
+        if entry is not None:
+            self._close(entry[1])
+
+    @staticmethod
+    def _close(cursor):
+        try:
+            cursor.close()
+        except (Error, ReferenceError):
+            pass  # 连接已断开时语句已由服务器释放
+
+
+class PooledConnection:
+    """连接池中的一个连接，记录最近一次归还的时间；重连得到的是新对象，预处理语句会重新准备"""
+    def __init__(self, connection):
+        self.connection = connection
+        self.last_used = time.monotonic()
+        self.statements = None  # 由 DatabaseConnection 按需创建的 StatementCache
+
+    def close(self):
+        try:
+            self.connection.close()
+        except (Error, ReferenceError):
+            pass  # 连接可能已被服务器断开
+
+
+class ConnectionPool:
+    """有界的线程安全连接池：按需建连、空闲回收、借出时做健康检查"""
+    def __init__(self, factory, max_size=5, timeout=10.0, idle_timeout=300.0, ping_interval=5.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._size = 0  # 已创建的连接数（空闲 + 借出）
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    def _evict_idle(self, now):
+        """取出空闲过久的连接（调用方持有锁），返回待关闭的连接"""
+        expired = []
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft())
+        self._size -= len(expired)
+        return expired
+
+    def acquire(self):
+        """借出一个可用连接，池满时最多等待 timeout 秒"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            pooled = None
+            expired = []
+            try:
+                with self._cond:
+                    while True:
+                        if self._closed:
+                            raise PoolError("连接池已关闭")
+                        expired.extend(self._evict_idle(time.monotonic()))
+                        if self._idle:
+                            # 后进先出，让多余的连接保持空闲直到被回收
+                            pooled = self._idle.pop()
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolError(f"等待数据库连接超时（{self.timeout} 秒）")
+                        self._cond.wait(remaining)
+            finally:
+                for item in expired:
+                    item.close()
+
+            if pooled is None:
+                try:
+                    return PooledConnection(self.factory())
+                except BaseException:
+                    self._forget()
+                    raise
+
+            if self._is_healthy(pooled):
+                return pooled
+            # 连接已失效，释放名额后重新借出
+            pooled.close()
+            self._forget()
+
+    def _is_healthy(self, pooled):
+        if time.monotonic() - pooled.last_used < self.ping_interval:
+            return True
+        try:
+            return pooled.connection.is_connected()
+        except Error:
+            return False
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def release(self, pooled, discard=False):
+        """归还连接；discard 为 True 时直接关闭"""
+        if discard or self._closed:
+            pooled.close()
+            self._forget()
+            return
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def close(self):
+        """关闭所有空闲连接，借出的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            pooled.close()
+
+
+class RetryPolicy:
+    """可重试错误的分类、带随机抖动的指数退避，以及按错误码统计的重试次数"""
+
+    # 死锁、锁等待超时：死锁会回滚整个事务，锁等待超时（默认 innodb_rollback_on_timeout=OFF）只回滚出错的语句；
+    # 重放之所以安全，是因为单条语句出错时和 transaction() 退出时都会先显式回滚，不能去掉这些回滚
+    CONTENTION_ERRNOS = {1213, 1205}
+    # 连接断开：无法确定写操作是否已经提交，只重放只读操作
+    DISCONNECT_ERRNOS = {2006, 2013}
+
+    def __init__(self, max_attempts=4, base_delay=0.05, max_delay=1.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retried = Counter()    # 错误码 -> 重试次数
+        self.exhausted = Counter()  # 错误码 -> 重试用尽后仍失败的次数
+        self._lock = threading.Lock()
+
+    def is_retryable(self, error, idempotent):
+        if error.errno in self.CONTENTION_ERRNOS:
+            return True
+        return idempotent and error.errno in self.DISCONNECT_ERRNOS
+
+    def should_retry(self, error, attempt, idempotent):
+        """第 attempt 次尝试失败后是否继续重试，同时更新计数"""
+        if not self.is_retryable(error, idempotent):
+            return False
+        with self._lock:
+            if attempt >= self.max_attempts:
+                self.exhausted[error.errno] += 1
+                return False
+            self.retried[error.errno] += 1
+            return True
+
+    def delay(self, attempt):
+        """第 attempt 次失败后的等待时间：在指数退避上限内均匀随机"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def stats(self):
+        with self._lock:
+            return {'retried': dict(self.retried), 'exhausted': dict(self.exhausted)}
+
+
+class Row(tuple):
+    """查询结果中的一行：按位置存储的元组，同时可以像字典一样用 row['列名'] 访问
+
+    列名到位置的索引保存在类上，由同一结果集的所有行共享，每行只占一个元组的内存。
+    整数下标、切片、解包按元组处理；keys()、get()、items()、in 与 dict(row) 按字典处理。
+    """
+    __slots__ = ()
+    _columns = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        # 与 dict.keys() 一样是集合视图，csv.DictWriter 等调用方会对它做集合运算
+        return self._index.keys()
+
+    def values(self):
+        return [tuple.__getitem__(self, index) for index in self._index.values()]
+
+    def items(self):
+        return [(name, tuple.__getitem__(self, index)) for name, index in self._index.items()]
+
+    def as_dict(self):
+        return dict(zip(self._columns, self))
+
+    def __repr__(self):
+        return f"Row({self.as_dict()!r})"
+
+
+@functools.lru_cache(maxsize=256)
+def row_class(columns):
+    """按列名元组创建（并缓存）对应的 Row 子类；列名重复时与字典游标一样以最后一列为准"""
+    return type('Row', (Row,), {
+        '__slots__': (),
+        '_columns': columns,
+        '_index': {name: i for i, name in enumerate(columns)},
+    })
+
+
+class ResultSet(list):
+    """查询返回的全部行，columns 为列名元组；切片仍然是 ResultSet"""
+
+    def __init__(self, columns=(), rows=()):
+        super().__init__(rows)
+        self.columns = columns
+
+    @classmethod
+    def from_cursor(cls, cursor, rows):
+        """把普通（非字典）游标取回的元组包装为 Row"""
+        columns = tuple(cursor.column_names or ())
+        return cls(columns, map(row_class(columns), rows))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ResultSet(self.columns, list.__getitem__(self, index))
+        return list.__getitem__(self, index)
+
+    def column(self, name):
+        """取出一列的全部值"""
+        index = row_class(self.columns)._index[name]
+        return [tuple.__getitem__(row, index) for row in self]
+
+
+class StatementInfo:
+    """按 SQL 文本记录的语句信息：读写类型在第一次见到时判断一次"""
+    __slots__ = ('sql', 'is_read', 'uses', 'preparable')
+
+    def __init__(self, sql, is_read):
+        self.sql = sql
+        self.is_read = is_read
+        self.uses = 0
+        self.preparable = True
+
+
+class ProcedureResult:
+    """存储过程的执行结果：CALL 返回的结果集与 OUT 参数"""
+    def __init__(self, result_sets=None, out_params=None):
+        self.result_sets = result_sets or []
+        self.out_params = out_params or {}
+
+    @property
+    def rows(self):
+        """第一个结果集，没有结果集时为空列表"""
+        return self.result_sets[0] if self.result_sets else []
+
+    @property
+    def success(self):
+        return bool(self.out_params.get('p_success'))
+
+    @property
+    def message(self):
+        return self.out_params.get('p_message') or ''
+
+    def get(self, name, default=None):
+        """按变量名（不带 @）读取 OUT 参数"""
+        value = self.out_params.get(name)
+        return default if value is None else value
+
 
 class DatabaseConnection:
+    # 返回结果集的语句
+    READ_PREFIXES = ('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN')
+
+    # stream_query 每次从服务器取回的行数
+    STREAM_BATCH_SIZE = 1000
+
+    # 同一条 SQL 执行到第几次时改用预处理语句，只执行一次的语句（如拼接了 IN 列表的查询）不必预处理
+    PREPARE_AFTER_USES = 2
+
+    # 记录语句信息的 SQL 条数上限，超过后清空重新记录
+    STATEMENT_INFO_LIMIT = 4096
+
+    # 服务器不支持以预处理方式执行该语句（ER_UNSUPPORTED_PS）
+    UNSUPPORTED_PS_ERRNO = 1295
+
     def __init__(self, connection_string):
         params = {}
         for param in connection_string.split(';'):
@@ -13,133 +357,526 @@ class DatabaseConnection:
         self.user = params.get('user', 'root')
         self.password = params.get('password', '')
         self.database = params.get('database', '')
-        self.connection = None
-        self.cursor = None
+
+        # 连接池参数
+        self.pool_size = int(params.get('pool_size', 5))
+        self.pool_timeout = float(params.get('pool_timeout', 10))
+        self.pool_idle_timeout = float(params.get('pool_idle_timeout', 300))
+        self.pool_ping_interval = float(params.get('pool_ping_interval', 5))
+
+        # 死锁、锁等待超时的重试参数
+        self.retry_policy = RetryPolicy(
+            max_attempts=int(params.get('retry_attempts', 4)),
+            base_delay=float(params.get('retry_base_delay', 0.05)),
+            max_delay=float(params.get('retry_max_delay', 1.0))
+        )
+
+        # 每个连接缓存的预处理语句条数，为 0 时不使用预处理语句
+        self.statement_cache_size = int(params.get('statement_cache_size', 64))
+
+        self.pool = None
+        self._local = threading.local()
+        self._statements = {}  # SQL -> StatementInfo
+        self._statement_stats = Counter()
+        self._stats_lock = threading.Lock()
+
+        # 查询统计 hook，见 instrumentation 模块
+        self.hooks = []
+        self.query_stats = None
+        if params.get('query_stats'):
+            path = params['query_stats']
+            self.query_stats = self.add_hook(
+                instrumentation.QueryStats().dump_at_exit(None if path.lower() in ('1', 'true', 'stdout') else path))
+        if params.get('slow_query_log'):
+            self.add_hook(instrumentation.SlowQueryLog(
+                params['slow_query_log'],
+                threshold_ms=float(params.get('slow_query_ms', 200)),
+                redact_params=params.get('slow_query_redact', '1').lower() not in ('0', 'false')
+            ))
+
+        # 运行指标输出（Prometheus 文本格式），见 metrics 模块
+        metrics.configure(self, params)
+
+    def _create_connection(self):
+        return mysql.connector.connect(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=False  # 自动进入事务模式
+        )
 
     def connect(self):
-        try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                autocommit=False  # 自动进入事务模式
+        if self.pool is None or self.pool._closed:
+            self.pool = ConnectionPool(
+                self._create_connection,
+                max_size=self.pool_size,
+                timeout=self.pool_timeout,
+                idle_timeout=self.pool_idle_timeout,
+                ping_interval=self.pool_ping_interval
             )
-            self.cursor = self.connection.cursor(dictionary=True)
+        try:
+            # 预先建立一个连接，确认连接参数有效
+            self.pool.release(self.pool.acquire())
             return True
         except Error as e:
             print(f"连接数据库时出错: {e}")
             return False
 
     def disconnect(self):
-      try:
-        if self.cursor:
+        try:
+            if self.pool:
+                self.pool.close()
+        except Exception as e:
+            print(f"断开连接时发生异常: {e}")
+
+    @contextmanager
+    def _checkout(self):
+        """借出连接；处于 transaction() 中时复用本线程固定的连接"""
+        pinned = getattr(self._local, 'pinned', None)
+        if pinned is not None:
+            yield pinned
+            return
+
+        if self.pool is None:
+            self.connect()
+        pooled = self.pool.acquire()
+        discard = False
+        try:
+            yield pooled
+        except Error:
+            discard = not self._alive(pooled)
+            raise
+        finally:
+            self.pool.release(pooled, discard=discard)
+
+    @staticmethod
+    def _alive(pooled):
+        try:
+            return pooled.connection.is_connected()
+        except Error:
+            return False
+
+    def in_transaction(self):
+        return getattr(self._local, 'pinned', None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """在同一连接上执行多条语句，正常结束时提交，出现异常时回滚
+
+        事务内的 execute_query / execute_procedure 不会自动提交，出错时直接抛出异常。
+        """
+        if self.in_transaction():
+            # 嵌套事务并入外层事务
+            yield self
+            return
+
+        with self._checkout() as pooled:
+            self._local.pinned = pooled
             try:
-                self.cursor.close()
-            except ReferenceError:
-                pass  # 忽略已被释放的引用
+                yield self
+                pooled.connection.commit()
+            except BaseException:
+                try:
+                    pooled.connection.rollback()
+                except Error:
+                    pass
+                raise
+            finally:
+                self._local.pinned = None
 
-        if self.connection:
+    def _retrying(self, attempt, idempotent):
+        """按重试策略反复调用 attempt()；处于外层事务中时不能单独重放，直接抛出"""
+        tries = 0
+        while True:
             try:
-                self.connection.close()
-            except ReferenceError:
-                pass
-      except Exception as e:
-        print(f"断开连接时发生异常: {e}")
+                return attempt()
+            except Error as e:
+                tries += 1
+                if self.in_transaction() or not self.retry_policy.should_retry(e, tries, idempotent):
+                    raise
+                time.sleep(self.retry_policy.delay(tries))
 
-    def execute_query(self, query, params=None):
+    def run_in_transaction(self, work, *args):
+        """在一个事务中执行 work(*args)，遇到死锁或锁等待超时时回滚并整体重放
+
+        work 会被多次调用，除数据库操作外不应有其他副作用。
+        """
+        def attempt():
+            with self.transaction():
+                return work(*args)
+        return self._retrying(attempt, idempotent=False)
+
+    def retry_stats(self):
+        """按错误码统计的重试次数与重试用尽次数"""
+        return self.retry_policy.stats()
+
+    def add_hook(self, hook):
+        """注册查询统计 hook：每次 execute_query / execute_procedure 结束后调用 hook.on_query(event)"""
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def _trip(self, n=1):
+        """记录一次与服务器的往返，只在注册了 hook 时计数"""
+        if self.hooks:
+            self._local.round_trips = getattr(self._local, 'round_trips', 0) + n
+
+    def _failed(self, error):
+        """记录被打印后吞掉的错误，供 hook 读取"""
+        if self.hooks:
+            self._local.last_error = error
+
+    def _observe(self, kind, sql, params, run):
+        """执行 run() 并计时，结束后把 QueryEvent 交给每个 hook；hook 出错不影响查询结果"""
+        self._local.round_trips = 0
+        self._local.last_error = None
+        where = instrumentation.caller()
+        result = error = None
+        start = time.perf_counter()
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
-            
-            self.cursor.execute(query, params or ())
-            
-            if query.strip().upper().startswith(('SELECT', 'SHOW', 'DESCRIBE')):
-                return self.cursor.fetchall()
+            result = run()
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            error = error or self._local.last_error
+            if isinstance(result, ProcedureResult):
+                rows = sum(len(rows) for rows in result.result_sets)
+            elif isinstance(result, (list, int)):
+                rows = len(result) if isinstance(result, list) else result
             else:
-                self.connection.commit()
-                return self.cursor.rowcount
+                rows = None
+            self._notify(instrumentation.QueryEvent(kind, sql, params, elapsed_ms, rows, self._local.round_trips,
+                                                    where, str(error) if error else None))
+
+    def _notify(self, event):
+        for hook in tuple(self.hooks):
+            try:
+                hook.on_query(event)
+            except Exception as e:
+                print(f"查询统计出错: {e}")
+
+    def _observe_stream(self, query, params, rows, where):
+        """逐行转发 stream_query 的结果，只累计取数据的耗时（不含调用方处理每行的时间），
+        读完、提前停止或出错后把 QueryEvent 交给每个 hook"""
+        elapsed = 0.0
+        count = trips = 0
+        error = None
+        try:
+            while True:
+                start = time.perf_counter()
+                before = getattr(self._local, 'round_trips', 0)
+                try:
+                    row = next(rows)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                    trips += getattr(self._local, 'round_trips', 0) - before
+                count += 1
+                yield row
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            rows.close()
+            self._notify(instrumentation.QueryEvent('query', query, params, elapsed * 1000, count, trips,
+                                                    where, str(error) if error else None))
+
+    def _statement(self, query):
+        """取得 query 的语句信息并记一次使用"""
+        statement = self._statements.get(query)
+        if statement is None:
+            if len(self._statements) >= self.STATEMENT_INFO_LIMIT:
+                self._statements.clear()
+            statement = StatementInfo(query, query.lstrip().upper().startswith(self.READ_PREFIXES))
+            self._statements[query] = statement
+        statement.uses += 1
+        return statement
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._statement_stats[key] += n
+
+    def statement_cache_stats(self):
+        """预处理语句缓存的命中、新建、淘汰次数"""
+        with self._stats_lock:
+            return dict(self._statement_stats)
+
+    def _prepared_cursor(self, pooled, statement):
+        """取得（必要时新建）连接上 statement 的预处理游标，返回 (SQL 对象, 游标)"""
+        if pooled.statements is None:
+            pooled.statements = StatementCache(pooled.connection, self.statement_cache_size)
+        entry = pooled.statements.get(statement.sql)
+        if entry is not None:
+            self._count('hits')
+            return entry
+        entry, evicted = pooled.statements.add(statement.sql)
+        self._count('prepared')
+        self._trip()  # 第一次执行时向服务器预处理
+        if evicted:
+            self._count('evicted', evicted)
+        return entry
+
+    def _execute(self, pooled, statement, params):
+        """执行语句，返回 (游标, 是否需要关闭)；常用的带参数语句走预处理游标，游标留在缓存中"""
+        if (params and statement.preparable and self.statement_cache_size > 0
+                and statement.uses >= self.PREPARE_AFTER_USES):
+            sql, cursor = self._prepared_cursor(pooled, statement)
+            try:
+                self._trip(2)  # 连接器每次执行前先发送 COM_STMT_RESET
+                cursor.execute(sql, params)
+                return cursor, False
+            except Error as e:
+                pooled.statements.discard(sql)
+                if e.errno != self.UNSUPPORTED_PS_ERRNO:
+                    raise
+                # 以后这条语句都用普通方式执行
+                statement.preparable = False
+
+        cursor = pooled.connection.cursor()
+        try:
+            self._trip()
+            cursor.execute(statement.sql, params or ())
+        except BaseException:
+            cursor.close()
+            raise
+        return cursor, True
+
+    def execute_query(self, query, params=None):
+        if self.hooks:
+            return self._observe('query', query, params, lambda: self._execute_query(query, params))
+        return self._execute_query(query, params)
+
+    def _execute_query(self, query, params):
+        in_transaction = self.in_transaction()
+        statement = self._statement(query)
+        is_read = statement.is_read
+
+        def attempt():
+            with self._checkout() as pooled:
+                connection = pooled.connection
+                cursor, owned = None, False
+                try:
+                    cursor, owned = self._execute(pooled, statement, params)
+                    if is_read:
+                        result = ResultSet.from_cursor(cursor, cursor.fetchall())
+                    else:
+                        result = cursor.rowcount
+                    if not in_transaction:
+                        self._trip()
+                        connection.commit()
+                    return result
+                except Error:
+                    if cursor is not None and not owned:
+                        # 预处理游标可能还有未读完的结果，不再复用
+                        pooled.statements.discard(statement.sql)
+                    if not in_transaction:
+                        self._rollback_quietly(connection)
+                    raise
+                finally:
+                    if owned:
+                        cursor.close()
+
+        try:
+            return self._retrying(attempt, idempotent=is_read)
         except Error as e:
+            if in_transaction:
+                raise
+            self._failed(e)
             print(f"执行查询时出错: {e}")
-            self.connection.rollback()
             return None
 
-    def execute_procedure(self, procedure_name, params=None):
-     try:
-        if not self.connection or not self.connection.is_connected():
-            self.connect()
+    def stream_query(self, query, params=None, batch_size=None, as_tuples=False):
+        """逐行产出查询结果的生成器，用非缓冲游标按 batch_size 行一批读取，内存占用与结果集大小无关
+
+        默认产出 Row，as_tuples 为 True 时产出普通元组。迭代结束前连接一直被占用；提前停止迭代
+        （break 或 close()）时，未读完结果的连接直接丢弃，事务中的固定连接则读完剩余结果。
+        出错时不会重试，也不会只打印后返回，异常直接抛给调用方，以免导出的数据被悄悄截断。
+        注册了 hook 时，迭代结束后与 execute_query 一样记录一次 QueryEvent。
+        """
+        rows = self._stream_query(query, params, batch_size or self.STREAM_BATCH_SIZE, as_tuples)
+        if self.hooks:
+            return self._observe_stream(query, params, rows, instrumentation.caller())
+        return rows
+
+    def _stream_query(self, query, params, batch_size, as_tuples):
+        pinned = getattr(self._local, 'pinned', None)
+        if pinned is not None:
+            pooled = pinned
+        else:
+            if self.pool is None:
+                self.connect()
+            pooled = self.pool.acquire()
+
+        connection = pooled.connection
+        finished = False
+        cursor = None
+        try:
+            cursor = connection.cursor(buffered=False)
+            self._trip()
+            cursor.execute(query, params or ())
+            make_row = tuple if as_tuples else row_class(tuple(cursor.column_names or ()))
+            while True:
+                self._trip()
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from map(make_row, rows)
+            finished = True
+            if pinned is None:
+                connection.commit()
+        finally:
+            if not finished and pinned is not None:
+                # 固定连接还要继续用于事务中的其他语句，必须先读完剩余结果
+                try:
+                    connection.consume_results()
+                except Error:
+                    pass
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    pass
+            if pinned is None:
+                self.pool.release(pooled, discard=not finished)
+
+    def execute_many(self, query, seq_params):
+        """用同一条语句批量写入多组参数，INSERT 会被合并为一条多行 INSERT"""
+        in_transaction = self.in_transaction()
+
+        def attempt():
+            with self._checkout() as pooled:
+                connection = pooled.connection
+                cursor = connection.cursor()
+                try:
+                    cursor.executemany(query, seq_params)
+                    if not in_transaction:
+                        connection.commit()
+                    return cursor.rowcount
+                except Error:
+                    if not in_transaction:
+                        self._rollback_quietly(connection)
+                    raise
+                finally:
+                    cursor.close()
 
-        if params is None:
-            params = []
+        try:
+            return self._retrying(attempt, idempotent=False)
+        except Error as e:
+            if in_transaction:
+                raise
+            print(f"批量执行时出错: {e}")
+            return None
+
+    def execute_procedure(self, procedure_name, params=None, idempotent=False):
+        """调用存储过程；只读的存储过程传入 idempotent=True，连接断开时也会重试"""
+        if self.hooks:
+            return self._observe('procedure', procedure_name, params,
+                                 lambda: self._execute_procedure(procedure_name, params, idempotent))
+        return self._execute_procedure(procedure_name, params, idempotent)
+
+    def _execute_procedure(self, procedure_name, params, idempotent):
+        in_transaction = self.in_transaction()
+
+        def attempt():
+            with self._checkout() as pooled:
+                connection = pooled.connection
+                cursor = connection.cursor()
+                try:
+                    results = self._call_procedure(cursor, procedure_name, params or [])
+                    if not in_transaction:
+                        # ✅ 提交事务，防止锁表
+                        self._trip()
+                        connection.commit()
+                    return results
+                except Error:
+                    # ✅ 出错回滚事务
+                    if not in_transaction:
+                        self._rollback_quietly(connection)
+                    raise
+                finally:
+                    cursor.close()
+
+        try:
+            return self._retrying(attempt, idempotent)
+        except Error as e:
+            if in_transaction:
+                raise
+            self._failed(e)
+            print(f"执行存储过程时出错: {e}")
+            return None
 
-        processed_params = []
+    @staticmethod
+    def _rollback_quietly(connection):
+        """回滚失败（例如连接已断开）时保留原来的错误"""
+        try:
+            connection.rollback()
+        except Error:
+            pass
+
+    def _call_procedure(self, cursor, procedure_name, params):
+        # OUT 参数写作 '@变量名'，存储过程退出时会为其赋值，因此无需预先 SET
+        placeholders = []
+        call_params = []
+        out_names = []
         for param in params:
             if isinstance(param, str) and param.startswith('@'):
-                var_name = param[1:]
-                self.cursor.execute(f"SET @{var_name} = NULL")
-                processed_params.append(f"@{var_name}")
+                placeholders.append(param)
+                out_names.append(param[1:])
             else:
-                processed_params.append(param)
+                placeholders.append('%s')
+                call_params.append(param)
 
-        param_placeholders = ', '.join([
-            '%s' if not isinstance(p, str) or not p.startswith('@') else p
-            for p in processed_params
-        ])
-        call_query = f"CALL {procedure_name}({param_placeholders})"
+        self._trip()
+        cursor.execute(f"CALL {procedure_name}({', '.join(placeholders)})", call_params)
 
-        # 执行 CALL 语句，去除掉 @变量参数
-        call_params = [
-            p for p in processed_params
-            if not isinstance(p, str) or not p.startswith('@')
-        ]
-        self.cursor.execute(call_query, call_params)
-
-        results = []
+        result_sets = []
         try:
-            result = self.cursor.fetchall()
+            result = cursor.fetchall()
             if result:
-                results.append(result)
+                result_sets.append(ResultSet.from_cursor(cursor, result))
         except:
             pass
 
-        while self.cursor.nextset():
+        while cursor.nextset():
             try:
-                result = self.cursor.fetchall()
+                result = cursor.fetchall()
                 if result:
-                    results.append(result)
+                    result_sets.append(ResultSet.from_cursor(cursor, result))
             except:
                 continue
 
-        # 获取输出参数（@变量）
-        output_params = {}
-        for param in params:
-            if isinstance(param, str) and param.startswith('@'):
-                var_name = param[1:]
-                self.cursor.execute(f"SELECT @{var_name} AS value")
-                output_value = self.cursor.fetchone()
-                if output_value:
-                    output_params[var_name] = output_value['value']
-
-        if output_params:
-            results.append([output_params])
-
-        # ✅ 提交事务，防止锁表
-        self.connection.commit()
-
-        return results
+        # 一条 SELECT 取回全部输出参数
+        out_params = {}
+        if out_names:
+            self._trip()
+            cursor.execute("SELECT " + ", ".join(f"@{name} AS `{name}`" for name in out_names))
+            row = cursor.fetchone()
+            if row:
+                out_params = dict(zip(cursor.column_names, row))
 
-     except Error as e:
-        print(f"执行存储过程时出错: {e}")
-        # ✅ 出错回滚事务
-        if self.connection:
-            self.connection.rollback()
-        return None
+        return ProcedureResult(result_sets, out_params)
 
+    def _pinned(self, action):
+        pinned = getattr(self._local, 'pinned', None)
+        if pinned is None:
+            # 不再有共享连接，事务外的语句已自动提交；需要手动控制时请使用 transaction() 或 run_in_transaction
+            raise ProgrammingError(f"当前线程没有进行中的事务，无法{action}")
+        return pinned
 
     def commit(self):
-        if self.connection:
-            self.connection.commit()
+        """提交当前线程 transaction() 中的事务，不在事务中时抛出 ProgrammingError"""
+        self._pinned("提交").connection.commit()
 
     def rollback(self):
-        if self.connection:
-            self.connection.rollback()
\ No newline at end of file
+        """回滚当前线程 transaction() 中的事务，不在事务中时抛出 ProgrammingError"""
+        self._pinned("回滚").connection.rollback()
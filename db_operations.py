@@ -1,15 +1,83 @@
-from db_connection import DatabaseConnection
+import csv
+import datetime
+import threading
+import time
+from contextlib import closing
+
+import bulk_import
+import fine_policy
+import metrics
+from db_connection import DatabaseConnection, ProcedureResult
+
+
+
+class LookupTable:
+    """参照表（出版社、类别）的缓存，提供编号与名称的双向映射"""
+
+    def __init__(self, rows, id_key, name_key, version=None):
+        self.rows = rows
+        self.by_id = {row[id_key]: row[name_key] for row in rows}
+        self.by_name = {row[name_key]: row[id_key] for row in rows}
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    def name_of(self, item_id):
+        """按编号取名称，没有对应记录时返回编号本身的字符串"""
+        return self.by_id.get(item_id, str(item_id))
 
 
 
 class DatabaseOperations:
 
+    # 分页查询默认每页行数
+    DEFAULT_PAGE_SIZE = 200
+
+    # 条件查询最多返回的行数
+    SEARCH_LIMIT = 500
+
+    # 服务器 ngram_token_size 设置（MySQL 默认为 2）
+    NGRAM_TOKEN_SIZE = 2
+
+    # borrow_status 表中的借阅状态取值，与 get_borrow_status 函数一致
+    BORROW_STATUSES = ('未归还', '已超期归还', '已按时归还')
+
+    # 参照表缓存：表名 -> (编号列, 名称列)
+    LOOKUP_TABLES = {
+        'publishers': ('出版社号', '名称'),
+        'categories': ('类别id', '类别名称'),
+    }
+
+    # 续借延长的天数，与 renew_book 存储过程一致
+    RENEW_DAYS = 30
+
+    # 已归还借阅记录在借阅记录表中保留的天数（按借阅日期），更早的记录可以归档
+    ARCHIVE_HORIZON_DAYS = 730
+
+    # 每批归档的行数，每批是一个单独的事务
+    ARCHIVE_BATCH_SIZE = 1000
+
+    # 借阅热度统计窗口与 book_popularity 中对应的计数列
+    POPULARITY_WINDOWS = {
+        'all': '总借阅次数',
+        '30d': '近30天借阅次数',
+    }
+
+    # 参照表缓存的有效期（秒），过期后先探测版本，没有变化就继续使用
+    LOOKUP_TTL = 30
+
     def __init__(self, connection_string):
 
         self.db = DatabaseConnection(connection_string)
 
         self.db.connect()
 
+        self._lookups = {}
+
+        self._lookup_lock = threading.Lock()
+
+        # 最近一次由客户端执行每日更新时的服务器日期
+        self._rolled_on = None
+
 
 
     def __del__(self):
@@ -18,6 +86,32 @@ class DatabaseOperations:
 
 
 
+    def _fetch_page(self, table, key, after=None, page_size=None, where=None):
+        """按主键做键集分页，返回 (当前页, 续页令牌)；令牌为 None 表示已是最后一页"""
+        page_size = page_size or self.DEFAULT_PAGE_SIZE
+        conditions = [where] if where else []
+        params = []
+        if after is not None:
+            conditions.append(f"{key} > %s")
+            params.append(after)
+
+        query = f"SELECT * FROM {table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # 多取一行用来判断是否还有下一页
+        query += f" ORDER BY {key} LIMIT %s"
+        params.append(page_size + 1)
+
+        rows = self.db.execute_query(query, tuple(params))
+        if rows is None:
+            return None, None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, rows[-1][key]
+        return rows, None
+
+
+
     # 图书管理相关操作
 
     def get_all_books(self):
@@ -28,6 +122,11 @@ class DatabaseOperations:
 
 
 
+    def get_books_page(self, after=None, page_size=None):
+        return self._fetch_page('books', '索书号', after, page_size)
+
+
+
     def get_book_by_id(self, book_id):
 
         query = "SELECT * FROM books WHERE 索书号 = %s"
@@ -60,6 +159,14 @@ class DatabaseOperations:
 
 
 
+    def import_books(self, path, batch_size=bulk_import.DEFAULT_BATCH_SIZE):
+
+        # 从 CSV / JSONL 文件批量导入图书，返回 ImportReport
+
+        return bulk_import.import_books(self, path, batch_size)
+
+
+
     def update_book(self, book_data):
     # 调用存储过程更新图书信息
       return self.db.execute_procedure('update_book_proc', [
@@ -75,24 +182,24 @@ class DatabaseOperations:
 
 
     def delete_book(self, book_id):
-        try:
-            check_query = "SELECT 总数, 在库数量 FROM books WHERE 索书号 = %s"
+        def work():
+            check_query = "SELECT 总数, 在库数量 FROM books WHERE 索书号 = %s FOR UPDATE"
             book = self.db.execute_query(check_query, (str(book_id),))
             if not book:
                 print("删除失败：图书不存在")
                 return None
             if book[0]['总数'] != book[0]['在库数量']:
                 print("删除失败：图书仍有借出，无法删除")
-                self.db.rollback()
                 return None
-            
+
             delete_query = "DELETE FROM books WHERE 索书号 = %s"
-            result = self.db.execute_query(delete_query, (str(book_id),))
-            self.db.commit()
-            return result
+            return self.db.execute_query(delete_query, (str(book_id),))
+
+        try:
+            # 检查与删除在同一连接的同一事务中完成，遇到死锁时整体重放
+            return self.db.run_in_transaction(work)
         except Exception as e:
             print(f"删除图书时出错: {e}")
-            self.db.rollback()
             return None
 
 
@@ -107,6 +214,11 @@ class DatabaseOperations:
 
 
 
+    def get_readers_page(self, after=None, page_size=None):
+        return self._fetch_page('readers', '读者卡号', after, page_size)
+
+
+
     def get_reader_by_id(self, reader_id):
 
         query = "SELECT * FROM readers WHERE 读者卡号 = %s"
@@ -133,6 +245,14 @@ class DatabaseOperations:
 
 
 
+    def import_readers(self, path, batch_size=bulk_import.DEFAULT_BATCH_SIZE):
+
+        # 从 CSV / JSONL 文件批量导入读者，返回 ImportReport
+
+        return bulk_import.import_readers(self, path, batch_size)
+
+
+
     def update_reader(self, reader_data):
     # 调用存储过程更新读者信息
       return self.db.execute_procedure('update_reader_proc', [
@@ -144,21 +264,20 @@ class DatabaseOperations:
 
 
     def delete_reader(self, reader_id):
-        try:
+        def work():
             check_query = "SELECT COUNT(*) AS 借阅数量 FROM borrow_records WHERE 读者卡号 = %s AND 归还日期 IS NULL"
             borrow = self.db.execute_query(check_query, (str(reader_id),))
             if borrow[0]['借阅数量'] > 0:
                 print("删除失败：读者还有未归还图书，无法删除")
-                self.db.rollback()
                 return None
 
             delete_query = "DELETE FROM readers WHERE 读者卡号 = %s"
-            result = self.db.execute_query(delete_query, (str(reader_id),))
-            self.db.commit()
-            return result
+            return self.db.execute_query(delete_query, (str(reader_id),))
+
+        try:
+            return self.db.run_in_transaction(work)
         except Exception as e:
             print(f"删除读者时出错: {e}")
-            self.db.rollback()
             return None
 
 
@@ -169,7 +288,11 @@ class DatabaseOperations:
 
         # 调用借书存储过程，确保参数被正确处理为字符串类型
 
-        return self.db.execute_procedure('borrow_book', (str(reader_id), str(book_id), '@p_success', '@p_message'))
+        result = self.db.execute_procedure('borrow_book', (str(reader_id), str(book_id), '@p_success', '@p_message'))
+
+        metrics.record_circulation('borrow', result)
+
+        return result
 
 
 
@@ -177,7 +300,11 @@ class DatabaseOperations:
 
         # 调用还书存储过程，确保参数被正确处理为字符串类型
 
-        return self.db.execute_procedure('return_book', (str(borrow_id), '@p_success', '@p_message', '@p_fine_amount'))
+        result = self.db.execute_procedure('return_book', (str(borrow_id), '@p_success', '@p_message', '@p_fine_amount'))
+
+        metrics.record_circulation('return', result)
+
+        return result
 
 
 
@@ -185,36 +312,191 @@ class DatabaseOperations:
 
         # 调用续借存储过程，确保参数被正确处理为字符串类型
 
-        return self.db.execute_procedure('renew_book', (str(borrow_id), '@p_success', '@p_message', '@p_new_due_date'))
+        result = self.db.execute_procedure('renew_book', (str(borrow_id), '@p_success', '@p_message', '@p_new_due_date'))
+
+        metrics.record_circulation('renew', result)
 
+        return result
 
 
-    def get_reader_borrow_history(self, reader_id):
 
-        # 调用查询读者借阅历史的存储过程，确保参数被正确处理为字符串类型
+    def _lock_borrow_records(self, borrow_ids):
+        """锁定并取出一批借阅记录，返回 (编号 -> 记录, 数据库当前日期)"""
+        placeholders = ", ".join(["%s"] * len(borrow_ids))
+        query = f"""
+        SELECT 借阅记录编号, 借阅日期, 应还日期, 归还日期, CURDATE() AS 今天
+        FROM borrow_records
+        WHERE 借阅记录编号 IN ({placeholders})
+        FOR UPDATE
+        """
+        rows = self.db.execute_query(query, tuple(borrow_ids))
+        today = rows[0]['今天'] if rows else None
+        return {row['借阅记录编号']: row for row in rows}, today
+
+    @staticmethod
+    def _batch_ids(borrow_ids):
+        """去掉重复编号，保持原有顺序"""
+        return list(dict.fromkeys(int(borrow_id) for borrow_id in borrow_ids))
+
+    def return_books(self, borrow_ids):
+        """在一个事务中批量还书，返回 [(借阅记录编号, ProcedureResult)]，结果与 return_book 存储过程相同
+
+        用一条 UPDATE 写入归还日期，还书和罚款触发器对每一行照常执行。
+        """
+        borrow_ids = self._batch_ids(borrow_ids)
+        if not borrow_ids:
+            return []
+
+        def work():
+            records, today = self._lock_borrow_records(borrow_ids)
+            returnable = [i for i in borrow_ids if i in records and records[i]['归还日期'] is None]
+            fines = {}
+            if returnable:
+                placeholders = ", ".join(["%s"] * len(returnable))
+                self.db.execute_query(
+                    f"UPDATE borrow_records SET 归还日期 = CURDATE() WHERE 借阅记录编号 IN ({placeholders})",
+                    tuple(returnable))
+                rows = self.db.execute_query(
+                    f"SELECT 借阅记录编号, 罚款金额 FROM fines WHERE 借阅记录编号 IN ({placeholders})",
+                    tuple(returnable))
+                fines = {row['借阅记录编号']: row['罚款金额'] for row in rows}
+
+            outcomes = []
+            for borrow_id in borrow_ids:
+                record = records.get(borrow_id)
+                if record is None:
+                    out = {'p_success': False, 'p_message': '还书失败：借阅记录不存在'}
+                elif record['归还日期'] is not None:
+                    out = {'p_success': False, 'p_message': '还书失败：该书已归还'}
+                elif borrow_id in fines:
+                    days = fine_policy.overdue_days(record['借阅日期'], record['应还日期'], today)
+                    out = {'p_success': True, 'p_fine_amount': fines[borrow_id],
+                           'p_message': f"还书成功，超期{days}天，需缴纳罚款{fines[borrow_id]}元"}
+                else:
+                    out = {'p_success': True, 'p_fine_amount': 0, 'p_message': '还书成功，未超期'}
+                outcomes.append((borrow_id, ProcedureResult(out_params=out)))
+            return outcomes
+
+        return self._record_batch('return', borrow_ids, work, "批量还书时出错")
+
+    def renew_books(self, borrow_ids):
+        """在一个事务中批量续借，返回 [(借阅记录编号, ProcedureResult)]，结果与 renew_book 存储过程相同"""
+        borrow_ids = self._batch_ids(borrow_ids)
+        if not borrow_ids:
+            return []
+
+        def work():
+            records, today = self._lock_borrow_records(borrow_ids)
+            renewable = [i for i in borrow_ids
+                         if i in records and records[i]['归还日期'] is None and records[i]['应还日期'] >= today]
+            if renewable:
+                placeholders = ", ".join(["%s"] * len(renewable))
+                self.db.execute_query(
+                    f"UPDATE borrow_records SET 应还日期 = DATE_ADD(应还日期, INTERVAL %s DAY) "
+                    f"WHERE 借阅记录编号 IN ({placeholders})",
+                    (self.RENEW_DAYS, *renewable))
+
+            outcomes = []
+            for borrow_id in borrow_ids:
+                record = records.get(borrow_id)
+                if record is None:
+                    out = {'p_success': False, 'p_message': '续借失败：借阅记录不存在'}
+                elif record['归还日期'] is not None:
+                    out = {'p_success': False, 'p_message': '续借失败：该书已归还'}
+                elif record['应还日期'] < today:
+                    out = {'p_success': False, 'p_message': '续借失败：该书已超期，请先归还并缴纳罚款'}
+                else:
+                    new_due_date = record['应还日期'] + datetime.timedelta(days=self.RENEW_DAYS)
+                    out = {'p_success': True, 'p_new_due_date': new_due_date,
+                           'p_message': f"续借成功，新的应还日期为: {new_due_date}"}
+                outcomes.append((borrow_id, ProcedureResult(out_params=out)))
+            return outcomes
+
+        return self._record_batch('renew', borrow_ids, work, "批量续借时出错")
+
+    def _record_batch(self, action, borrow_ids, work, error_text):
+        """在事务中执行批量操作 work，按每条记录的结果计入运行指标"""
+        try:
+            outcomes = self.db.run_in_transaction(work)
+        except Exception as e:
+            print(f"{error_text}: {e}")
+            metrics.record_circulation(action, None, count=len(borrow_ids))
+            return None
+        for _, result in outcomes:
+            metrics.record_circulation(action, result)
+        return outcomes
+
+
 
-        return self.db.execute_procedure('get_reader_borrow_history', (str(reader_id),))
+    def get_reader_borrow_history(self, reader_id, include_archive=False):
 
+        # 调用查询读者借阅历史的存储过程，确保参数被正确处理为字符串类型；include_archive 为 True 时包含归档记录
 
+        return self.db.execute_procedure('get_reader_borrow_history', (str(reader_id), bool(include_archive)), idempotent=True)
 
-    def get_all_borrow_records(self):
+
+
+    def get_all_borrow_records(self, include_archive=False):
 
         query = "SELECT * FROM borrow_records"
 
+        if include_archive:
+            query += " UNION ALL SELECT * FROM borrow_records_archive"
+
         return self.db.execute_query(query)
 
+    def iter_borrow_records(self, include_archive=False, as_tuples=False):
+        """逐行读取全部借阅记录，适合导出、统计等需要遍历整张表的场景"""
+        query = "SELECT * FROM borrow_records"
+        if include_archive:
+            query += " UNION ALL SELECT * FROM borrow_records_archive"
+        return self.db.stream_query(query, as_tuples=as_tuples)
+
 
 
-    def get_borrow_record_by_id(self, borrow_id):
+    def get_borrow_records_page(self, after=None, page_size=None, unreturned_only=False):
+        where = "归还日期 IS NULL" if unreturned_only else None
+        return self._fetch_page('borrow_records', '借阅记录编号', after, page_size, where)
+
+
+
+    def get_borrow_record_by_id(self, borrow_id, include_archive=False):
 
         query = "SELECT * FROM borrow_records WHERE 借阅记录编号 = %s"
 
         result = self.db.execute_query(query, (str(borrow_id),))
 
+        if not result and include_archive:
+            query = "SELECT * FROM borrow_records_archive WHERE 借阅记录编号 = %s"
+            result = self.db.execute_query(query, (str(borrow_id),))
+
         return result[0] if result else None
 
 
 
+    def archive_borrow_records(self, horizon_days=None, batch_size=None, max_batches=None):
+        """把借阅日期早于 horizon_days 天前的已归还记录（连同罚款）分批移入归档表，返回归档的行数
+
+        每批单独提交，锁只在一批内持有；max_batches 限制本次最多处理的批数。
+        """
+        horizon_days = self.ARCHIVE_HORIZON_DAYS if horizon_days is None else horizon_days
+        batch_size = batch_size or self.ARCHIVE_BATCH_SIZE
+
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            result = self.db.execute_procedure('archive_borrow_records', (int(horizon_days), batch_size, '@p_archived'))
+            if result is None:
+                break
+            archived = result.get('p_archived', 0)
+            total += archived
+            batches += 1
+            if archived < batch_size:
+                break
+        return total
+
+
+
     # 罚款管理相关操作
 
     def get_all_fines(self):
@@ -225,6 +507,21 @@ class DatabaseOperations:
 
 
 
+    def get_fines_page(self, after=None, page_size=None):
+        return self._fetch_page('fines', '罚款记录号', after, page_size)
+
+
+
+    def iter_fines(self, as_tuples=False):
+        """逐行读取全部罚款记录"""
+        return self.db.stream_query("SELECT * FROM fines ORDER BY 罚款记录号", as_tuples=as_tuples)
+
+    def export_fines(self, path):
+        """把全部罚款记录导出为 CSV 文件，返回导出的行数，出错时返回 None"""
+        return self._export_csv("SELECT * FROM fines ORDER BY 罚款记录号", path)
+
+
+
     def get_fine_by_borrow_id(self, borrow_id):
 
         query = "SELECT * FROM fines WHERE 借阅记录编号 = %s"
@@ -251,13 +548,106 @@ class DatabaseOperations:
 
 
 
+    # 图书借阅热度（book_popularity 表由借书触发器维护）
+
+    def get_top_books(self, n=10, window='all'):
+        """借阅次数最多的前 n 本书，window 为 'all'（全部）或 '30d'（最近 30 天），结果中附带“借阅次数”列"""
+        column = self.POPULARITY_WINDOWS.get(window)
+        if column is None:
+            raise ValueError(f"不支持的统计窗口: {window}")
+
+        query = f"""
+        SELECT b.索书号, b.书名, b.作者, p.{column} AS 借阅次数
+        FROM book_popularity p
+        JOIN books b ON p.索书号 = b.索书号
+        WHERE p.{column} > 0
+        ORDER BY p.{column} DESC
+        LIMIT %s
+        """
+        return self.db.execute_query(query, (int(n),))
+
+    def roll_book_popularity(self):
+        """移出超过 30 天的借阅计数；未开启 event_scheduler 时可定时调用"""
+        return self.db.execute_procedure('roll_book_popularity')
+
+    def rebuild_book_popularity(self):
+        """根据借阅记录全量重建图书借阅热度"""
+        return self.db.execute_procedure('rebuild_book_popularity')
+
+
+
+    # 读者借阅统计（reader_stats 表由触发器维护）
+
+    def get_reader_stats(self, reader_id):
+        """按读者卡号读取一位读者的借阅统计"""
+        query = "SELECT * FROM reader_stats_view WHERE 读者卡号 = %s"
+        result = self.db.execute_query(query, (str(reader_id),))
+        return result[0] if result else None
+
+    def get_reader_stats_page(self, after=None, page_size=None):
+        return self._fetch_page('reader_stats_view', '读者卡号', after, page_size)
+
+    def rebuild_reader_stats(self):
+        """根据借阅和罚款记录全量重建读者借阅统计"""
+        return self.db.execute_procedure('rebuild_reader_stats')
+
+
+
+    # 参照表缓存
+
+    def _get_lookup(self, table):
+        """返回参照表缓存，超过有效期且版本变化时重新加载"""
+        id_key, name_key = self.LOOKUP_TABLES[table]
+        with self._lookup_lock:
+            lookup = self._lookups.get(table)
+            if lookup is not None and time.monotonic() - lookup.checked_at < self.LOOKUP_TTL:
+                return lookup
+
+            # 行数与最大编号作为版本号：本系统只会新增参照数据，新增必然改变二者
+            probe = self.db.execute_query(
+                f"SELECT COUNT(*) AS 行数, MAX({id_key}) AS 最大编号 FROM {table}")
+            version = (probe[0]['行数'], probe[0]['最大编号']) if probe else None
+            if lookup is not None and version is not None and version == lookup.version:
+                lookup.checked_at = time.monotonic()
+                return lookup
+
+            rows = self.db.execute_query(f"SELECT * FROM {table}")
+            if rows is None:
+                # 查询失败时沿用旧缓存
+                return lookup or LookupTable([], id_key, name_key)
+            lookup = LookupTable(rows, id_key, name_key, version)
+            self._lookups[table] = lookup
+            return lookup
+
+
+
+    def invalidate_lookups(self, table=None):
+        """使参照表缓存失效，table 为空时清空全部"""
+        with self._lookup_lock:
+            if table is None:
+                self._lookups.clear()
+            else:
+                self._lookups.pop(table, None)
+
+
+
+    def get_category_lookup(self):
+
+        return self._get_lookup('categories')
+
+
+
+    def get_publisher_lookup(self):
+
+        return self._get_lookup('publishers')
+
+
+
     # 类别管理相关操作
 
     def get_all_categories(self):
 
-        query = "SELECT * FROM categories"
-
-        return self.db.execute_query(query)
+        return list(self.get_category_lookup().rows)
 
 
 
@@ -265,7 +655,13 @@ class DatabaseOperations:
 
         query = "INSERT INTO categories (类别名称) VALUES (%s)"
 
-        return self.db.execute_query(query, (category_name,))
+        result = self.db.execute_query(query, (category_name,))
+
+        if result:
+
+            self.invalidate_lookups('categories')
+
+        return result
 
 
 
@@ -273,9 +669,7 @@ class DatabaseOperations:
 
     def get_all_publishers(self):
 
-        query = "SELECT * FROM publishers"
-
-        return self.db.execute_query(query)
+        return list(self.get_publisher_lookup().rows)
 
 
 
@@ -291,7 +685,13 @@ class DatabaseOperations:
 
         params = (publisher_data['名称'], publisher_data['地址'], publisher_data['联系电话'])
 
-        return self.db.execute_query(query, params)
+        result = self.db.execute_query(query, params)
+
+        if result:
+
+            self.invalidate_lookups('publishers')
+
+        return result
 
 
 
@@ -313,23 +713,147 @@ class DatabaseOperations:
 
 
 
-    # 自定义函数调用
+    def get_borrow_info_page(self, after=None, page_size=None):
+        return self._fetch_page('borrow_info_view', '借阅记录编号', after, page_size)
+
+    def export_borrow_info(self, path):
+        """把借阅信息视图导出为 CSV 文件，返回导出的行数，出错时返回 None"""
+        return self._export_csv("SELECT * FROM borrow_info_view ORDER BY 借阅记录编号", path)
+
+    def roll_borrow_status(self):
+        """更新未归还且已超期记录的预计罚款；未开启 event_scheduler 时可每天调用一次"""
+        return self.db.execute_procedure('roll_borrow_status')
+
+    def rebuild_borrow_status(self):
+        """根据借阅记录全量重建借阅状态"""
+        return self.db.execute_procedure('rebuild_borrow_status')
+
+    def roll_daily_statistics(self):
+        """未开启 event_scheduler 时代替每日事件：服务器日期变化后更新预计罚款并滚动借阅热度窗口
+
+        两个存储过程重复执行结果不变，多个客户端同时调用也没有问题。
+        返回是否执行了更新；event_scheduler 已开启、今天已更新过或出错时返回 False。
+        """
+        rows = self.db.execute_query("SELECT @@event_scheduler AS scheduler, CURDATE() AS today")
+        if not rows:
+            return False
+        if str(rows[0]['scheduler']).upper() == 'ON' or rows[0]['today'] == self._rolled_on:
+            return False
+        if self.roll_borrow_status() is None or self.roll_book_popularity() is None:
+            return False
+        self._rolled_on = rows[0]['today']
+        return True
+
+
+
+    # 条件查询
+
+    @staticmethod
+    def _escape_like(text):
+        """转义 LIKE 模式中的通配符"""
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+
+    def search_books(self, field, text, limit=None):
+        """按字段查询图书：索书号按前缀匹配（走主键索引），书名、作者按包含匹配"""
+        pattern = self._escape_like(text)
+        if field == '索书号':
+            value = pattern + '%'
+        elif field in ('书名', '作者'):
+            value = '%' + pattern + '%'
+        else:
+            raise ValueError(f"不支持的查询字段: {field}")
+
+        query = f"SELECT * FROM books WHERE {field} LIKE %s ORDER BY 索书号 LIMIT %s"
+        return self.db.execute_query(query, (value, limit or self.SEARCH_LIMIT))
+
 
-    def calculate_overdue_days(self, borrow_date, due_date, return_date):
 
-        query = "SELECT calculate_overdue_days(%s, %s, %s) AS overdue_days"
+    def search_books_ranked(self, text, limit=None):
+        """全文检索书名和作者，按相关度从高到低返回，结果中附带“相关度”列"""
+        text = text.strip()
+        # ngram 分词的最小长度为 2，单个字无法命中全文索引，退回按书名包含匹配
+        if len(text) < self.NGRAM_TOKEN_SIZE:
+            return self.search_books('书名', text, limit)
 
-        result = self.db.execute_query(query, (borrow_date, due_date, return_date))
+        query = """
+        SELECT *, MATCH(书名, 作者) AGAINST (%s IN NATURAL LANGUAGE MODE) AS 相关度
+        FROM books
+        WHERE MATCH(书名, 作者) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        ORDER BY 相关度 DESC
+        LIMIT %s
+        """
+        return self.db.execute_query(query, (text, text, limit or self.SEARCH_LIMIT))
+
+
+
+    def search_borrow_info(self, field, text, limit=None):
+        """按字段查询借阅信息：读者卡号、索书号按前缀匹配，借阅状态按 borrow_status 的索引匹配"""
+        if field in ('读者卡号', '索书号'):
+            condition = f"{field} LIKE %s"
+            params = [self._escape_like(text) + '%']
+        elif field == '借阅状态':
+            # 与输入内容部分匹配的状态都算命中
+            params = [status for status in self.BORROW_STATUSES if text in status]
+            if not params:
+                return []
+            condition = f"借阅状态 IN ({', '.join(['%s'] * len(params))})"
+        else:
+            raise ValueError(f"不支持的查询字段: {field}")
+
+        query = f"SELECT * FROM borrow_info_view WHERE {condition} ORDER BY 借阅记录编号 LIMIT %s"
+        params.append(limit or self.SEARCH_LIMIT)
+        return self.db.execute_query(query, tuple(params))
+
+
+
+    def _export_csv(self, query, path):
+        """流式读取 query 的结果写入 CSV 文件（首行为列名），返回写入的行数"""
+        try:
+            count = 0
+            with closing(self.db.stream_query(query)) as rows, open(path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = None
+                for row in rows:
+                    if writer is None:
+                        writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+                        writer.writeheader()
+                    writer.writerow(row)
+                    count += 1
+            return count
+        except Exception as e:
+            print(f"导出数据时出错: {e}")
+            return None
+
+
+
+    # 自定义函数的本地实现（规则见 fine_policy，与数据库函数一致，只在需要今天的日期时查询一次服务器）
 
-        return result[0]['overdue_days'] if result else 0
+    def server_date(self):
+        """服务器的当前日期，与存储过程、触发器中的 CURDATE() 一致；查询出错时返回 None（退回本机日期）"""
+        rows = self.db.execute_query("SELECT CURDATE() AS today")
+        return rows[0]['today'] if rows else None
+
+    def calculate_overdue_days(self, borrow_date, due_date, return_date, today=None):
+
+        if today is None and not return_date:
+            today = self.server_date()
+        return fine_policy.overdue_days(borrow_date, due_date, return_date, today)
 
 
 
     def calculate_fine(self, overdue_days):
 
-        query = "SELECT calculate_fine(%s) AS fine_amount"
+        return fine_policy.fine_for(overdue_days)
+
 
-        result = self.db.execute_query(query, (str(overdue_days),))
 
-        return result[0]['fine_amount'] if result else 0
+    def calculate_fines(self, loans, today=None):
+        """批量计算 [(超期天数, 罚款金额)]，loans 为借阅记录行或 (借阅日期, 应还日期, 归还日期)
+
+        未给出 today 时使用服务器日期，与 return_book 实际收取的罚款一致。
+        """
+        if today is None:
+            today = self.server_date()
+        return fine_policy.assess(loans, today)
 
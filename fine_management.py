@@ -6,8 +6,8 @@ Created on Sat Apr 12 20:15:28 2025
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_money
+from tkinter import ttk, messagebox, filedialog
+from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_money, run_async
 
 class FineManagementFrame(ttk.Frame):
     """罚款管理界面"""
@@ -26,11 +26,12 @@ class FineManagementFrame(ttk.Frame):
         
         ttk.Button(button_frame, text="添加罚款", command=self.add_fine).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="导出", command=self.export).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('罚款记录号', '借阅记录编号', '罚款金额')
         headings = ('罚款记录号', '借阅记录编号', '罚款金额')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
@@ -38,25 +39,38 @@ class FineManagementFrame(ttk.Frame):
     
     def refresh(self):
         """刷新表格数据"""
-        self.table.clear()
-        
-        # 获取所有罚款记录
-        fines = self.db.get_all_fines()
-        if not fines:
+        # 按页加载罚款记录
+        self.table.load_pages(self.db.get_fines_page, lambda fine: (
+            fine['罚款记录号'],
+            fine['借阅记录编号'],
+            format_money(fine['罚款金额'])
+        ))
+    
+    def export(self):
+        """把全部罚款记录导出为 CSV 文件"""
+        path = filedialog.asksaveasfilename(
+            title="导出罚款记录",
+            defaultextension=".csv",
+            filetypes=[("CSV 文件", "*.csv"), ("所有文件", "*.*")]
+        )
+        if not path:
             return
         
-        # 添加数据到表格
-        for fine in fines:
-            self.table.add_row((
-                fine['罚款记录号'],
-                fine['借阅记录编号'],
-                format_money(fine['罚款金额'])
-            ))
+        run_async(self.table, self.db.export_fines, path, on_success=self.show_export_result)
+    
+    def show_export_result(self, count):
+        if count is None:
+            show_error("导出罚款记录失败")
+        else:
+            show_info(f"已导出 {count} 条罚款记录")
     
     def add_fine(self):
         """添加罚款"""
-        # 获取所有借阅记录
-        borrow_records = self.db.get_all_borrow_records()
+        # 在后台获取所有借阅记录，完成后再弹出选择对话框
+        run_async(self.table, self.db.get_all_borrow_records, on_success=self.choose_and_add_fine)
+    
+    def choose_and_add_fine(self, borrow_records):
+        """选择借阅记录并添加罚款"""
         if not borrow_records:
             show_error("没有可用的借阅记录")
             return
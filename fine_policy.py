@@ -0,0 +1,78 @@
+"""超期天数与罚款的计算规则，与 create.sql 中的 calculate_overdue_days、calculate_fine、
+get_borrow_status 函数以及还书触发器的规则（每超期一天罚款 1 元）保持一致
+
+纯日期运算，不访问数据库；数据库函数以服务器的 CURDATE() 为今天，调用方应传入服务器日期
+（DatabaseOperations.server_date()），省略 today 时才退回本机日期。修改 create.sql 中的规则时需要同步修改这里，
+并运行 python -m benchmark fines 与数据库函数核对。
+"""
+import datetime
+from decimal import Decimal
+
+# 每超期一天的罚款金额（元），与 calculate_fine 函数一致
+FINE_PER_DAY = Decimal('1.00')
+
+# 借阅状态，与 get_borrow_status 函数一致
+STATUS_BORROWED = '未归还'
+STATUS_RETURNED_LATE = '已超期归还'
+STATUS_RETURNED_ON_TIME = '已按时归还'
+
+
+def to_date(value):
+    """把 date、datetime 或 'YYYY-MM-DD' 字符串转换为 date，None 保持为 None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def overdue_days(borrow_date, due_date, return_date, today=None):
+    """超期天数：未归还时算到 today（服务器日期，省略时为本机日期），已归还时算到归还日期，未超期为 0
+
+    borrow_date 不参与计算，保留该参数是为了与 calculate_overdue_days 函数的参数一致。
+    """
+    due = to_date(due_date)
+    if due is None:
+        return 0
+    end = to_date(return_date) or to_date(today) or datetime.date.today()
+    return max((end - due).days, 0)
+
+
+def fine_for(days):
+    """超期 days 天的罚款金额"""
+    return (int(days) * FINE_PER_DAY).quantize(FINE_PER_DAY)
+
+
+def borrow_status(due_date, return_date):
+    """借阅状态：未归还、已超期归还或已按时归还"""
+    if return_date is None:
+        return STATUS_BORROWED
+    due = to_date(due_date)
+    if due is not None and to_date(return_date) > due:
+        return STATUS_RETURNED_LATE
+    return STATUS_RETURNED_ON_TIME
+
+
+def assess(loans, today=None):
+    """批量计算超期天数和罚款，返回与 loans 顺序相同的 [(超期天数, 罚款金额)]
+
+    loans 中每一项为 (借阅日期, 应还日期, 归还日期) 或可按列名访问的行（字典或查询返回的 Row）。
+    日期先统一换成序数，同一调用中的所有记录共用一个 today（服务器日期，省略时为本机日期）。
+    """
+    today = (to_date(today) or datetime.date.today()).toordinal()
+    results = []
+    for loan in loans:
+        if hasattr(loan, 'keys'):
+            due, returned = loan['应还日期'], loan['归还日期']
+        else:
+            _, due, returned = loan
+        due = to_date(due)
+        if due is None:
+            results.append((0, fine_for(0)))
+            continue
+        returned = to_date(returned)
+        days = max((returned.toordinal() if returned else today) - due.toordinal(), 0)
+        results.append((days, fine_for(days)))
+    return results
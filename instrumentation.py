@@ -0,0 +1,229 @@
+"""数据访问层的查询统计：DatabaseConnection 在每次 execute_query / execute_procedure 结束后
+把一个 QueryEvent 交给已注册的 hook
+
+内置两种 hook：
+    QueryStats    按语句指纹汇总调用次数、耗时直方图、返回行数、往返次数和调用位置，可随时或在退出时输出
+    SlowQueryLog  把耗时超过阈值的语句写成 JSON Lines，参数默认脱敏
+
+也可以在连接串中开启，例如 "...;query_stats=stats.json;slow_query_log=slow.jsonl;slow_query_ms=200"。
+没有注册 hook 时 DatabaseConnection 不做任何计时和记录。
+"""
+import atexit
+import datetime
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+# 耗时直方图的桶上界（毫秒），最后一个桶收纳其余所有值
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+# 查找调用位置时跳过的模块（数据访问层内部）
+INTERNAL_MODULES = {__name__, 'db_connection', 'contextlib'}
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST = re.compile(r'IN \(\?(?:, ?\?)*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(\(\?(?:, ?\?)*\))(?:, ?\(\?(?:, ?\?)*\))+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """语句指纹：压缩空白，字面量和占位符替换为 ?，长度不定的 IN 列表、多行 VALUES 合并为一项"""
+    text = _WHITESPACE.sub(' ', sql).strip()
+    text = _STRING.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _IN_LIST.sub('IN (?+)', text)
+    return _VALUES_LIST.sub(r'\1, ...', text)
+
+
+def redact(params):
+    """把参数替换为类型名，日志中不出现读者卡号、证件号等具体值"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def caller(skip=2):
+    """返回数据访问层之外最近一个调用帧，格式为 '模块.函数:行号'"""
+    frame = sys._getframe(skip)
+    while frame is not None and frame.f_globals.get('__name__') in INTERNAL_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+class QueryEvent:
+    """一次 execute_query / execute_procedure 调用的记录"""
+    __slots__ = ('kind', 'sql', 'params', 'elapsed_ms', 'rows', 'round_trips', 'caller', 'error', 'timestamp')
+
+    def __init__(self, kind, sql, params, elapsed_ms, rows, round_trips, caller, error=None):
+        self.kind = kind  # 'query' 或 'procedure'
+        self.sql = sql  # 存储过程为过程名
+        self.params = params
+        self.elapsed_ms = elapsed_ms
+        self.rows = rows
+        self.round_trips = round_trips
+        self.caller = caller
+        self.error = error
+        self.timestamp = time.time()
+
+    @property
+    def fingerprint(self):
+        return f"CALL {self.sql}" if self.kind == 'procedure' else fingerprint(self.sql)
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """按桶估计百分位数（取所在桶的上界，不超过最大值）"""
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class StatementStats:
+    """同一指纹语句的累计数据"""
+    def __init__(self, kind, fingerprint):
+        self.kind = kind
+        self.fingerprint = fingerprint
+        self.latency = Histogram()
+        self.errors = 0
+        self.rows = 0
+        self.round_trips = 0
+        self.callers = Counter()
+
+    def add(self, event):
+        self.latency.observe(event.elapsed_ms)
+        if event.error:
+            self.errors += 1
+        self.rows += event.rows or 0
+        self.round_trips += event.round_trips
+        self.callers[event.caller] += 1
+
+    def as_dict(self, top_callers=5):
+        latency = self.latency
+        return {
+            'kind': self.kind,
+            'fingerprint': self.fingerprint,
+            'calls': latency.count,
+            'errors': self.errors,
+            'total_ms': round(latency.total, 3),
+            'mean_ms': round(latency.total / latency.count, 3) if latency.count else None,
+            'p50_ms': latency.percentile(50),
+            'p95_ms': latency.percentile(95),
+            'p99_ms': latency.percentile(99),
+            'max_ms': round(latency.max, 3),
+            'rows': self.rows,
+            'round_trips': self.round_trips,
+            'callers': dict(self.callers.most_common(top_callers)),
+            'histogram': dict(zip(map(str, latency.buckets), latency.counts)),
+        }
+
+
+class QueryStats:
+    """按语句指纹汇总的统计 hook"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def on_query(self, event):
+        key = (event.kind, event.fingerprint)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats(*key)
+            stats.add(event)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+    def summary(self):
+        """各语句的统计，按总耗时从高到低排列"""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._statements.values()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def format_summary(self, limit=20):
+        lines = [f"{'调用':>7} {'总耗时ms':>10} {'p95ms':>7} {'行数':>9} {'往返':>7}  语句 / 主要调用位置"]
+        for row in self.summary()[:limit]:
+            top = next(iter(row['callers']), '?')
+            lines.append(f"{row['calls']:>7} {row['total_ms']:>10.1f} {row['p95_ms']:>7} {row['rows']:>9} "
+                         f"{row['round_trips']:>7}  {row['fingerprint'][:100]}\n{'':>45}{top}")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """输出统计：给出 path 时写成 JSON 文件，否则打印到标准输出"""
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                           'statements': self.summary()}, f, ensure_ascii=False, indent=2)
+        else:
+            print(self.format_summary())
+
+    def dump_at_exit(self, path=None):
+        atexit.register(self.dump, path)
+        return self
+
+
+class SlowQueryLog:
+    """把耗时不少于 threshold_ms 毫秒（或出错）的语句追加写入 JSON Lines 文件"""
+    def __init__(self, path, threshold_ms=200.0, redact_params=True, log_errors=True):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.redact_params = redact_params
+        self.log_errors = log_errors
+        self._lock = threading.Lock()
+
+    def on_query(self, event):
+        if event.elapsed_ms < self.threshold_ms and not (self.log_errors and event.error):
+            return
+        record = {
+            'time': datetime.datetime.fromtimestamp(event.timestamp).isoformat(timespec='milliseconds'),
+            'kind': event.kind,
+            'fingerprint': event.fingerprint,
+            'sql': ' '.join(event.sql.split()),
+            'params': redact(event.params) if self.redact_params else event.params,
+            'elapsed_ms': round(event.elapsed_ms, 3),
+            'rows': event.rows,
+            'round_trips': event.round_trips,
+            'caller': event.caller,
+            'error': event.error,
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
@@ -5,14 +5,18 @@ import sys
 
 # 导入自定义模块
 from db_operations import DatabaseOperations
-from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_date, format_money
+from async_loader import AsyncLoader
+from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_date, format_money, run_async
 
 # 导入功能模块
 from book_management import BookManagementFrame, CategoryManagementFrame, PublisherManagementFrame
 from reader_management import ReaderManagementFrame, BorrowHistoryWindow
 from borrow_management import BorrowManagementFrame, ReturnManagementFrame, RenewManagementFrame
 from fine_management import FineManagementFrame
-from query_management import BookQueryFrame, BorrowQueryFrame, ReaderHistoryFrame
+from query_management import BookQueryFrame, BorrowQueryFrame, ReaderStatsFrame, ReaderHistoryFrame
+
+# 检查是否需要代替 event_scheduler 执行每日更新的间隔（毫秒）
+ROLL_CHECK_INTERVAL_MS = 60 * 60 * 1000
 
 class SchoolLibrarySystem:
     def __init__(self, root, connection_string):
@@ -23,6 +27,12 @@ class SchoolLibrarySystem:
         # 初始化数据库操作，使用连接串创建实例
         self.db = DatabaseOperations(connection_string)
 
+        # 后台加载器：数据库查询在工作线程中执行，不阻塞界面
+        self.loader = AsyncLoader(self.root)
+
+        # 未开启 event_scheduler 时由客户端代为执行每日的预计罚款、借阅热度更新
+        self.roll_daily_statistics()
+
         # 创建菜单
         self.create_menu()
 
@@ -43,12 +53,20 @@ class SchoolLibrarySystem:
         self.create_function_buttons()
         
 
+    def roll_daily_statistics(self):
+        """在后台检查并执行每日更新，之后每小时检查一次服务器日期是否变化"""
+        run_async(self.root, self.db.roll_daily_statistics)
+        self.root.after(ROLL_CHECK_INTERVAL_MS, self.roll_daily_statistics)
+
     def create_menu(self):
         """创建菜单栏"""
         menubar = tk.Menu(self.root)
 
         # 文件菜单
         file_menu = tk.Menu(menubar, tearoff=0)
+        if self.db.db.query_stats is not None:
+            # 连接串中设置了 query_stats 时可以随时输出查询统计
+            file_menu.add_command(label="输出查询统计", command=self.dump_query_stats)
         file_menu.add_command(label="退出", command=self.root.quit)
         menubar.add_cascade(label="文件", menu=file_menu)
 
@@ -81,6 +99,7 @@ class SchoolLibrarySystem:
         query_menu.add_command(label="图书信息查询", command=self.show_book_query)
         query_menu.add_command(label="借阅信息查询", command=self.show_borrow_query)
         query_menu.add_command(label="读者借阅历史", command=self.show_reader_history)
+        query_menu.add_command(label="读者借阅统计", command=self.show_reader_stats)
         menubar.add_cascade(label="查询", menu=query_menu)
 
         
@@ -108,7 +127,8 @@ class SchoolLibrarySystem:
             ("罚款管理", self.show_fine_management),
             ("图书信息查询", self.show_book_query),
             ("借阅信息查询", self.show_borrow_query),
-            ("读者借阅历史", self.show_reader_history)
+            ("读者借阅历史", self.show_reader_history),
+            ("读者借阅统计", self.show_reader_stats)
         ]
 
         for i, (text, command) in enumerate(buttons):
@@ -120,6 +140,8 @@ class SchoolLibrarySystem:
 
     def clear_main_frame(self):
         """清空主框架"""
+        # 取消当前界面尚未完成的后台加载
+        self.loader.cancel_within(self.main_frame)
         for widget in self.main_frame.winfo_children():
             widget.destroy()
 
@@ -183,8 +205,18 @@ class SchoolLibrarySystem:
         self.clear_main_frame()
         ReaderHistoryFrame(self.main_frame, self.db)
 
+    def show_reader_stats(self):
+        """显示读者借阅统计界面"""
+        self.clear_main_frame()
+        ReaderStatsFrame(self.main_frame, self.db)
+
     
     # 帮助相关方法
+    def dump_query_stats(self):
+        """把当前的查询统计打印到控制台"""
+        self.db.db.query_stats.dump()
+        show_info("查询统计已输出到控制台")
+
     def show_about(self):
         """显示关于对话框"""
         messagebox.showinfo(
@@ -204,3 +236,4 @@ if __name__ == "__main__":
     connection_string = "host=localhost;user=root;password=123456;database=school_library"
     app = SchoolLibrarySystem(root, connection_string)
     root.mainloop()
+    app.loader.shutdown()
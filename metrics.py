@@ -0,0 +1,354 @@
+"""运行指标：借还续借次数（按结果和失败原因）、连接池使用情况、数据库调用耗时，
+以 Prometheus 文本格式输出
+
+借还续借计数始终开启，只是一次加锁的字典自增；连接池、重试、预处理语句缓存的数值在输出时才读取；
+数据库调用耗时由 QueryMetrics hook 记录，只在开启输出后注册。
+每个进程只启动一次输出；多个 DatabaseConnection 共用同一组采集器，同一数据库的多个连接池合并计数。
+
+在连接串中开启输出，例如：
+    "...;metrics_port=9105"                              在 127.0.0.1:9105/metrics 提供 HTTP 接口
+    "...;metrics_file=/var/lib/node_exporter/library.prom;metrics_interval=15"
+                                                          定期重写文件，供 node_exporter 的 textfile 采集
+"""
+import atexit
+import os
+import re
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from instrumentation import LATENCY_BUCKETS_MS, Histogram
+
+# 失败原因标签最多保留的不同取值，超出后记为“其他”，避免标签数量无限增长
+MAX_REASONS = 50
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_DIGITS = re.compile(r'\d+')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class CounterVec:
+    """带标签的计数器"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, n=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + n
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, _labels(self.label_names, labels), value) for labels, value in values]
+
+
+class HistogramVec:
+    """带标签的耗时直方图，记录毫秒，按 Prometheus 约定以秒输出"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets_ms=LATENCY_BUCKETS_MS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets_ms = buckets_ms
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value_ms):
+        with self._lock:
+            histogram = self._histograms.get(label_values)
+            if histogram is None:
+                histogram = self._histograms[label_values] = Histogram(self.buckets_ms)
+            histogram.observe(value_ms)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for labels, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound / 1000)
+                    result.append((self.name + '_bucket', _labels(self.label_names, labels, f'le="{le}"'), cumulative))
+                result.append((self.name + '_sum', _labels(self.label_names, labels), histogram.total / 1000))
+                result.append((self.name + '_count', _labels(self.label_names, labels), histogram.count))
+        return result
+
+
+class GaugeCollector:
+    """输出时调用 collect() 取值的指标，collect 返回 [(标签值元组, 数值)]"""
+    def __init__(self, name, help_text, label_names, collect, kind='gauge'):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        return [(self.name, _labels(self.label_names, labels), value) for labels, value in self.collect()]
+
+
+class Registry:
+    """全部指标，render() 生成 Prometheus 文本格式"""
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(CounterVec(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=()):
+        return self.register(HistogramVec(name, help_text, label_names))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        # 同名的指标（例如另行注册到同一 Registry 的采集器）只输出一次 HELP / TYPE
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CIRCULATION = REGISTRY.counter(
+    'library_circulation_total', "借书、还书、续借次数，按结果和失败原因（p_message）划分",
+    ('action', 'outcome', 'reason'))
+
+QUERY_DURATION = REGISTRY.histogram(
+    'library_db_call_duration_seconds', "数据库调用耗时，operation 为 DatabaseOperations 方法名或存储过程名",
+    ('kind', 'operation'))
+
+QUERY_ERRORS = REGISTRY.counter(
+    'library_db_call_errors_total', "出错的数据库调用次数", ('kind', 'operation'))
+
+_reasons = set()
+_reasons_lock = threading.Lock()
+
+# 已注册的连接（不阻止连接被回收）、已添加采集器的 Registry，以及是否已启动输出
+_connections = weakref.WeakSet()
+_collected_registries = []
+_exporting = False
+_setup_lock = threading.Lock()
+
+
+def failure_reason(message):
+    """从 p_message 中取出失败原因（“借阅失败：该书已无库存” -> “该书已无库存”），数字替换为 N"""
+    reason = _DIGITS.sub('N', message.split('：', 1)[-1].strip()) or '未知'
+    with _reasons_lock:
+        if reason not in _reasons:
+            if len(_reasons) >= MAX_REASONS:
+                return '其他'
+            _reasons.add(reason)
+    return reason
+
+
+def record_circulation(action, result, count=1):
+    """记录一次借书（'borrow'）、还书（'return'）或续借（'renew'）的结果；result 为 None 表示数据库出错"""
+    if result is None:
+        CIRCULATION.inc(action, 'error', '数据库错误', n=count)
+    elif result.success:
+        CIRCULATION.inc(action, 'success', '', n=count)
+    else:
+        CIRCULATION.inc(action, 'failure', failure_reason(result.message), n=count)
+
+
+class QueryMetrics:
+    """instrumentation hook：按调用方法或存储过程记录数据库调用耗时和错误"""
+    def on_query(self, event):
+        if event.kind == 'procedure':
+            operation = event.sql
+        else:
+            # caller 形如 'db_operations.get_book_by_id:123'，只取函数名，标签取值数量由代码决定
+            operation = event.caller.rsplit(':', 1)[0].rsplit('.', 1)[-1]
+        labels = (event.kind, operation)
+        QUERY_DURATION.observe(labels, event.elapsed_ms)
+        if event.error:
+            QUERY_ERRORS.inc(*labels)
+
+
+def _per_database(sample):
+    """对每个已注册的连接调用 sample(db) 得到 [(标签值元组, 数值)]，加上 database 标签，同一数据库的多个连接相加"""
+    with _setup_lock:
+        connections = list(_connections)
+    totals = {}
+    for db in connections:
+        database = (db.database or 'default',)
+        for labels, value in sample(db):
+            key = database + labels
+            totals[key] = totals.get(key, 0) + value
+    return sorted(totals.items())
+
+
+def _pool_state(db):
+    pool = db.pool
+    if pool is None:
+        return []
+    return [(('max',), pool.max_size),
+            (('open',), pool.size),
+            (('idle',), pool.idle_count),
+            (('in_use',), pool.size - pool.idle_count)]
+
+
+def _retries(db):
+    stats = db.retry_stats()
+    return [((result, str(errno)), n)
+            for result in ('retried', 'exhausted') for errno, n in sorted(stats[result].items())]
+
+
+def _statement_cache(db):
+    return [((key,), n) for key, n in sorted(db.statement_cache_stats().items())]
+
+
+def register_connection(db, registry=REGISTRY):
+    """为 DatabaseConnection 注册耗时 hook，并把它加入连接池、重试、预处理语句缓存的采集范围
+
+    同一连接只注册一次；采集器在每个 Registry 中只添加一次，返回是否为新注册的连接。
+    """
+    with _setup_lock:
+        if db in _connections:
+            return False
+        _connections.add(db)
+        add_collectors = not any(r is registry for r in _collected_registries)
+        if add_collectors:
+            _collected_registries.append(registry)
+    db.add_hook(QueryMetrics())
+    if not add_collectors:
+        return True
+
+    def pool_state():
+        return _per_database(_pool_state)
+
+    def retries():
+        return _per_database(_retries)
+
+    def statement_cache():
+        return _per_database(_statement_cache)
+
+    registry.register(GaugeCollector(
+        'library_db_pool_connections', "连接池中的连接数：上限、已创建、空闲、借出", ('database', 'state'), pool_state))
+    registry.register(GaugeCollector(
+        'library_db_retries_total', "死锁、锁等待超时、断线的重试次数与重试用尽次数", ('database', 'result', 'errno'),
+        retries, kind='counter'))
+    registry.register(GaugeCollector(
+        'library_db_statement_cache_total', "预处理语句缓存的命中、新建、淘汰次数", ('database', 'event'),
+        statement_cache, kind='counter'))
+    return True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台打印每次抓取
+
+
+def serve_http(port, host='127.0.0.1', registry=REGISTRY):
+    """在后台线程中提供 /metrics 接口，返回 HTTPServer（调用 shutdown() 停止）"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def write_file(path, registry=REGISTRY):
+    """先写临时文件再替换，采集方不会读到写了一半的文件"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def write_file_periodically(path, interval=15.0, registry=REGISTRY):
+    """每 interval 秒重写一次指标文件，退出时再写一次；返回用于停止的 Event"""
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            try:
+                write_file(path, registry)
+            except OSError as e:
+                print(f"写入指标文件时出错: {e}")
+            if stop.wait(interval):
+                return
+
+    def write_at_exit():
+        stop.set()
+        try:
+            write_file(path, registry)
+        except OSError as e:
+            print(f"写入指标文件时出错: {e}")
+
+    threading.Thread(target=loop, name='metrics-file', daemon=True).start()
+    atexit.register(write_at_exit)
+    return stop
+
+
+def configure(db, options):
+    """按连接串中的 metrics_port / metrics_host / metrics_file / metrics_interval 开启指标输出
+
+    每个连接都会注册到采集范围，HTTP 接口和指标文件只在进程中第一次调用时启动。
+    """
+    global _exporting
+    port = options.get('metrics_port')
+    path = options.get('metrics_file')
+    if not port and not path:
+        return False
+    register_connection(db)
+    with _setup_lock:
+        if _exporting:
+            return True
+        _exporting = True
+    if port:
+        try:
+            serve_http(int(port), options.get('metrics_host', '127.0.0.1'))
+        except OSError as e:
+            # 同一台机器上开了多个窗口时端口可能已被占用
+            print(f"启动指标接口时出错: {e}")
+    if path:
+        write_file_periodically(path, float(options.get('metrics_interval', 15)))
+    return True
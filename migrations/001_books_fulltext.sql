@@ -0,0 +1,5 @@
+-- 为已有数据库添加书名、作者全文索引（新建数据库请直接使用 create.sql）
+USE school_library;
+
+ALTER TABLE books
+    ADD FULLTEXT INDEX ft_books_title_author (书名, 作者) WITH PARSER ngram;
@@ -0,0 +1,10 @@
+-- 为已有数据库的借阅记录表添加借阅热点查询使用的复合索引（新建数据库请直接使用 create.sql）
+USE school_library;
+
+ALTER TABLE borrow_records
+    ADD INDEX idx_borrow_reader_returned (读者卡号, 归还日期),
+    ADD INDEX idx_borrow_returned_due (归还日期, 应还日期),
+    ADD INDEX idx_borrow_reader_date (读者卡号, 借阅日期);
+
+-- 读者卡号外键改由 idx_borrow_reader_returned 支持，删除自动创建的单列索引
+ALTER TABLE borrow_records DROP INDEX 读者卡号;
@@ -0,0 +1,43 @@
+-- 重建借书存储过程：锁定图书行后再检查库存，避免并发借出最后一本（新建数据库请直接使用 create.sql）
+USE school_library;
+
+DROP PROCEDURE IF EXISTS borrow_book;
+
+DELIMITER //
+CREATE PROCEDURE borrow_book(
+    IN p_reader_id VARCHAR(20),
+    IN p_book_id VARCHAR(20),
+    OUT p_success BOOLEAN,
+    OUT p_message VARCHAR(100)
+)
+BEGIN
+    DECLARE book_available INT DEFAULT NULL;
+    DECLARE current_date_var DATE DEFAULT CURDATE();
+    DECLARE due_date DATE;
+    
+    -- 检查图书是否有库存，同时锁定该图书行直到事务提交：
+    -- 多个柜台同时借同一本书时依次执行，不会同时借出最后一本
+    SELECT 在库数量 INTO book_available FROM books WHERE 索书号 = p_book_id FOR UPDATE;
+    
+    -- 设置默认值
+    SET p_success = FALSE;
+    SET p_message = '';
+    
+    -- 设置应还日期（借阅日期后30天）
+    SET due_date = DATE_ADD(current_date_var, INTERVAL 30 DAY);
+    
+    -- 检查图书是否存在、是否有足够库存
+    IF book_available IS NULL THEN
+        SET p_message = '借阅失败：图书不存在';
+    ELSEIF book_available <= 0 THEN
+        SET p_message = '借阅失败：该书已无库存';
+    ELSE
+        -- 执行借阅操作
+        INSERT INTO borrow_records(读者卡号, 索书号, 借阅日期, 应还日期, 归还日期)
+        VALUES(p_reader_id, p_book_id, current_date_var, due_date, NULL);
+        
+        SET p_success = TRUE;
+        SET p_message = '借阅成功';
+    END IF;
+END //
+DELIMITER ;
@@ -0,0 +1,73 @@
+-- 合并还书触发器：after_return_update 同时处理在库数量和罚款，删除 after_return_fine；
+-- 重建还书存储过程，罚款改为读取触发器写入的记录（新建数据库请直接使用 create.sql）
+USE school_library;
+
+DROP TRIGGER IF EXISTS after_return_fine;
+DROP TRIGGER IF EXISTS after_return_update;
+DROP PROCEDURE IF EXISTS return_book;
+
+-- 还书触发器：归还时更新图书在库数量，超期的同时插入罚款记录（每天1元）
+-- 两项处理放在同一个触发器中，归还条件只判断一次，罚款也只在这里计算
+DELIMITER //
+CREATE TRIGGER after_return_update
+AFTER UPDATE ON borrow_records
+FOR EACH ROW
+BEGIN
+    IF OLD.归还日期 IS NULL AND NEW.归还日期 IS NOT NULL THEN
+        UPDATE books 
+        SET 在库数量 = 在库数量 + 1
+        WHERE 索书号 = NEW.索书号;
+        
+        IF NEW.归还日期 > NEW.应还日期 THEN
+            INSERT INTO fines(借阅记录编号, 罚款金额)
+            VALUES(NEW.借阅记录编号, DATEDIFF(NEW.归还日期, NEW.应还日期) * 1.00);
+        END IF;
+    END IF;
+END //
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE return_book(
+    IN p_borrow_id INT,
+    OUT p_success BOOLEAN,
+    OUT p_message VARCHAR(100),
+    OUT p_fine DECIMAL(10,2)
+)
+BEGIN
+    DECLARE is_returned BOOLEAN DEFAULT FALSE;
+    DECLARE current_date_var DATE DEFAULT CURDATE();
+    DECLARE due_date DATE DEFAULT NULL;
+    
+    -- 设置默认值
+    SET p_success = FALSE;
+    SET p_message = '';
+    SET p_fine = 0;
+    
+    -- 检查借阅记录是否存在且未归还（锁定该记录直到事务提交）
+    SELECT 归还日期 IS NOT NULL, 应还日期 INTO is_returned, due_date 
+    FROM borrow_records WHERE 借阅记录编号 = p_borrow_id
+    FOR UPDATE;
+    
+    -- 检查是否存在、是否已经归还
+    IF due_date IS NULL THEN
+        SET p_message = '还书失败：借阅记录不存在';
+    ELSEIF is_returned THEN
+        SET p_message = '还书失败：该书已归还';
+    ELSE
+        -- 执行还书操作，在库数量与罚款记录由 after_return_update 触发器处理
+        UPDATE borrow_records 
+        SET 归还日期 = current_date_var
+        WHERE 借阅记录编号 = p_borrow_id;
+        
+        -- 超期时读取触发器写入的罚款
+        IF current_date_var > due_date THEN
+            SELECT 罚款金额 INTO p_fine FROM fines WHERE 借阅记录编号 = p_borrow_id;
+            SET p_message = CONCAT('还书成功，超期', DATEDIFF(current_date_var, due_date), '天，需缴纳罚款', p_fine, '元');
+        ELSE
+            SET p_message = '还书成功，未超期';
+        END IF;
+        
+        SET p_success = TRUE;
+    END IF;
+END //
+DELIMITER ;
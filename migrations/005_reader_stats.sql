@@ -0,0 +1,119 @@
+-- 添加读者借阅统计表及维护它的触发器、重建存储过程（新建数据库请直接使用 create.sql）
+USE school_library;
+
+-- 创建读者借阅统计表：由借书、还书、罚款触发器增量维护，rebuild_reader_stats 可全量重建
+CREATE TABLE reader_stats (
+    读者卡号 VARCHAR(20) PRIMARY KEY,
+    总借阅次数 INT NOT NULL DEFAULT 0,
+    未归还数量 INT NOT NULL DEFAULT 0,
+    超期归还次数 INT NOT NULL DEFAULT 0,
+    罚款总额 DECIMAL(12,2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (读者卡号) REFERENCES readers(读者卡号) ON DELETE CASCADE,
+    INDEX idx_reader_stats_fine (罚款总额)
+) ENGINE=InnoDB;
+
+-- 创建读者借阅统计视图
+CREATE VIEW reader_stats_view AS
+SELECT s.读者卡号, r.姓名, s.总借阅次数, s.未归还数量, s.超期归还次数, s.罚款总额
+FROM reader_stats s
+JOIN readers r ON s.读者卡号 = r.读者卡号;
+
+DROP TRIGGER IF EXISTS after_borrow_insert;
+DROP TRIGGER IF EXISTS after_return_update;
+DROP TRIGGER IF EXISTS after_reader_insert;
+DROP TRIGGER IF EXISTS after_fine_insert;
+DROP PROCEDURE IF EXISTS rebuild_reader_stats;
+
+-- 借书触发器：更新图书在库数量和读者借阅统计
+DELIMITER //
+CREATE TRIGGER after_borrow_insert
+AFTER INSERT ON borrow_records
+FOR EACH ROW
+BEGIN
+    UPDATE books 
+    SET 在库数量 = 在库数量 - 1
+    WHERE 索书号 = NEW.索书号;
+    
+    -- 直接插入已归还的历史记录时同样计入统计
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数)
+    VALUES(NEW.读者卡号, 1, NEW.归还日期 IS NULL, IFNULL(NEW.归还日期 > NEW.应还日期, 0))
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        未归还数量 = 未归还数量 + (NEW.归还日期 IS NULL),
+        超期归还次数 = 超期归还次数 + IFNULL(NEW.归还日期 > NEW.应还日期, 0);
+END //
+DELIMITER ;
+
+-- 还书触发器：归还时更新图书在库数量，超期的同时插入罚款记录（每天1元）
+-- 两项处理放在同一个触发器中，归还条件只判断一次，罚款也只在这里计算
+DELIMITER //
+CREATE TRIGGER after_return_update
+AFTER UPDATE ON borrow_records
+FOR EACH ROW
+BEGIN
+    IF OLD.归还日期 IS NULL AND NEW.归还日期 IS NOT NULL THEN
+        UPDATE books 
+        SET 在库数量 = 在库数量 + 1
+        WHERE 索书号 = NEW.索书号;
+        
+        UPDATE reader_stats
+        SET 未归还数量 = 未归还数量 - 1,
+            超期归还次数 = 超期归还次数 + (NEW.归还日期 > NEW.应还日期)
+        WHERE 读者卡号 = NEW.读者卡号;
+        
+        IF NEW.归还日期 > NEW.应还日期 THEN
+            INSERT INTO fines(借阅记录编号, 罚款金额)
+            VALUES(NEW.借阅记录编号, DATEDIFF(NEW.归还日期, NEW.应还日期) * 1.00);
+        END IF;
+    END IF;
+END //
+DELIMITER ;
+
+-- 新增读者触发器：建立读者借阅统计记录
+DELIMITER //
+CREATE TRIGGER after_reader_insert
+AFTER INSERT ON readers
+FOR EACH ROW
+BEGIN
+    INSERT IGNORE INTO reader_stats(读者卡号) VALUES(NEW.读者卡号);
+END //
+DELIMITER ;
+
+-- 罚款触发器：累加读者罚款总额（还书触发器自动生成的罚款和手工添加的罚款都经过这里）
+DELIMITER //
+CREATE TRIGGER after_fine_insert
+AFTER INSERT ON fines
+FOR EACH ROW
+BEGIN
+    DECLARE v_reader_id VARCHAR(20);
+    
+    SELECT 读者卡号 INTO v_reader_id
+    FROM borrow_records WHERE 借阅记录编号 = NEW.借阅记录编号;
+    
+    UPDATE reader_stats
+    SET 罚款总额 = 罚款总额 + NEW.罚款金额
+    WHERE 读者卡号 = v_reader_id;
+END //
+DELIMITER ;
+
+-- 全量重建读者借阅统计，用于修复直接修改、删除借阅或罚款记录造成的偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_reader_stats()
+BEGIN
+    DELETE FROM reader_stats;
+    
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数, 罚款总额)
+    SELECT r.读者卡号,
+           COUNT(br.借阅记录编号),
+           COALESCE(SUM(br.归还日期 IS NULL), 0),
+           COALESCE(SUM(br.归还日期 > br.应还日期), 0),
+           COALESCE(SUM(f.罚款金额), 0)
+    FROM readers r
+    LEFT JOIN borrow_records br ON r.读者卡号 = br.读者卡号
+    LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
+    GROUP BY r.读者卡号;
+END //
+DELIMITER ;
+
+-- 根据现有数据初始化统计
+CALL rebuild_reader_stats();
@@ -0,0 +1,113 @@
+-- 添加图书借阅热度计数表、维护它的借书触发器、滚动与重建存储过程（新建数据库请直接使用 create.sql）
+USE school_library;
+
+-- 创建图书借阅热度表：借书触发器累加计数，“最受欢迎图书”按计数列索引倒序读取前 N 行
+-- 近30天借阅次数统计借阅日期在最近 30 天（含当天）内的借阅，由 roll_book_popularity 每天移出过期的部分
+CREATE TABLE book_popularity (
+    索书号 VARCHAR(20) PRIMARY KEY,
+    总借阅次数 INT NOT NULL DEFAULT 0,
+    近30天借阅次数 INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (索书号) REFERENCES books(索书号) ON DELETE CASCADE,
+    INDEX idx_popularity_total (总借阅次数),
+    INDEX idx_popularity_recent (近30天借阅次数)
+) ENGINE=InnoDB;
+
+-- 创建图书每日借阅次数表：只保存最近 30 天，过期时从近30天借阅次数中减去
+CREATE TABLE book_daily_borrows (
+    索书号 VARCHAR(20) NOT NULL,
+    借阅日期 DATE NOT NULL,
+    借阅次数 INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (索书号, 借阅日期),
+    FOREIGN KEY (索书号) REFERENCES books(索书号) ON DELETE CASCADE,
+    INDEX idx_daily_borrows_date (借阅日期)
+) ENGINE=InnoDB;
+
+DROP TRIGGER IF EXISTS after_borrow_insert;
+DROP PROCEDURE IF EXISTS roll_book_popularity;
+DROP PROCEDURE IF EXISTS rebuild_book_popularity;
+DROP EVENT IF EXISTS roll_book_popularity_daily;
+
+-- 借书触发器：更新图书在库数量、读者借阅统计和图书借阅热度
+DELIMITER //
+CREATE TRIGGER after_borrow_insert
+AFTER INSERT ON borrow_records
+FOR EACH ROW
+BEGIN
+    UPDATE books 
+    SET 在库数量 = 在库数量 - 1
+    WHERE 索书号 = NEW.索书号;
+    
+    -- 直接插入已归还的历史记录时同样计入统计
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数)
+    VALUES(NEW.读者卡号, 1, NEW.归还日期 IS NULL, IFNULL(NEW.归还日期 > NEW.应还日期, 0))
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        未归还数量 = 未归还数量 + (NEW.归还日期 IS NULL),
+        超期归还次数 = 超期归还次数 + IFNULL(NEW.归还日期 > NEW.应还日期, 0);
+    
+    -- 借阅热度：借阅日期在最近 30 天内的同时计入当天的计数桶
+    INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数)
+    VALUES(NEW.索书号, 1, NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY)
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        近30天借阅次数 = 近30天借阅次数 + (NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY);
+    
+    IF NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY THEN
+        INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数)
+        VALUES(NEW.索书号, NEW.借阅日期, 1)
+        ON DUPLICATE KEY UPDATE 借阅次数 = 借阅次数 + 1;
+    END IF;
+END //
+DELIMITER ;
+
+-- 将超出 30 天窗口的每日计数从近30天借阅次数中减去并删除，每天运行一次
+DELIMITER //
+CREATE PROCEDURE roll_book_popularity()
+BEGIN
+    UPDATE book_popularity p
+    JOIN (
+        SELECT 索书号, SUM(借阅次数) AS 过期次数
+        FROM book_daily_borrows
+        WHERE 借阅日期 < CURDATE() - INTERVAL 29 DAY
+        GROUP BY 索书号
+    ) d ON p.索书号 = d.索书号
+    SET p.近30天借阅次数 = p.近30天借阅次数 - d.过期次数;
+    
+    DELETE FROM book_daily_borrows WHERE 借阅日期 < CURDATE() - INTERVAL 29 DAY;
+END //
+DELIMITER ;
+
+-- 全量重建图书借阅热度，用于初始化或修复偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_book_popularity()
+BEGIN
+    DELETE FROM book_daily_borrows;
+    DELETE FROM book_popularity;
+    
+    INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数)
+    SELECT 索书号, 借阅日期, COUNT(*)
+    FROM borrow_records
+    WHERE 借阅日期 >= CURDATE() - INTERVAL 29 DAY
+    GROUP BY 索书号, 借阅日期;
+    
+    INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数)
+    SELECT 索书号, COUNT(*), SUM(借阅日期 >= CURDATE() - INTERVAL 29 DAY)
+    FROM borrow_records
+    GROUP BY 索书号;
+END //
+DELIMITER ;
+
+-- 每天凌晨滚动一次借阅热度窗口（需要开启 event_scheduler）
+DELIMITER //
+CREATE EVENT roll_book_popularity_daily
+ON SCHEDULE EVERY 1 DAY STARTS CURDATE() + INTERVAL 1 DAY + INTERVAL 1 HOUR
+DO
+BEGIN
+    START TRANSACTION;
+    CALL roll_book_popularity();
+    COMMIT;
+END //
+DELIMITER ;
+
+-- 根据现有借阅记录初始化计数
+CALL rebuild_book_popularity();
@@ -0,0 +1,158 @@
+-- 添加借阅状态表，借阅信息视图改为读取该表（新建数据库请直接使用 create.sql）
+-- 注意：预计罚款的每日更新依赖 event_scheduler，见文件末尾 roll_borrow_status_daily 的说明
+USE school_library;
+
+-- 创建借阅状态表：每条借阅记录的借阅状态与预计罚款，由借书、还书、续借触发器维护，
+-- 未归还且已超期记录的预计罚款随日期增长，由 roll_borrow_status 每天更新
+CREATE TABLE borrow_status (
+    借阅记录编号 INT PRIMARY KEY,
+    借阅状态 VARCHAR(10) NOT NULL,
+    预计罚款 DECIMAL(10,2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (借阅记录编号) REFERENCES borrow_records(借阅记录编号) ON DELETE CASCADE,
+    INDEX idx_borrow_status (借阅状态)
+) ENGINE=InnoDB;
+
+DROP FUNCTION IF EXISTS get_borrow_status;
+DROP TRIGGER IF EXISTS after_borrow_insert;
+DROP TRIGGER IF EXISTS after_return_update;
+DROP PROCEDURE IF EXISTS roll_borrow_status;
+DROP PROCEDURE IF EXISTS rebuild_borrow_status;
+DROP EVENT IF EXISTS roll_borrow_status_daily;
+
+-- 借阅状态函数：未归还、已超期归还或已按时归还
+DELIMITER //
+CREATE FUNCTION get_borrow_status(due_date DATE, return_date DATE) 
+RETURNS VARCHAR(10)
+DETERMINISTIC
+BEGIN
+    IF return_date IS NULL THEN
+        RETURN '未归还';
+    ELSEIF return_date > due_date THEN
+        RETURN '已超期归还';
+    END IF;
+    RETURN '已按时归还';
+END //
+DELIMITER ;
+
+-- 借书触发器：更新图书在库数量、读者借阅统计、图书借阅热度和借阅状态
+DELIMITER //
+CREATE TRIGGER after_borrow_insert
+AFTER INSERT ON borrow_records
+FOR EACH ROW
+BEGIN
+    UPDATE books 
+    SET 在库数量 = 在库数量 - 1
+    WHERE 索书号 = NEW.索书号;
+    
+    -- 直接插入已归还的历史记录时同样计入统计
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数)
+    VALUES(NEW.读者卡号, 1, NEW.归还日期 IS NULL, IFNULL(NEW.归还日期 > NEW.应还日期, 0))
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        未归还数量 = 未归还数量 + (NEW.归还日期 IS NULL),
+        超期归还次数 = 超期归还次数 + IFNULL(NEW.归还日期 > NEW.应还日期, 0);
+    
+    -- 借阅热度：借阅日期在最近 30 天内的同时计入当天的计数桶
+    INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数)
+    VALUES(NEW.索书号, 1, NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY)
+    ON DUPLICATE KEY UPDATE
+        总借阅次数 = 总借阅次数 + 1,
+        近30天借阅次数 = 近30天借阅次数 + (NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY);
+    
+    IF NEW.借阅日期 >= CURDATE() - INTERVAL 29 DAY THEN
+        INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数)
+        VALUES(NEW.索书号, NEW.借阅日期, 1)
+        ON DUPLICATE KEY UPDATE 借阅次数 = 借阅次数 + 1;
+    END IF;
+    
+    -- 借阅状态
+    INSERT INTO borrow_status(借阅记录编号, 借阅状态, 预计罚款)
+    VALUES(NEW.借阅记录编号, get_borrow_status(NEW.应还日期, NEW.归还日期),
+           calculate_fine(calculate_overdue_days(NEW.借阅日期, NEW.应还日期, NEW.归还日期)));
+END //
+DELIMITER ;
+
+-- 还书触发器：归还时更新图书在库数量，超期的同时插入罚款记录（每天1元）
+-- 两项处理放在同一个触发器中，归还条件只判断一次，罚款也只在这里计算；归还、续借都会更新借阅状态
+DELIMITER //
+CREATE TRIGGER after_return_update
+AFTER UPDATE ON borrow_records
+FOR EACH ROW
+BEGIN
+    IF OLD.归还日期 IS NULL AND NEW.归还日期 IS NOT NULL THEN
+        UPDATE books 
+        SET 在库数量 = 在库数量 + 1
+        WHERE 索书号 = NEW.索书号;
+        
+        UPDATE reader_stats
+        SET 未归还数量 = 未归还数量 - 1,
+            超期归还次数 = 超期归还次数 + (NEW.归还日期 > NEW.应还日期)
+        WHERE 读者卡号 = NEW.读者卡号;
+        
+        IF NEW.归还日期 > NEW.应还日期 THEN
+            INSERT INTO fines(借阅记录编号, 罚款金额)
+            VALUES(NEW.借阅记录编号, DATEDIFF(NEW.归还日期, NEW.应还日期) * 1.00);
+        END IF;
+    END IF;
+    
+    -- 归还或续借后重新计算借阅状态与预计罚款
+    IF NOT (OLD.归还日期 <=> NEW.归还日期) OR OLD.应还日期 <> NEW.应还日期 THEN
+        UPDATE borrow_status
+        SET 借阅状态 = get_borrow_status(NEW.应还日期, NEW.归还日期),
+            预计罚款 = calculate_fine(calculate_overdue_days(NEW.借阅日期, NEW.应还日期, NEW.归还日期))
+        WHERE 借阅记录编号 = NEW.借阅记录编号;
+    END IF;
+END //
+DELIMITER ;
+
+-- 更新未归还且已超期记录的预计罚款，每天运行一次
+DELIMITER //
+CREATE PROCEDURE roll_borrow_status()
+BEGIN
+    UPDATE borrow_status s
+    JOIN borrow_records br ON s.借阅记录编号 = br.借阅记录编号
+    SET s.预计罚款 = calculate_fine(DATEDIFF(CURDATE(), br.应还日期))
+    WHERE br.归还日期 IS NULL AND br.应还日期 < CURDATE();
+END //
+DELIMITER ;
+
+-- 全量重建借阅状态，用于初始化或修复偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_borrow_status()
+BEGIN
+    DELETE FROM borrow_status;
+    
+    INSERT INTO borrow_status(借阅记录编号, 借阅状态, 预计罚款)
+    SELECT 借阅记录编号, get_borrow_status(应还日期, 归还日期),
+           calculate_fine(calculate_overdue_days(借阅日期, 应还日期, 归还日期))
+    FROM borrow_records;
+END //
+DELIMITER ;
+
+-- 每天零点后更新借阅状态中的预计罚款（需要开启 event_scheduler：SET GLOBAL event_scheduler = ON，
+-- 并在 my.cnf 中设置 event_scheduler=ON）；未开启时由客户端 DatabaseOperations.roll_daily_statistics
+-- 在程序启动后及每小时检查一次，服务器日期变化后调用 roll_borrow_status 与 roll_book_popularity
+DELIMITER //
+CREATE EVENT roll_borrow_status_daily
+ON SCHEDULE EVERY 1 DAY STARTS CURDATE() + INTERVAL 1 DAY + INTERVAL 1 MINUTE
+DO
+BEGIN
+    START TRANSACTION;
+    CALL roll_borrow_status();
+    COMMIT;
+END //
+DELIMITER ;
+
+-- 根据现有借阅记录初始化借阅状态
+CALL rebuild_borrow_status();
+
+DROP VIEW IF EXISTS borrow_info_view;
+-- 创建借阅信息视图：借阅状态、预计罚款读取 borrow_status，不再逐行计算
+CREATE VIEW borrow_info_view AS
+SELECT br.借阅记录编号, r.读者卡号, r.姓名 AS 读者姓名, 
+       b.索书号, b.书名, br.借阅日期, br.应还日期, br.归还日期,
+       s.借阅状态, s.预计罚款
+FROM borrow_records br
+JOIN borrow_status s ON br.借阅记录编号 = s.借阅记录编号
+JOIN readers r ON br.读者卡号 = r.读者卡号
+JOIN books b ON br.索书号 = b.索书号;
@@ -0,0 +1,152 @@
+-- 添加借阅记录、罚款记录归档表与分批归档存储过程，借阅历史查询和统计重建同时读取归档（新建数据库请直接使用 create.sql）
+USE school_library;
+
+-- 创建借阅记录归档表：已归还且超过保留期限的借阅记录由 archive_borrow_records 分批移入，
+-- 借阅记录表只保留近期和未归还的记录（分区表不支持外键，因此采用单独的归档表）
+CREATE TABLE borrow_records_archive (
+    借阅记录编号 INT PRIMARY KEY,
+    读者卡号 VARCHAR(20) NOT NULL,
+    索书号 VARCHAR(20) NOT NULL,
+    借阅日期 DATE NOT NULL,
+    应还日期 DATE NOT NULL,
+    归还日期 DATE NOT NULL,
+    FOREIGN KEY (读者卡号) REFERENCES readers(读者卡号),
+    FOREIGN KEY (索书号) REFERENCES books(索书号),
+    INDEX idx_archive_reader_date (读者卡号, 借阅日期)
+) ENGINE=InnoDB;
+
+-- 创建罚款记录归档表：随借阅记录一起归档
+CREATE TABLE fines_archive (
+    罚款记录号 INT PRIMARY KEY,
+    借阅记录编号 INT NOT NULL UNIQUE,
+    罚款金额 DECIMAL(10,2) NOT NULL,
+    FOREIGN KEY (借阅记录编号) REFERENCES borrow_records_archive(借阅记录编号)
+) ENGINE=InnoDB;
+
+DROP PROCEDURE IF EXISTS get_reader_borrow_history;
+DROP PROCEDURE IF EXISTS rebuild_reader_stats;
+DROP PROCEDURE IF EXISTS rebuild_book_popularity;
+DROP PROCEDURE IF EXISTS archive_borrow_records;
+
+-- 查询指定读者借阅情况的存储过程，p_include_archive 为 TRUE 时同时查询归档记录
+DELIMITER //
+CREATE PROCEDURE get_reader_borrow_history(IN reader_id VARCHAR(20), IN p_include_archive BOOLEAN)
+BEGIN
+    SELECT br.借阅记录编号, b.索书号, b.书名, b.作者, 
+           p.名称 AS 出版社, br.借阅日期, br.应还日期, br.归还日期,
+           CASE 
+               WHEN br.归还日期 IS NULL AND CURDATE() <= br.应还日期 THEN '借阅中'
+               WHEN br.归还日期 IS NULL AND CURDATE() > br.应还日期 THEN '已超期'
+               WHEN br.归还日期 <= br.应还日期 THEN '已按时归还'
+               ELSE '超期归还'
+           END AS 状态,
+           CASE 
+               WHEN br.归还日期 IS NULL AND CURDATE() > br.应还日期 
+                    THEN DATEDIFF(CURDATE(), br.应还日期)
+               WHEN br.归还日期 > br.应还日期 
+                    THEN DATEDIFF(br.归还日期, br.应还日期)
+               ELSE 0
+           END AS 超期天数,
+           COALESCE(f.罚款金额, fa.罚款金额) AS 罚款金额
+    FROM (
+        SELECT 借阅记录编号, 索书号, 借阅日期, 应还日期, 归还日期
+        FROM borrow_records WHERE 读者卡号 = reader_id
+        UNION ALL
+        SELECT 借阅记录编号, 索书号, 借阅日期, 应还日期, 归还日期
+        FROM borrow_records_archive WHERE 读者卡号 = reader_id AND p_include_archive
+    ) br
+    JOIN books b ON br.索书号 = b.索书号
+    JOIN publishers p ON b.出版社 = p.出版社号
+    LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
+    LEFT JOIN fines_archive fa ON br.借阅记录编号 = fa.借阅记录编号
+    ORDER BY br.借阅日期 DESC;
+END //
+DELIMITER ;
+
+-- 全量重建读者借阅统计，用于修复直接修改、删除借阅或罚款记录造成的偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_reader_stats()
+BEGIN
+    DELETE FROM reader_stats;
+    
+    INSERT INTO reader_stats(读者卡号, 总借阅次数, 未归还数量, 超期归还次数, 罚款总额)
+    SELECT r.读者卡号,
+           COUNT(br.借阅记录编号),
+           COALESCE(SUM(br.归还日期 IS NULL), 0),
+           COALESCE(SUM(br.归还日期 > br.应还日期), 0),
+           COALESCE(SUM(br.罚款金额), 0)
+    FROM readers r
+    LEFT JOIN (
+        -- 归档的记录同样计入统计
+        SELECT br.借阅记录编号, br.读者卡号, br.应还日期, br.归还日期, f.罚款金额
+        FROM borrow_records br
+        LEFT JOIN fines f ON br.借阅记录编号 = f.借阅记录编号
+        UNION ALL
+        SELECT a.借阅记录编号, a.读者卡号, a.应还日期, a.归还日期, fa.罚款金额
+        FROM borrow_records_archive a
+        LEFT JOIN fines_archive fa ON a.借阅记录编号 = fa.借阅记录编号
+    ) br ON r.读者卡号 = br.读者卡号
+    GROUP BY r.读者卡号;
+END //
+DELIMITER ;
+
+-- 全量重建图书借阅热度，用于初始化或修复偏差
+DELIMITER //
+CREATE PROCEDURE rebuild_book_popularity()
+BEGIN
+    DELETE FROM book_daily_borrows;
+    DELETE FROM book_popularity;
+    
+    INSERT INTO book_daily_borrows(索书号, 借阅日期, 借阅次数)
+    SELECT 索书号, 借阅日期, COUNT(*)
+    FROM borrow_records
+    WHERE 借阅日期 >= CURDATE() - INTERVAL 29 DAY
+    GROUP BY 索书号, 借阅日期;
+    
+    INSERT INTO book_popularity(索书号, 总借阅次数, 近30天借阅次数)
+    SELECT 索书号, COUNT(*), SUM(借阅日期 >= CURDATE() - INTERVAL 29 DAY)
+    FROM (
+        SELECT 索书号, 借阅日期 FROM borrow_records
+        UNION ALL
+        SELECT 索书号, 借阅日期 FROM borrow_records_archive
+    ) br
+    GROUP BY 索书号;
+END //
+DELIMITER ;
+
+-- 归档一批借阅日期早于 p_horizon_days 天前的已归还记录及其罚款，p_archived 返回本批归档的行数；
+-- 截止日期按服务器的 CURDATE() 计算，与还书、续借、触发器等其他日期规则一致；
+-- 归档不改变读者借阅统计和图书借阅热度（删除借阅记录不触发统计更新），借阅状态随外键级联删除
+DELIMITER //
+CREATE PROCEDURE archive_borrow_records(
+    IN p_horizon_days INT,
+    IN p_batch_size INT,
+    OUT p_archived INT
+)
+BEGIN
+    DROP TEMPORARY TABLE IF EXISTS archive_batch;
+    CREATE TEMPORARY TABLE archive_batch (借阅记录编号 INT PRIMARY KEY);
+    
+    -- 按主键顺序取一批，同时锁定这些记录
+    INSERT INTO archive_batch(借阅记录编号)
+    SELECT 借阅记录编号 FROM borrow_records
+    WHERE 归还日期 IS NOT NULL AND 借阅日期 < CURDATE() - INTERVAL p_horizon_days DAY
+    ORDER BY 借阅记录编号
+    LIMIT p_batch_size
+    FOR UPDATE;
+    
+    INSERT INTO borrow_records_archive(借阅记录编号, 读者卡号, 索书号, 借阅日期, 应还日期, 归还日期)
+    SELECT br.借阅记录编号, br.读者卡号, br.索书号, br.借阅日期, br.应还日期, br.归还日期
+    FROM borrow_records br JOIN archive_batch a ON br.借阅记录编号 = a.借阅记录编号;
+    
+    INSERT INTO fines_archive(罚款记录号, 借阅记录编号, 罚款金额)
+    SELECT f.罚款记录号, f.借阅记录编号, f.罚款金额
+    FROM fines f JOIN archive_batch a ON f.借阅记录编号 = a.借阅记录编号;
+    
+    DELETE f FROM fines f JOIN archive_batch a ON f.借阅记录编号 = a.借阅记录编号;
+    DELETE br FROM borrow_records br JOIN archive_batch a ON br.借阅记录编号 = a.借阅记录编号;
+    SET p_archived = ROW_COUNT();
+    
+    DROP TEMPORARY TABLE archive_batch;
+END //
+DELIMITER ;
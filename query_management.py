@@ -6,8 +6,8 @@ Created on Sat Apr 12 20:15:42 2025
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_money
+from tkinter import ttk, messagebox, filedialog
+from utils import TableFrame, EntryDialog, ComboBoxDialog, show_error, show_info, show_warning, format_money, run_async
 
 class BookQueryFrame(ttk.Frame):
     """图书信息查询界面"""
@@ -31,6 +31,7 @@ class BookQueryFrame(ttk.Frame):
         ttk.Radiobutton(query_frame, text="按索书号", variable=self.query_type, value="id").pack(side=tk.LEFT, padx=5)
         ttk.Radiobutton(query_frame, text="按书名", variable=self.query_type, value="name").pack(side=tk.LEFT, padx=5)
         ttk.Radiobutton(query_frame, text="按作者", variable=self.query_type, value="author").pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(query_frame, text="全文检索", variable=self.query_type, value="fulltext").pack(side=tk.LEFT, padx=5)
         
         self.query_entry = ttk.Entry(query_frame, width=30)
         self.query_entry.pack(side=tk.LEFT, padx=5)
@@ -40,39 +41,55 @@ class BookQueryFrame(ttk.Frame):
         # 创建表格
         columns = ('索书号', '书名', '作者', '出版社', '类别', '总数', '在库数量')
         headings = ('索书号', '书名', '作者', '出版社', '类别', '总数', '在库数量')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
         self.load_all_books()
     
+    @staticmethod
+    def to_row(book, publishers, categories):
+        return (
+            book['索书号'],
+            book['书名'],
+            book['作者'],
+            publishers.name_of(book['出版社']),
+            categories.name_of(book['类别id']),
+            book['总数'],
+            book['在库数量']
+        )
+    
     def load_all_books(self):
         """加载所有图书"""
         self.table.clear()
+        # 在后台获取出版社和类别后再分页加载图书
+        run_async(self.table, self.fetch_lookups, on_success=self.load_books)
+    
+    def fetch_lookups(self):
+        """获取出版社和类别的缓存对照表（在后台线程执行）"""
+        return self.db.get_publisher_lookup(), self.db.get_category_lookup()
+    
+    def load_books(self, lookups):
+        """按页加载所有图书"""
+        publishers, categories = lookups
+        self.table.load_pages(self.db.get_books_page, lambda book: self.to_row(book, publishers, categories))
+    
+    def fetch_books(self, field, text):
+        """按条件查询图书并获取出版社、类别对照表（在后台线程执行）"""
+        if field == '全文':
+            # 全文检索结果按相关度排序
+            books = self.db.search_books_ranked(text)
+        else:
+            books = self.db.search_books(field, text)
+        return books, self.db.get_publisher_lookup(), self.db.get_category_lookup()
+    
+    def show_books(self, data):
+        """把查询到的图书添加到表格"""
+        books, publishers, categories = data
+        self.table.clear()
         
-        # 获取所有图书
-        books = self.db.get_all_books()
-        if not books:
-            return
-        
-        # 获取所有出版社和类别
-        publishers = {p['出版社号']: p['名称'] for p in self.db.get_all_publishers()}
-        categories = {c['类别id']: c['类别名称'] for c in self.db.get_all_categories()}
-        
-        # 添加数据到表格
-        for book in books:
-            publisher_name = publishers.get(book['出版社'], str(book['出版社']))
-            category_name = categories.get(book['类别id'], str(book['类别id']))
-            
-            self.table.add_row((
-                book['索书号'],
-                book['书名'],
-                book['作者'],
-                publisher_name,
-                category_name,
-                book['总数'],
-                book['在库数量']
-            ))
+        for book in books or []:
+            self.table.add_row(self.to_row(book, publishers, categories))
     
     def search(self):
         """搜索图书"""
@@ -83,59 +100,10 @@ class BookQueryFrame(ttk.Frame):
             self.load_all_books()
             return
         
-        # 获取所有图书
-        books = self.db.get_all_books()
-        if not books:
-            return
-        
-        # 获取所有出版社和类别
-        publishers = {p['出版社号']: p['名称'] for p in self.db.get_all_publishers()}
-        categories = {c['类别id']: c['类别名称'] for c in self.db.get_all_categories()}
-        
-        # 清空表格
+        # 由数据库按查询条件过滤图书
+        field = {'id': '索书号', 'name': '书名', 'author': '作者', 'fulltext': '全文'}[query_type]
         self.table.clear()
-        
-        # 根据查询条件过滤图书
-        for book in books:
-            if query_type == "id" and query_text.lower() in book['索书号'].lower():
-                publisher_name = publishers.get(book['出版社'], str(book['出版社']))
-                category_name = categories.get(book['类别id'], str(book['类别id']))
-                
-                self.table.add_row((
-                    book['索书号'],
-                    book['书名'],
-                    book['作者'],
-                    publisher_name,
-                    category_name,
-                    book['总数'],
-                    book['在库数量']
-                ))
-            elif query_type == "name" and query_text.lower() in book['书名'].lower():
-                publisher_name = publishers.get(book['出版社'], str(book['出版社']))
-                category_name = categories.get(book['类别id'], str(book['类别id']))
-                
-                self.table.add_row((
-                    book['索书号'],
-                    book['书名'],
-                    book['作者'],
-                    publisher_name,
-                    category_name,
-                    book['总数'],
-                    book['在库数量']
-                ))
-            elif query_type == "author" and query_text.lower() in book['作者'].lower():
-                publisher_name = publishers.get(book['出版社'], str(book['出版社']))
-                category_name = categories.get(book['类别id'], str(book['类别id']))
-                
-                self.table.add_row((
-                    book['索书号'],
-                    book['书名'],
-                    book['作者'],
-                    publisher_name,
-                    category_name,
-                    book['总数'],
-                    book['在库数量']
-                ))
+        run_async(self.table, self.fetch_books, field, query_text, on_success=self.show_books)
 
 class BorrowQueryFrame(ttk.Frame):
     """借阅信息查询界面"""
@@ -164,39 +132,42 @@ class BorrowQueryFrame(ttk.Frame):
         self.query_entry.pack(side=tk.LEFT, padx=5)
         
         ttk.Button(query_frame, text="查询", command=self.search).pack(side=tk.LEFT, padx=5)
+        ttk.Button(query_frame, text="导出", command=self.export).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('借阅记录编号', '读者卡号', '读者姓名', '索书号', '书名', '借阅日期', '应还日期', '归还日期', '借阅状态', '预计罚款')
         headings = ('借阅记录编号', '读者卡号', '读者姓名', '索书号', '书名', '借阅日期', '应还日期', '归还日期', '借阅状态', '预计罚款')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
         self.load_all_borrows()
     
+    @staticmethod
+    def to_row(info):
+        return (
+            info['借阅记录编号'],
+            info['读者卡号'],
+            info['读者姓名'],
+            info['索书号'],
+            info['书名'],
+            info['借阅日期'],
+            info['应还日期'],
+            info['归还日期'] if info['归还日期'] else '未归还',
+            info['借阅状态'],
+            f"¥{info['预计罚款']:.2f}" if info['预计罚款'] else '¥0.00'
+        )
+    
     def load_all_borrows(self):
-        """加载所有借阅信息"""
+        """按页加载所有借阅信息"""
+        self.table.load_pages(self.db.get_borrow_info_page, self.to_row)
+    
+    def show_borrows(self, borrow_info):
+        """把借阅信息添加到表格"""
         self.table.clear()
         
-        # 获取借阅信息视图
-        borrow_info = self.db.get_borrow_info_view()
-        if not borrow_info:
-            return
-        
-        # 添加数据到表格
-        for info in borrow_info:
-            self.table.add_row((
-                info['借阅记录编号'],
-                info['读者卡号'],
-                info['读者姓名'],
-                info['索书号'],
-                info['书名'],
-                info['借阅日期'],
-                info['应还日期'],
-                info['归还日期'] if info['归还日期'] else '未归还',
-                info['借阅状态'],
-                f"¥{info['预计罚款']:.2f}" if info['预计罚款'] else '¥0.00'
-            ))
+        for info in borrow_info or []:
+            self.table.add_row(self.to_row(info))
     
     def search(self):
         """搜索借阅信息"""
@@ -207,55 +178,106 @@ class BorrowQueryFrame(ttk.Frame):
             self.load_all_borrows()
             return
         
-        # 获取借阅信息视图
-        borrow_info = self.db.get_borrow_info_view()
-        if not borrow_info:
+        # 由数据库按查询条件过滤借阅信息
+        field = {'reader': '读者卡号', 'book': '索书号', 'status': '借阅状态'}[query_type]
+        self.table.clear()
+        run_async(self.table, self.db.search_borrow_info, field, query_text, on_success=self.show_borrows)
+    
+    def export(self):
+        """把全部借阅信息导出为 CSV 文件"""
+        path = filedialog.asksaveasfilename(
+            title="导出借阅信息",
+            defaultextension=".csv",
+            filetypes=[("CSV 文件", "*.csv"), ("所有文件", "*.*")]
+        )
+        if not path:
             return
         
-        # 清空表格
-        self.table.clear()
+        run_async(self.table, self.db.export_borrow_info, path, on_success=self.show_export_result)
+    
+    def show_export_result(self, count):
+        if count is None:
+            show_error("导出借阅信息失败")
+        else:
+            show_info(f"已导出 {count} 条借阅信息")
+
+class ReaderStatsFrame(ttk.Frame):
+    """读者借阅统计界面"""
+    def __init__(self, parent, db):
+        super().__init__(parent)
+        self.db = db
+        self.pack(fill=tk.BOTH, expand=True)
         
-        # 根据查询条件过滤借阅信息
-        for info in borrow_info:
-            if query_type == "reader" and query_text.lower() in info['读者卡号'].lower():
-                self.table.add_row((
-                    info['借阅记录编号'],
-                    info['读者卡号'],
-                    info['读者姓名'],
-                    info['索书号'],
-                    info['书名'],
-                    info['借阅日期'],
-                    info['应还日期'],
-                    info['归还日期'] if info['归还日期'] else '未归还',
-                    info['借阅状态'],
-                    f"¥{info['预计罚款']:.2f}" if info['预计罚款'] else '¥0.00'
-                ))
-            elif query_type == "book" and query_text.lower() in info['索书号'].lower():
-                self.table.add_row((
-                    info['借阅记录编号'],
-                    info['读者卡号'],
-                    info['读者姓名'],
-                    info['索书号'],
-                    info['书名'],
-                    info['借阅日期'],
-                    info['应还日期'],
-                    info['归还日期'] if info['归还日期'] else '未归还',
-                    info['借阅状态'],
-                    f"¥{info['预计罚款']:.2f}" if info['预计罚款'] else '¥0.00'
-                ))
-            elif query_type == "status" and query_text.lower() in info['借阅状态'].lower():
-                self.table.add_row((
-                    info['借阅记录编号'],
-                    info['读者卡号'],
-                    info['读者姓名'],
-                    info['索书号'],
-                    info['书名'],
-                    info['借阅日期'],
-                    info['应还日期'],
-                    info['归还日期'] if info['归还日期'] else '未归还',
-                    info['借阅状态'],
-                    f"¥{info['预计罚款']:.2f}" if info['预计罚款'] else '¥0.00'
-                ))
+        # 创建标题
+        title_label = ttk.Label(self, text="读者借阅统计", font=("Arial", 16, "bold"))
+        title_label.pack(pady=10)
+        
+        # 创建查询框架
+        query_frame = ttk.Frame(self)
+        query_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Label(query_frame, text="读者卡号:").pack(side=tk.LEFT, padx=5)
+        
+        self.reader_entry = ttk.Entry(query_frame, width=30)
+        self.reader_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(query_frame, text="查询", command=self.search).pack(side=tk.LEFT, padx=5)
+        ttk.Button(query_frame, text="显示全部", command=self.load_all_stats).pack(side=tk.LEFT, padx=5)
+        ttk.Button(query_frame, text="重建统计", command=self.rebuild).pack(side=tk.LEFT, padx=5)
+        
+        # 创建表格
+        columns = ('读者卡号', '姓名', '总借阅次数', '未归还数量', '超期归还次数', '罚款总额')
+        headings = ('读者卡号', '姓名', '总借阅次数', '未归还数量', '超期归还次数', '罚款总额')
+        self.table = TableFrame(self, columns, headings, virtual=True)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        # 加载数据
+        self.load_all_stats()
+    
+    @staticmethod
+    def to_row(stats):
+        return (
+            stats['读者卡号'],
+            stats['姓名'],
+            stats['总借阅次数'],
+            stats['未归还数量'],
+            stats['超期归还次数'],
+            format_money(stats['罚款总额'])
+        )
+    
+    def load_all_stats(self):
+        """按页加载所有读者的统计"""
+        self.table.load_pages(self.db.get_reader_stats_page, self.to_row)
+    
+    def search(self):
+        """查询一位读者的统计"""
+        reader_id = self.reader_entry.get().strip()
+        
+        if not reader_id:
+            show_warning("请输入读者卡号")
+            return
+        
+        self.table.clear()
+        run_async(self.table, self.db.get_reader_stats, reader_id, on_success=self.show_stats)
+    
+    def show_stats(self, stats):
+        """显示一位读者的统计"""
+        if stats:
+            self.table.add_row(self.to_row(stats))
+        else:
+            show_info("未找到该读者")
+    
+    def rebuild(self):
+        """全量重建统计，用于修复统计与借阅记录不一致的情况"""
+        if messagebox.askyesno("确认重建", "将根据全部借阅和罚款记录重新计算统计，数据量大时需要一些时间，确定继续吗？"):
+            run_async(self.table, self.db.rebuild_reader_stats, on_success=self.on_rebuilt)
+    
+    def on_rebuilt(self, result):
+        if result is None:
+            show_error("重建统计失败")
+            return
+        show_info("读者借阅统计已重建")
+        self.load_all_stats()
 
 class ReaderHistoryFrame(ttk.Frame):
     """读者借阅历史界面"""
@@ -279,6 +301,9 @@ class ReaderHistoryFrame(ttk.Frame):
         
         ttk.Button(query_frame, text="查询", command=self.search).pack(side=tk.LEFT, padx=5)
         
+        self.include_archive = tk.BooleanVar(value=False)
+        ttk.Checkbutton(query_frame, text="包含归档记录", variable=self.include_archive).pack(side=tk.LEFT, padx=5)
+        
         # 创建表格
         columns = ('借阅记录编号', '索书号', '书名', '作者', '出版社', '借阅日期', '应还日期', '归还日期', '状态', '超期天数', '罚款金额')
         headings = ('借阅记录编号', '索书号', '书名', '作者', '出版社', '借阅日期', '应还日期', '归还日期', '状态', '超期天数', '罚款金额')
@@ -296,12 +321,15 @@ class ReaderHistoryFrame(ttk.Frame):
         # 清空表格
         self.table.clear()
         
-        # 调用查询读者借阅历史的存储过程
-        result = self.db.get_reader_borrow_history(reader_id)
-        
-        if result and len(result) > 0:
+        # 在后台调用查询读者借阅历史的存储过程
+        run_async(self.table, self.db.get_reader_borrow_history, reader_id, self.include_archive.get(),
+                  on_success=self.show_history)
+    
+    def show_history(self, result):
+        """显示读者借阅历史"""
+        if result and result.rows:
             # 添加数据到表格
-            for record in result[0]:
+            for record in result.rows:
                 self.table.add_row((
                     record['借阅记录编号'],
                     record['索书号'],
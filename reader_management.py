@@ -6,8 +6,8 @@ Created on Sat Apr 12 20:15:54 2025
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-from utils import TableFrame, EntryDialog, show_error, show_info, show_warning
+from tkinter import ttk, messagebox, filedialog
+from utils import TableFrame, EntryDialog, show_error, show_info, show_warning, run_async
 from borrow_management import BorrowHistoryWindow
 
 class ReaderManagementFrame(ttk.Frame):
@@ -28,13 +28,14 @@ class ReaderManagementFrame(ttk.Frame):
         ttk.Button(button_frame, text="添加读者", command=self.add_reader).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="编辑读者", command=self.edit_reader).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="删除读者", command=self.delete_reader).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="批量导入", command=self.import_readers).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="查看借阅历史", command=self.view_borrow_history).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="刷新", command=self.refresh).pack(side=tk.LEFT, padx=5)
         
         # 创建表格
         columns = ('读者卡号', '姓名', '证件号')
         headings = ('读者卡号', '姓名', '证件号')
-        self.table = TableFrame(self, columns, headings)
+        self.table = TableFrame(self, columns, headings, virtual=True)
         self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         # 加载数据
@@ -42,20 +43,12 @@ class ReaderManagementFrame(ttk.Frame):
     
     def refresh(self):
         """刷新表格数据"""
-        self.table.clear()
-        
-        # 获取所有读者
-        readers = self.db.get_all_readers()
-        if not readers:
-            return
-        
-        # 添加数据到表格
-        for reader in readers:
-            self.table.add_row((
-                reader['读者卡号'],
-                reader['姓名'],
-                reader['证件号']
-            ))
+        # 按页加载读者
+        self.table.load_pages(self.db.get_readers_page, lambda reader: (
+            reader['读者卡号'],
+            reader['姓名'],
+            reader['证件号']
+        ))
     
     def add_reader(self):
         """添加读者"""
@@ -145,6 +138,27 @@ class ReaderManagementFrame(ttk.Frame):
             except Exception as e:
                 show_error(f"更新读者时出错: {str(e)}")
     
+    def import_readers(self):
+        """从 CSV / JSONL 文件批量导入读者"""
+        path = filedialog.askopenfilename(
+            title="选择导入文件",
+            filetypes=[("CSV / JSONL 文件", "*.csv *.jsonl"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        
+        run_async(self.table, self.db.import_readers, path,
+                  on_success=self.show_import_report,
+                  on_error=lambda e: show_error(f"导入读者时出错: {str(e)}"))
+    
+    def show_import_report(self, report):
+        """显示导入结果并刷新表格"""
+        if report.rejected:
+            show_warning(report.describe())
+        else:
+            show_info(report.describe())
+        self.refresh()
+    
     def delete_reader(self):
         """删除读者"""
         # 获取选中的读者
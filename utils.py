@@ -10,10 +10,17 @@ from tkinter import ttk, messagebox
 import datetime
 
 class TableFrame(ttk.Frame):
-    """创建一个带有滚动条的表格框架"""
-    def __init__(self, parent, columns, headings, **kwargs):
+    """创建一个带有滚动条的表格框架
+    
+    virtual=True 时为虚拟滚动模式：数据保存在行元组列表中，Treeview 只生成
+    可见区域及上下 overscan 行的条目，滚动到已加载数据末尾时再向数据源请求下一页。
+    """
+    def __init__(self, parent, columns, headings, virtual=False, overscan=20, **kwargs):
         super().__init__(parent, **kwargs)
         
+        self.virtual = virtual
+        self.overscan = overscan
+        
         # 创建Treeview
         self.tree = ttk.Treeview(self, columns=columns, show='headings')
         
@@ -23,11 +30,17 @@ class TableFrame(ttk.Frame):
             self.tree.column(columns[i], width=100)  # 默认列宽
         
         # 创建滚动条
-        self.scrollbar_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        if virtual:
+            self.scrollbar_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        else:
+            self.scrollbar_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
         self.scrollbar_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
         
         # 配置Treeview的滚动
-        self.tree.configure(yscrollcommand=self.scrollbar_y.set, xscrollcommand=self.scrollbar_x.set)
+        if virtual:
+            self.tree.configure(yscrollcommand=self._on_tree_scrolled, xscrollcommand=self.scrollbar_x.set)
+        else:
+            self.tree.configure(yscrollcommand=self.scrollbar_y.set, xscrollcommand=self.scrollbar_x.set)
         
         # 布局
         self.tree.grid(row=0, column=0, sticky='nsew')
@@ -37,29 +50,278 @@ class TableFrame(ttk.Frame):
         # 配置网格权重
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
+        
+        # 分页加载任务编号，clear() 时递增以丢弃未完成的加载
+        self._page_job = 0
+        
+        # 虚拟滚动状态
+        self._rows = []              # 全部已加载的行
+        self._first = 0              # 可见区域第一行的下标
+        self._win_start = 0          # 已生成条目的范围 [_win_start, _win_end)
+        self._win_end = 0
+        self._selected = set()       # 选中行在 _rows 中的下标，包括已滚出条目范围的行
+        self._selection_input = None # 最近一次用户操作：'replace' 单选，'extend' 按住 Ctrl / Shift
+        self._restored = None        # _render 恢复的选择，随后的 <<TreeviewSelect>> 不算用户操作
+        self._source = None          # (fetch_page, to_row, 续页令牌)
+        self._fetching = False
+        self._render_pending = False
+        self._rendering = False
+        if virtual:
+            self.tree.bind('<Configure>', lambda event: self._schedule_render())
+            self.tree.bind('<<TreeviewSelect>>', self._on_select)
+            self.tree.bind('<ButtonPress-1>', self._note_selection_input, add='+')
+            self.tree.bind('<KeyPress>', self._note_selection_input, add='+')
+        
+        # 后台加载时显示的提示
+        self._loading_label = ttk.Label(self, text="加载中...")
     
     def clear(self):
         """清空表格内容"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self._page_job += 1
+        self._rows = []
+        self._first = self._win_start = self._win_end = 0
+        self._selected = set()
+        self._selection_input = None
+        self._restored = None
+        self._source = None
+        self._fetching = False
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        if self.virtual:
+            self.scrollbar_y.set(0, 1)
+    
+    def load_pages(self, fetch_page, to_row):
+        """分页加载数据
+        
+        fetch_page(after) 返回 (记录列表, 续页令牌)，to_row(记录) 返回一行的值。
+        普通模式下每加载一页后让出事件循环，再继续加载下一页；
+        虚拟模式下只在滚动到已加载数据末尾时才请求下一页。
+        """
+        self.clear()
+        if self.virtual:
+            self._source = (fetch_page, to_row, None)
+            self._fetch_next_page()
+        else:
+            self._load_page(self._page_job, fetch_page, to_row, None)
+    
+    def _load_page(self, job, fetch_page, to_row, after):
+        if job != self._page_job or not self.winfo_exists():
+            return
+        
+        def on_loaded(page):
+            if job != self._page_job:
+                return
+            records, next_after = page
+            for record in records or []:
+                self.add_row(to_row(record))
+            if next_after is not None:
+                self.after(10, self._load_page, job, fetch_page, to_row, next_after)
+        
+        run_async(self, fetch_page, after, on_success=on_loaded)
+    
+    def _fetch_next_page(self):
+        """虚拟模式：在后台向数据源请求下一页，完成后追加到行列表"""
+        if self._fetching or not self._source:
+            return
+        self._fetching = True
+        job = self._page_job
+        fetch_page, to_row, after = self._source
+        
+        def on_loaded(page):
+            if job != self._page_job:
+                return
+            self._fetching = False
+            records, next_after = page
+            self._rows.extend(to_row(record) for record in records or [])
+            # 续页令牌为 None 表示数据源已取完
+            self._source = (fetch_page, to_row, next_after) if next_after is not None else None
+            self._schedule_render()
+        
+        def on_error(error):
+            if job == self._page_job:
+                self._fetching = False
+                self._source = None
+            show_error(f"加载数据时出错: {error}")
+        
+        run_async(self, fetch_page, after, on_success=on_loaded, on_error=on_error)
+    
+    def set_loading(self, loading):
+        """显示或隐藏加载提示"""
+        if loading:
+            self._loading_label.place(relx=0.5, rely=0.5, anchor='center')
+            self._loading_label.lift()
+        else:
+            self._loading_label.place_forget()
     
     def add_row(self, values):
         """添加一行数据"""
-        self.tree.insert('', 'end', values=values)
+        if self.virtual:
+            self._rows.append(tuple(values))
+            self._schedule_render()
+        else:
+            self.tree.insert('', 'end', values=values)
+    
+    def _visible_count(self):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        return max(1, self.tree.winfo_height() // row_height)
+    
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def _render(self):
+        """重新生成可见区域附近的 Treeview 条目"""
+        self._render_pending = False
+        if not self.winfo_exists():
+            return
+        
+        visible = self._visible_count()
+        # 接近已加载数据的末尾时向数据源请求下一页
+        if self._source and self._first + visible + self.overscan >= len(self._rows):
+            self._fetch_next_page()
+        
+        total = len(self._rows)
+        self._first = max(0, min(self._first, total - visible))
+        start = max(0, self._first - self.overscan)
+        end = min(total, self._first + visible + self.overscan)
+        
+        self._rendering = True
+        try:
+            if (start, end) != (self._win_start, self._win_end):
+                children = self.tree.get_children()
+                if children:
+                    self.tree.delete(*children)
+                for index in range(start, end):
+                    self.tree.insert('', 'end', iid=str(index), values=self._rows[index])
+                self._win_start, self._win_end = start, end
+                
+                kept = {index for index in self._selected if start <= index < end}
+                # <<TreeviewSelect>> 在事件队列中稍后才处理，记下恢复的选择供 _on_select 识别
+                self._restored = kept
+                self.after_idle(self._forget_restored)
+                if kept:
+                    self.tree.selection_set([str(index) for index in kept])
+            
+            if end > start:
+                self.tree.yview_moveto((self._first - start) / (end - start))
+        finally:
+            self._rendering = False
+        self._update_scrollbar(visible)
+    
+    def _update_scrollbar(self, visible=None):
+        total = len(self._rows)
+        if total == 0:
+            self.scrollbar_y.set(0, 1)
+            return
+        visible = visible or self._visible_count()
+        self.scrollbar_y.set(self._first / total, min(1.0, (self._first + visible) / total))
+    
+    def _on_scrollbar(self, *args):
+        """虚拟模式的滚动条回调：按全部行数换算可见区域位置"""
+        total = len(self._rows)
+        visible = self._visible_count()
+        if args[0] == 'moveto':
+            self._first = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = visible if args[2] == 'pages' else 1
+            self._first += int(args[1]) * step
+        self._render()
+    
+    def _on_tree_scrolled(self, lo, hi):
+        """Treeview 自身滚动（滚轮、键盘）时同步可见区域位置"""
+        if self._rendering or self._win_end <= self._win_start:
+            return
+        first = self._win_start + int(round(float(lo) * (self._win_end - self._win_start)))
+        if first == self._first:
+            return
+        self._first = first
+        self._update_scrollbar()
+        # 靠近已生成条目的边缘时重新生成
+        visible = self._visible_count()
+        near_top = self._win_start > 0 and first < self._win_start + self.overscan // 2
+        near_bottom = first + visible > self._win_end - self.overscan // 2 and (
+            self._win_end < len(self._rows) or self._source)
+        if near_top or near_bottom:
+            self._schedule_render()
+    
+    def _note_selection_input(self, event):
+        """记录用户这次点击或按键是否按住了 Shift / Ctrl，决定随后的选择是替换还是扩展
+        
+        点击表头、空白处或 Treeview 不处理的按键不会改变选择，所以记录只保留到下一次空闲，
+        只对这次操作引起的 <<TreeviewSelect>> 有效。
+        """
+        self._selection_input = 'extend' if event.state & (0x0001 | 0x0004) else 'replace'
+        self.after_idle(self._forget_selection_input)
+    
+    def _forget_selection_input(self):
+        self._selection_input = None
+    
+    def _forget_restored(self):
+        self._restored = None
+    
+    def _on_select(self, event=None):
+        """虚拟模式：把 Treeview 的选择变化合并到 _selected
+        
+        Treeview 只含条目范围内的行，所以只增删范围内的下标；范围外已选中的行保持不变，
+        只有不按 Shift / Ctrl 的单击或按键才清除它们。
+        """
+        selection = {int(iid) for iid in self.tree.selection()}
+        in_window = {index for index in self._selected if self._win_start <= index < self._win_end}
+        if self._restored is not None and selection == self._restored:
+            # _render 重新生成条目并恢复选择时产生的事件
+            self._restored = None
+            return
+        user_input, self._selection_input = self._selection_input, None
+        if user_input is None and selection == in_window:
+            return
+        if user_input == 'replace':
+            self._selected = selection
+        else:
+            self._selected = (self._selected - in_window) | selection
+    
+    def _selected_indexes(self):
+        if self.virtual:
+            return sorted(index for index in self._selected if index < len(self._rows))
+        return None
     
     def get_selected_item(self):
         """获取选中的行"""
+        indexes = self._selected_indexes()
+        if indexes is not None:
+            # 虚拟模式下选中行可能已滚出可见区域，从行列表中取值
+            return self._item_dict(self._rows[indexes[0]]) if indexes else None
         selected_items = self.tree.selection()
         if selected_items:
             return self.tree.item(selected_items[0])
         return None
     
+    def get_selected_items(self):
+        """获取所有选中的行（按 Ctrl / Shift 多选，虚拟模式下可以跨越滚动）"""
+        indexes = self._selected_indexes()
+        if indexes is not None:
+            return [self._item_dict(self._rows[index]) for index in indexes]
+        return [self.tree.item(iid) for iid in self.tree.selection()]
+    
+    def selected_count(self):
+        """选中的行数"""
+        indexes = self._selected_indexes()
+        return len(indexes) if indexes is not None else len(self.tree.selection())
+    
     def get_all_items(self):
         """获取所有行"""
+        if self.virtual:
+            return [self._item_dict(row) for row in self._rows]
         items = []
         for item in self.tree.get_children():
             items.append(self.tree.item(item))
         return items
+    
+    @staticmethod
+    def _item_dict(row):
+        """构造与 Treeview.item() 返回值相同结构的字典"""
+        return {'text': '', 'image': '', 'values': list(row), 'open': 0, 'tags': ''}
 
 class EntryDialog(tk.Toplevel):
     """创建一个输入对话框"""
@@ -147,6 +409,26 @@ class ComboBoxDialog(tk.Toplevel):
         """取消按钮点击事件"""
         self.destroy()
 
+def run_async(owner, func, *args, on_success=None, on_error=None):
+    """在后台线程执行 func(*args)，完成后在 Tk 主线程回调 on_success(结果) 或 on_error(异常)
+    
+    根窗口未安装 AsyncLoader 时直接同步执行。
+    """
+    loader = getattr(owner.nametowidget('.'), 'async_loader', None)
+    if loader is not None:
+        return loader.submit(owner, func, *args, on_success=on_success, on_error=on_error)
+    
+    try:
+        result = func(*args)
+    except Exception as e:
+        if on_error is None:
+            raise
+        on_error(e)
+        return None
+    if on_success:
+        on_success(result)
+    return None
+
 def show_error(message):
     """显示错误消息"""
     messagebox.showerror("错误", message)